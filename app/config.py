@@ -1,4 +1,3 @@
-import torch
 import numpy as np
 
 # ------------------ Configuration ------------------
@@ -10,6 +9,46 @@ CONFIG = {
   'use_seed': True,
   'epoch_batch_size': 100,
   'max_ticks': 50,
+  'rollout_batch_size': 1,
+  'numpy_rollouts': False,
+  'policy_cache_size': 100000,
+  'rollout_workers': 0,
+  'training_jobs_retained': 20,
+  'win_rate_window': 50,
+  'stream_max_pending_events': 64,
+  'stream_keepalive_seconds': 15,
+  'response_cache_max_bytes': 64 * 1024 * 1024,
+  'activations_history_limit': 100,
+  'storage_backend': 'sqlite',
+  'storage_sqlite_path': 'data/game.db',
+  'storage_pool_size': 4,
+  'metrics_enabled': True,
+  'profile_token': None,
+  'profile_dir': 'profiles',
+  'profile_max_files': 50,
+  'profile_sample_interval': 0.005,
+  'weight_store_dir': 'checkpoints/shared_weights',
+  'weight_store_poll_seconds': 1.0,
+  'weight_bank_initial_capacity': 64,
+  'inference_batch_max_size': 64,
+  'inference_batch_max_latency': 0.002,
+  'play_max_rematches': 1000,
+  'play_max_concurrent_games': 256,
+  'rating_initial': 1500.0,
+  'rating_k_factor': 32,
+  'leaderboard_flush_seconds': 5.0,
+  'leaderboard_page_max': 100,
+  'matchmaking_enabled': True,
+  'matchmaking_tick_seconds': 1.0,
+  'matchmaking_batch_size': 256,
+  'matchmaking_timeout_seconds': 120,
+  'matchmaking_result_ttl': 300,
+  'matchmaking_tolerance_base': 50,
+  'matchmaking_tolerance_growth': 10,
+  'matchmaking_tolerance_max': 400,
+  'id_block_size': 100,
+  'session_ttl_seconds': 1800,
+  'session_evict_interval': 60,
 
   'resume_from_checkpoint': True,
   'checkpoint_dir': 'checkpoints',
@@ -42,14 +81,21 @@ DOT_DAMAGE = {
   'poison_damage': 5
 }
 
+# Status effects, in the fixed order creatures and battle logs store their counters
+STATUS_NAMES = ['stun', 'poison', 'defend']
+
 SPECIAL_ABILITIES = {
   'poison': {
     'energy_cost': 30,
-    'apply': lambda c, o: o.statuses.update({'poison': 3})
+    'status': 'poison',
+    'duration': 3,
+    'blocked_by': None
   },
   'stun': {
     'energy_cost': 40,
-    'apply': lambda c, o: o.statuses.update({'stun': 2}) if 'defend' not in o.statuses else None
+    'status': 'stun',
+    'duration': 2,
+    'blocked_by': 'defend'
   }
 }
 
@@ -126,6 +172,7 @@ PLAYER_TEMPLATES = {
 }
 
 
+# torch is seeded when it is first imported (see torch_loader.py), so that
+# read-only endpoints can start without loading it
 if CONFIG['use_seed']:
   np.random.seed(CONFIG['seed'])
-  torch.manual_seed(CONFIG['seed'])
@@ -1,10 +1,44 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from app.config import CONFIG
+from app.modules.metrics import http_request_duration_seconds
+from app.modules.profiling import finish_profile, profiling_requested, start_profile
 from app.services import battle_routes
 from app.services import player_routes   # 👈 import your player routes
+from app.services import metrics_routes
+from app.services import profile_routes
+from app.services import matchmaking_routes
+from app.services import leaderboard_routes
+from app.modules.leaderboard import flush_leaderboard
+from app.modules.matchmaking import matchmaking_loop
+from app.modules.pvp import shutdown_games
+from app.modules.storage import get_storage
+from app.modules.training_jobs import shutdown_training_jobs
+from contextlib import asynccontextmanager, suppress
+import asyncio
 import os
+import time
 
-app = FastAPI()
+# ✅ Background matchmaking ticks for the lifetime of the app; training jobs and
+# their rollout worker processes are stopped on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open storage up front, so legacy JSON data is migrated before the first login
+    await asyncio.to_thread(get_storage)
+    task = asyncio.create_task(matchmaking_loop()) if CONFIG['matchmaking_enabled'] else None
+    try:
+        yield
+    finally:
+        if task:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
+        shutdown_games()
+        await asyncio.to_thread(shutdown_training_jobs)
+        # Rating deltas not yet flushed would otherwise be lost
+        await asyncio.to_thread(flush_leaderboard)
+
+app = FastAPI(lifespan=lifespan)
 
 # ✅ Explicitly list allowed origins
 origins = [
@@ -23,6 +57,60 @@ app.add_middleware(
     allow_headers=["Content-Type", "Authorization"],
 )
 
+# ✅ Request latency per route template (not raw path, to keep label cardinality bounded)
+def _route_template(scope):
+    """Path template of the matched route (e.g. /battle/train/{job_id}).
+
+    Routes of an included router may carry only their own part of the path, so
+    the router prefix is taken from the request path: the segments in front of
+    the ones the route template matched.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    template = route.path_format
+    segments = scope["path"].split("/")
+    prefix = segments[:len(segments) - template.count("/")]
+    return "/".join(prefix) + template
+
+if CONFIG['metrics_enabled']:
+    @app.middleware("http")
+    async def record_request_latency(request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            http_request_duration_seconds.observe(
+                time.perf_counter() - start, request.method, _route_template(request.scope), str(status)
+            )
+
+# ✅ Opt-in request profiling: only installed when PROFILE_TOKEN is set, and only
+# requests sending it (X-Profile header or ?profile=) are sampled
+if "PROFILE_TOKEN" in os.environ:
+    CONFIG['profile_token'] = os.environ["PROFILE_TOKEN"]
+
+if CONFIG['profile_token']:
+    @app.middleware("http")
+    async def profile_request(request: Request, call_next):
+        if not profiling_requested(request) or request.url.path.startswith("/profiles"):
+            return await call_next(request)
+        profile = start_profile()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+        finally:
+            profile_id = await asyncio.to_thread(finish_profile, profile, request.method, request.url.path, status)
+        response.headers["X-Profile-Id"] = profile_id
+        return response
+
 # Include your routes
 app.include_router(battle_routes.router, prefix="/battle", tags=["Battle"])
 app.include_router(player_routes.router, prefix="/player", tags=["Player"])  # 👈 add this
+app.include_router(metrics_routes.router, tags=["Metrics"])
+app.include_router(profile_routes.router, prefix="/profiles", tags=["Profiling"])
+app.include_router(matchmaking_routes.router, prefix="/matchmaking", tags=["Matchmaking"])
+app.include_router(leaderboard_routes.router, prefix="/leaderboard", tags=["Leaderboard"])
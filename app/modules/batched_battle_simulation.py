@@ -0,0 +1,309 @@
+import numpy as np
+from app.config import ACTION_NAMES, CONFIG, DOT_DAMAGE, SPECIAL_ABILITIES
+from app.modules.logging_utils import BattleLog, LOG_ACTION_CODES, STATUS_NAMES
+from app.modules.torch_loader import torch
+
+F = torch.nn.functional
+
+# ------------------ Batched Battle Simulation ------------------
+#
+# Runs N independent A-vs-B battles in lockstep. Every per-creature quantity
+# lives in an (N, 2) tensor indexed by [battle, side] (side 0 = A, side 1 = B),
+# so one tick costs at most one policy forward pass per side and per turn slot,
+# no matter how many battles are in flight. The rules mirror simulate_battle.
+
+BASE_ACTIONS = ['attack', 'defend', 'recover']
+
+
+class BattleBatch:
+  def __init__(self, creature_A, creature_B, num_battles):
+    self.creatures = (creature_A, creature_B)
+    self.n = num_battles
+    shape = (num_battles, 2)
+
+    max_hp = torch.tensor([c.max_hp for c in self.creatures])
+    max_energy = torch.tensor([c.max_energy for c in self.creatures])
+    self.max_energy = max_energy
+    self.speed = [c.speed for c in self.creatures]
+
+    self.hp = max_hp.repeat(num_battles, 1)
+    self.energy = max_energy.repeat(num_battles, 1)
+    self.statuses = {name: torch.zeros(shape, dtype=torch.long) for name in STATUS_NAMES}
+    self.rewards = torch.zeros(shape, dtype=torch.float64)
+    self.done = torch.zeros(num_battles, dtype=torch.bool)
+    self.winner = torch.full((num_battles,), -1, dtype=torch.long)
+    self.stalemate = torch.zeros(num_battles, dtype=torch.bool)
+    self.last_input = [torch.zeros(num_battles, len(ACTION_NAMES)), torch.zeros(num_battles, len(ACTION_NAMES))]
+    self.has_input = [torch.zeros(num_battles, dtype=torch.bool), torch.zeros(num_battles, dtype=torch.bool)]
+    self.events = []
+
+    # Resolve reward tables and special ability effects once per batch
+    self.action_names = [list(c.action_names) for c in self.creatures]
+    self.action_codes = [torch.tensor([LOG_ACTION_CODES[name] for name in names]) for names in self.action_names]
+    self.action_rewards = []
+    for c in self.creatures:
+      table = [
+        c.reward_config.get('attack', CONFIG['reward_attack']),
+        c.reward_config.get('defend', CONFIG['reward_defend']),
+        c.reward_config.get('recover', CONFIG['reward_recover']),
+      ]
+      table += [c.reward_config.get(name, 0.01) for name in c.special_abilities]
+      self.action_rewards.append(torch.tensor(table, dtype=torch.float64))
+    self.win_reward = [c.reward_config.get('win', CONFIG['reward_win']) for c in self.creatures]
+    self.lose_reward = [c.reward_config.get('lose', CONFIG['reward_lose']) for c in self.creatures]
+
+  # ------------------ Event Recording ------------------
+
+  def record(self, tick, rows, side, message=None, action_idx=None, probs=None, reward=None, state=None):
+    """Snapshot the logged fields for `rows`; per-battle logs are only built in build_logs()."""
+    if rows.numel() == 0:
+      return
+    if state is None:
+      state = torch.stack([
+        self.hp[rows, side], self.energy[rows, side],
+        self.hp[rows, 1 - side], self.energy[rows, 1 - side]
+      ], dim=1).to(torch.float32)
+    self.events.append({
+      'tick': tick,
+      'rows': rows,
+      'side': side,
+      'message': message,
+      'action_idx': action_idx,
+      'probs': probs,
+      'reward': reward,
+      'state': state,
+      'hp': self.hp[rows, side].clone(),
+      'energy': self.energy[rows, side].clone(),
+      'statuses': torch.stack([self.statuses[name][rows, side] for name in STATUS_NAMES], dim=1),
+    })
+
+  # ------------------ Game Rules ------------------
+
+  def finalize(self, rows):
+    """Mark rows as finished, decide winners and apply win/lose rewards."""
+    if rows.numel() == 0:
+      return
+    hp_A, hp_B = self.hp[rows, 0], self.hp[rows, 1]
+    winner = torch.full_like(rows, -1)
+    winner[hp_A > hp_B] = 0
+    winner[hp_B > hp_A] = 1
+    for side in (0, 1):
+      won = winner == side
+      lost = winner == 1 - side
+      self.rewards[rows[won], side] += self.win_reward[side]
+      self.rewards[rows[lost], side] += self.lose_reward[side]
+    self.winner[rows] = winner
+    self.done[rows] = True
+
+  def check_knockouts(self, tick, rows):
+    """Log and finalize knockouts among rows; return the rows still in play."""
+    dead_A = self.hp[rows, 0] <= 0
+    dead_B = (self.hp[rows, 1] <= 0) & ~dead_A
+    self.record(tick, rows[dead_A], 0, message='*KNOCKOUT*')
+    self.record(tick, rows[dead_B], 1, message='*KNOCKOUT*')
+    knocked_out = dead_A | dead_B
+    self.finalize(rows[knocked_out])
+    return rows[~knocked_out]
+
+  def process_statuses(self, tick, rows, side):
+    poison = self.statuses['poison']
+    poisoned = poison[rows, side] > 0
+    self.hp[rows[poisoned], side] -= DOT_DAMAGE['poison_damage']
+    self.record(tick, rows[poisoned & (self.hp[rows, side] <= 0)], side, message='*POISONED*')
+    for counters in self.statuses.values():
+      counters[rows, side] = (counters[rows, side] - 1).clamp(min=0)
+
+  def choose_actions(self, rows, side, state, epsilon):
+    creature = self.creatures[side]
+    if creature.policy is not None:
+      # NumpyPolicy memoizes per state row; other policies (e.g. pvp's BankPolicy) evaluate every row
+      policy_probs = getattr(creature.policy, 'cached_probs_batch', creature.policy.probs)
+      probs = torch.from_numpy(policy_probs(state.numpy()))
+    else:
+      with torch.no_grad():
+        probs = F.softmax(creature.nn(state), dim=1)
+    sampled = torch.multinomial(probs, 1).squeeze(1)
+    explore = torch.rand(rows.numel()) < epsilon
+    random_idx = torch.randint(len(ACTION_NAMES), (rows.numel(),))
+    return torch.where(explore, random_idx, sampled), probs
+
+  def apply_actions(self, rows, side, actions):
+    """Vectorized counterpart of Creature.attack/defend/recover/use_special."""
+    opp = 1 - side
+    energy = self.energy[rows, side]
+    max_energy = self.max_energy[side]
+    reward = self.action_rewards[side][actions]
+    regen_base = (energy + CONFIG['energy_regen_base']).clamp(max=max_energy)
+
+    attack = actions == 0
+    halved = attack & (self.statuses['defend'][rows, opp] > 0)
+    damage = torch.where(halved, -(-CONFIG['attack_damage'] // 2), CONFIG['attack_damage'])
+    self.hp[rows[attack], opp] -= damage[attack]
+    energy = torch.where(attack, regen_base, energy)
+
+    defend = actions == 1
+    self.statuses['defend'][rows[defend], side] = 1
+    energy = torch.where(defend, regen_base, energy)
+
+    recover = actions == 2
+    full = recover & (energy >= max_energy)
+    reward = torch.where(full, -reward, reward)
+    recovered = (energy + CONFIG['energy_regen_recover']).clamp(max=max_energy)
+    energy = torch.where(recover & ~full, recovered, energy)
+
+    for offset, ability_name in enumerate(self.creatures[side].special_abilities):
+      ability = SPECIAL_ABILITIES.get(ability_name)
+      chosen = actions == len(BASE_ACTIONS) + offset
+      if ability is None:
+        reward = torch.where(chosen, 0.0, reward)
+        continue
+      affordable = energy >= ability['energy_cost']
+      reward = torch.where(chosen & ~affordable, 0.0, reward)
+      used = chosen & affordable
+      energy = torch.where(used, energy - ability['energy_cost'], energy)
+      if ability.get('blocked_by'):
+        used = used & (self.statuses[ability['blocked_by']][rows, opp] == 0)
+      self.statuses[ability['status']][rows[used], opp] = ability['duration']
+
+    self.energy[rows, side] = energy
+    self.rewards[rows, side] += reward
+    return reward
+
+  def take_turn(self, tick, rows, side, epsilon):
+    """One creature's turn for every battle in rows where it moves in this slot."""
+    self.process_statuses(tick, rows, side)
+    rows = self.check_knockouts(tick, rows)
+
+    stunned = self.statuses['stun'][rows, side] > 0
+    self.record(tick, rows[stunned], side, message='*STUNNED*')
+    rows = rows[~stunned]
+    if rows.numel() == 0:
+      return
+
+    opp = 1 - side
+    state = torch.stack([
+      self.hp[rows, side], self.energy[rows, side],
+      self.hp[rows, opp], self.energy[rows, opp]
+    ], dim=1).to(torch.float32)
+    self.last_input[side][rows] = state
+    self.has_input[side][rows] = True
+
+    actions, probs = self.choose_actions(rows, side, state, epsilon)
+    reward = self.apply_actions(rows, side, actions)
+
+    knocked_out = self.hp[rows, opp] <= 0
+    self.record(tick, rows[knocked_out], opp, message='*KNOCKOUT*')
+    self.finalize(rows[knocked_out])
+    alive = ~knocked_out
+    self.record(tick, rows[alive], side, action_idx=actions[alive], probs=probs[alive],
+                reward=reward[alive], state=state[alive])
+
+  def turn_order(self):
+    """Per-battle side that moves first this tick (ties broken at random)."""
+    speed_A, speed_B = self.speed
+    if speed_A != speed_B:
+      return torch.full((self.n,), 0 if speed_A > speed_B else 1, dtype=torch.long)
+    return (torch.rand(self.n) < 0.5).long()
+
+  def run(self, max_ticks, epsilons):
+    for tick in range(max_ticks):
+      if self.done.all():
+        break
+      first = self.turn_order()
+      for slot in (0, 1):
+        mover = first if slot == 0 else 1 - first
+        for side in (0, 1):
+          rows = (~self.done & (mover == side)).nonzero().squeeze(1)
+          if rows.numel():
+            self.take_turn(tick, rows, side, epsilons[side])
+
+    # Stalemate
+    rows = (~self.done).nonzero().squeeze(1)
+    self.record(max_ticks - 1, rows, 0, message='*STALEMATE*')
+    self.record(max_ticks - 1, rows, 1, message='*STALEMATE*')
+    self.stalemate[rows] = True
+    self.done[rows] = True
+
+  # ------------------ Log Assembly ------------------
+
+  def build_logs(self, epoch):
+    """Gather recorded events into one columnar BattleLog per battle."""
+    width = max(len(names) for names in self.action_names)
+    columns = {column: [] for column in BattleLog.COLUMNS}
+    battle_rows = []
+    for event in self.events:
+      k = event['rows'].numel()
+      battle_rows.append(event['rows'])
+      columns['tick'].append(torch.full((k,), event['tick']))
+      columns['creature'].append(torch.full((k,), event['side']))
+      if event['message'] is None:
+        columns['action'].append(self.action_codes[event['side']][event['action_idx']])
+        columns['action_idx'].append(event['action_idx'])
+        columns['probs'].append(F.pad(event['probs'], (0, width - event['probs'].shape[1])))
+        columns['reward'].append(event['reward'])
+      else:
+        columns['action'].append(torch.full((k,), LOG_ACTION_CODES[event['message']]))
+        columns['action_idx'].append(torch.full((k,), -1))
+        columns['probs'].append(torch.zeros(k, width))
+        columns['reward'].append(torch.zeros(k, dtype=torch.float64))
+      for column in ('state', 'hp', 'energy', 'statuses'):
+        columns[column].append(event[column])
+
+    dtypes = {'tick': np.int16, 'creature': np.int8, 'action': np.int8, 'action_idx': np.int8,
+              'state': np.float32, 'probs': np.float32, 'hp': np.int16, 'energy': np.int16,
+              'statuses': np.int8, 'reward': np.float32}
+    battle_rows = torch.cat(battle_rows) if battle_rows else torch.zeros(0, dtype=torch.long)
+    # Stable sort by battle keeps each battle's events in the order they happened
+    order = torch.sort(battle_rows, stable=True).indices
+    merged = {
+      column: torch.cat(values)[order].numpy().astype(dtypes[column]) if values else np.zeros(0, dtype=dtypes[column])
+      for column, values in columns.items()
+    }
+    bounds = np.cumsum(np.bincount(battle_rows.numpy(), minlength=self.n))
+
+    # Credit the total episode reward to each creature's final entry, as finalize_battle does
+    totals = self.rewards.tolist()
+    stalemate = self.stalemate.tolist()
+    logs = []
+    for row in range(self.n):
+      start, end = (bounds[row - 1] if row else 0), bounds[row]
+      log = BattleLog.from_columns(epoch, self.creatures, **{column: values[start:end] for column, values in merged.items()})
+      if not stalemate[row]:
+        log.add_final_reward(0, totals[row][0])
+        log.add_final_reward(1, totals[row][1])
+      if CONFIG['sort_logs_by_creature']:
+        log.sort_by_creature()
+      logs.append(log)
+    return logs
+
+
+def simulate_battles_batched(creature_A, creature_B, epoch, max_ticks, epsilons, num_battles):
+  """Simulate num_battles battles in lockstep.
+
+  Returns a list with one (reward_A, reward_B, battle_log, winner, last_input_A,
+  last_input_B) tuple per battle, matching simulate_battle's return value.
+  """
+  creature_A.reset()
+  creature_B.reset()
+  batch = BattleBatch(creature_A, creature_B, num_battles)
+  batch.run(max_ticks, epsilons)
+  logs = batch.build_logs(epoch)
+
+  names = (creature_A.name, creature_B.name)
+  totals = batch.rewards.tolist()
+  winners = batch.winner.tolist()
+  stalemate = batch.stalemate.tolist()
+  has_input_A, has_input_B = batch.has_input[0].tolist(), batch.has_input[1].tolist()
+
+  results = []
+  for row in range(num_battles):
+    if stalemate[row]:
+      winner = 'stalemate'
+    else:
+      winner = names[winners[row]] if winners[row] >= 0 else None
+    results.append((
+      totals[row][0], totals[row][1], logs[row], winner,
+      batch.last_input[0][row] if has_input_A[row] else None,
+      batch.last_input[1][row] if has_input_B[row] else None,
+    ))
+  return results
@@ -1,133 +1,115 @@
-import torch
 import random
-from app.config import ACTION_NAMES, CONFIG
-from app.modules.logging_utils import append_battle_log
-from app.modules.utils import choose_action, create_state
+from app.config import CONFIG
+from app.modules.creature_manager import STUN
+from app.modules.logging_utils import BattleLog, append_battle_log
+from app.modules.utils import choose_action, create_state, create_state_array
+
+def _log_marker(epoch, tick, creature, opponent, battle_log, message):
+  """Zero-reward marker event (knockout, stun, poison, stalemate)."""
+  if message == '*KNOCKOUT*' and creature.hp > 0:
+    print('=== ERROR, KNOCKOUT mismatch: ', creature)
+  append_battle_log(epoch, tick, creature, opponent, battle_log, message, None, -1, 0.0)
 
 def simulate_battle(creature_A, creature_B, epoch, max_ticks, epsilons):
   epsilon_A, epsilon_B = epsilons
   creature_A.reset()
   creature_B.reset()
 
-  battle_log = []
-  rewards = {creature_A.name: 0.0, creature_B.name: 0.0}
-  zero = torch.zeros(len(ACTION_NAMES))
+  battle_log = BattleLog(epoch, (creature_A, creature_B), max_ticks)
+  # Episode reward per side (0 = A, 1 = B)
+  rewards = [0.0, 0.0]
 
   # Store last input tensors for visualization
-  last_input_A = None
-  last_input_B = None
-
-  def abl_zero_reward(creature, opponent, message, trace):
-    if message == '*KNOCKOUT*' and creature.hp > 0:
-      print('=== ERROR, KNOCKOUT mismatch: ', creature, 'trace: ', trace)
-    append_battle_log(epoch, tick, creature, opponent, battle_log, message, zero, -1, 0.0)
-
-  def check_for_knockouts():
-    if not creature_A.is_alive() or not creature_B.is_alive():
-      if not creature_A.is_alive():
-        abl_zero_reward(creature_A, creature_B, '*KNOCKOUT*', 1)
-      elif not creature_B.is_alive():
-        abl_zero_reward(creature_B, creature_A, '*KNOCKOUT*', 2)
-      return finalize_battle(creature_A, creature_B, rewards, battle_log)
+  last_inputs = [None, None]
+
+  # Turn order only depends on speed, so it is fixed for the whole battle
+  # except for equal speeds, which are re-decided by a coin flip every tick
+  side_A = (0, creature_A, creature_B, epsilon_A)
+  side_B = (1, creature_B, creature_A, epsilon_B)
+  speed_tie = creature_A.speed == creature_B.speed
+  fixed_order = (side_A, side_B) if creature_A.speed >= creature_B.speed else (side_B, side_A)
 
   for tick in range(max_ticks):
-    result = check_for_knockouts()
-    if result:
-      return (*result, last_input_A, last_input_B)
-
-    # Determine turn order
-    creatures = [creature_A, creature_B]
-    creatures.sort(key=lambda c: c.speed, reverse=True)
-    if creatures[0].speed == creatures[1].speed and random.random() < 0.5:
-      creatures[0], creatures[1] = creatures[1], creatures[0]
-    turn_order = creatures
-
-    for creature in turn_order:
-      opponent = creature_B if creature is creature_A else creature_A
-      epsilon = epsilon_A if creature is creature_A else epsilon_B
-
-      # Process statuses
-      creature.process_statuses(opponent, abl_zero_reward)
-      result = check_for_knockouts()
-      if result:
-        return (*result, last_input_A, last_input_B)
-
-      if 'stun' in creature.statuses:
-        abl_zero_reward(creature, opponent, '*STUNNED*', 3)
+    if creature_A.hp <= 0 or creature_B.hp <= 0:
+      loser = creature_A if creature_A.hp <= 0 else creature_B
+      _log_marker(epoch, tick, loser, creature_B if loser is creature_A else creature_A, battle_log, '*KNOCKOUT*')
+      return (*finalize_battle(creature_A, creature_B, rewards, battle_log), *last_inputs)
+
+    turn_order = fixed_order
+    if speed_tie and random.random() < 0.5:
+      turn_order = (side_B, side_A)
+
+    for side, creature, opponent, epsilon in turn_order:
+      # Process statuses (a poison knockout is logged with the counters before they tick down)
+      if creature.take_poison_damage():
+        _log_marker(epoch, tick, creature, opponent, battle_log, '*POISONED*')
+      creature.count_down_statuses()
+      if creature_A.hp <= 0 or creature_B.hp <= 0:
+        loser = creature_A if creature_A.hp <= 0 else creature_B
+        _log_marker(epoch, tick, loser, creature_B if loser is creature_A else creature_A, battle_log, '*KNOCKOUT*')
+        return (*finalize_battle(creature_A, creature_B, rewards, battle_log), *last_inputs)
+
+      if creature.status[STUN]:
+        _log_marker(epoch, tick, creature, opponent, battle_log, '*STUNNED*')
         continue
 
-      # Create state tensor and store last input for visualization
-      state_tensor = create_state(creature, opponent)
-      if creature is creature_A:
-        last_input_A = state_tensor
+      # Create state, choose action (NumPy snapshot if one is active) and store last input for visualization
+      if creature.policy is not None:
+        state_tensor = create_state_array(creature, opponent)
+        action_index, probs = creature.policy.choose_action(state_tensor, epsilon)
       else:
-        last_input_B = state_tensor
-
-      # Choose action
-      action_index, probs = choose_action(creature.nn, state_tensor, epsilon)
-      action_name, action_fn = creature.actions[action_index]
+        state_tensor = create_state(creature, opponent)
+        action_index, probs = choose_action(creature.nn, state_tensor, epsilon)
+      last_inputs[side] = state_tensor
 
       # Execute action
-      if action_name not in ['attack', 'defend', 'recover']:
-        reward = action_fn(opponent, action_name)
-      else:
-        reward = action_fn(opponent)
-
-      rewards[creature.name] += reward
+      reward = creature.act(action_index, opponent)
+      rewards[side] += reward
 
       # Knockout check
-      if not opponent.is_alive():
-        abl_zero_reward(opponent, creature, '*KNOCKOUT*', 4)
-        return (*finalize_battle(creature_A, creature_B, rewards, battle_log), last_input_A, last_input_B)
+      if opponent.hp <= 0:
+        _log_marker(epoch, tick, opponent, creature, battle_log, '*KNOCKOUT*')
+        return (*finalize_battle(creature_A, creature_B, rewards, battle_log), *last_inputs)
 
       append_battle_log(
         epoch, tick,
         creature,
         opponent,
         battle_log,
-        action_name,
+        creature.action_names[action_index],
         probs,
         action_index,
-        reward
+        reward,
+        state=state_tensor
       )
 
   # Stalemate
-  abl_zero_reward(creature_A, creature_B, '*STALEMATE*', 5)
-  abl_zero_reward(creature_B, creature_A, '*STALEMATE*', 6)
-  return (*finalize_battle(creature_A, creature_B, rewards, battle_log, stalemate=True),
-          last_input_A, last_input_B)
+  _log_marker(epoch, tick, creature_A, creature_B, battle_log, '*STALEMATE*')
+  _log_marker(epoch, tick, creature_B, creature_A, battle_log, '*STALEMATE*')
+  return (*finalize_battle(creature_A, creature_B, rewards, battle_log, stalemate=True), *last_inputs)
 
 
 def finalize_battle(creature_A, creature_B, rewards, battle_log, stalemate=False):
-  """Determine winner, apply rewards, and finalize log ordering."""
-  reward_win_A = creature_A.reward_config.get('win', CONFIG['reward_win'])
-  reward_lose_A = creature_A.reward_config.get('lose', CONFIG['reward_lose'])
-  reward_win_B = creature_B.reward_config.get('win', CONFIG['reward_win'])
-  reward_lose_B = creature_B.reward_config.get('lose', CONFIG['reward_lose'])
+  """Determine winner, apply rewards, and finalize log ordering. rewards is [reward_A, reward_B]."""
 
   winner = None
   if stalemate:
     winner = "stalemate"
   elif creature_A.hp > creature_B.hp:
-    rewards[creature_A.name] += reward_win_A
-    rewards[creature_B.name] += reward_lose_B
+    rewards[0] += creature_A.reward_win
+    rewards[1] += creature_B.reward_lose
     winner = creature_A.name
   elif creature_B.hp > creature_A.hp:
-    rewards[creature_B.name] += reward_win_B
-    rewards[creature_A.name] += reward_lose_A
+    rewards[1] += creature_B.reward_win
+    rewards[0] += creature_A.reward_lose
     winner = creature_B.name
 
   if not stalemate:
-    for entry in reversed(battle_log):
-      if entry['creature'] == creature_A.name:
-        entry['reward'] += rewards[creature_A.name]
-        break
-    for entry in reversed(battle_log):
-      if entry['creature'] == creature_B.name:
-        entry['reward'] += rewards[creature_B.name]
-        break
+    battle_log.add_final_reward(0, rewards[0])
+    battle_log.add_final_reward(1, rewards[1])
 
   if CONFIG['sort_logs_by_creature']:
-    battle_log.sort(key=lambda x: (x['creature'], x['epoch'], x['tick']))
+    battle_log.sort_by_creature()
+  battle_log.trim()
 
-  return rewards[creature_A.name], rewards[creature_B.name], battle_log, winner
+  return rewards[0], rewards[1], battle_log, winner
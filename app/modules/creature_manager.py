@@ -1,33 +1,82 @@
 # app/modules/creature_manager.py
-import os
-import json
-import itertools
 import copy
 import numpy as np
-import torch
-import torch.optim as optim
-from app.config import ACTION_NAMES, CONFIG, CREATURE_TEMPLATES, DOT_DAMAGE, SPECIAL_ABILITIES
-from app.modules.neural_network import NeuralNetwork
+from app.config import CONFIG, CREATURE_TEMPLATES, DOT_DAMAGE, SPECIAL_ABILITIES, STATUS_NAMES
+from app.modules.model_factory import build_model, create_optimizer, model_spec, private_copy, shared_model
+from app.modules.session_registry import IdAllocator, active_sessions, remove_session, touch_sessions
+from app.modules.storage import get_storage
+from app.modules.weight_bank import assign_slot, release_slot
 
-CREATURE_DIR = "creatures"
-os.makedirs(CREATURE_DIR, exist_ok=True)
-
-# Active creature registry (for creatures currently in memory)
+# Active creature registry (for creatures currently in memory in this process);
+# which creatures are active across all workers is tracked in the session registry
 # Key: "id_name"
 _active_creatures: dict[str, 'Creature'] = {}
 
-# global unique ID counter
-_creature_id_counter = itertools.count(1)
+# Durable unique IDs, block-allocated from the session registry
+_creature_id_counter = IdAllocator('creature')
+
+# ID of play-only template placeholders (see init_template_creatures); real IDs start at 1
+TEMPLATE_CREATURE_ID = 0
 
 def _make_key(creature_id: int, name: str) -> str:
   return f"{creature_id}_{name}"
 
+# ------------------ Compiled Actions ------------------
+#
+# Reward tables and special-ability effects are resolved once, when a creature
+# is built, into one row per action:
+#   (kind, reward, energy_cost, status_index, duration, blocked_by_index)
+# so a battle tick is a tuple unpack plus integer arithmetic on the status
+# counters (one int per STATUS_NAMES entry) instead of dict lookups and closures.
+
+ACT_ATTACK, ACT_DEFEND, ACT_RECOVER, ACT_SPECIAL, ACT_NONE = range(5)
+STUN, POISON, DEFEND = (STATUS_NAMES.index(name) for name in ('stun', 'poison', 'defend'))
+NO_STATUSES = (0,) * len(STATUS_NAMES)
+
+def compile_actions(special_abilities, reward_config):
+  """Return (action_names, action_table) for a creature's abilities and reward_config."""
+  names = ['attack', 'defend', 'recover']
+  table = [
+    (ACT_ATTACK, reward_config.get('attack', CONFIG['reward_attack']), 0, -1, 0, -1),
+    (ACT_DEFEND, reward_config.get('defend', CONFIG['reward_defend']), 0, -1, 0, -1),
+    (ACT_RECOVER, reward_config.get('recover', CONFIG['reward_recover']), 0, -1, 0, -1),
+  ]
+  for ability_name in special_abilities:
+    names.append(ability_name)
+    ability = SPECIAL_ABILITIES.get(ability_name)
+    if ability is None:
+      table.append((ACT_NONE, 0.0, 0, -1, 0, -1))
+      continue
+    blocked_by = ability['blocked_by']
+    table.append((
+      ACT_SPECIAL,
+      reward_config.get(ability_name, 0.01),
+      ability['energy_cost'],
+      STATUS_NAMES.index(ability['status']),
+      ability['duration'],
+      STATUS_NAMES.index(blocked_by) if blocked_by else -1,
+    ))
+  return tuple(names), tuple(table)
+
 class Creature:
+  __slots__ = (
+    'id', 'name', 'owner', 'nn_spec', '_nn', '_nn_shared', 'optimizer', 'policy',
+    'hp', 'max_hp', 'energy', 'max_energy', 'speed', 'special_abilities', 'reward_config', 'nn_config',
+    'status', 'action_names', 'actions', 'reward_win', 'reward_lose',
+    'attack_damage', 'defended_damage', 'energy_regen', 'energy_recover', 'poison_damage',
+    'activations_history',
+  )
+
   def __init__(self, name, owner, nn_model, config_stats, creature_id=None):
-    self.id = creature_id or next(_creature_id_counter)
+    self.id = creature_id if creature_id is not None else next(_creature_id_counter)
     self.name = name
     self.owner = owner
-    self.nn = nn_model
+
+    # nn_model=None means "use the shared template weights" (see model_factory)
+    self.nn_spec = model_spec(config_stats)
+    self._nn = nn_model
+    self._nn_shared = nn_model is None
+    self.optimizer = None
 
     # Base stats
     self.hp = config_stats['hp']
@@ -38,75 +87,111 @@ class Creature:
     self.special_abilities = config_stats.get('special_abilities', [])
     self.reward_config = config_stats.get('reward_config', {})
 
-    # Runtime state
-    self.statuses = {}
-    self.runtime_state = {
-      "hp": self.hp,
-      "energy": self.energy,
-      "statuses": self.statuses
-    }
+    # Runtime state: one countdown per STATUS_NAMES entry (0 = inactive)
+    self.status = list(NO_STATUSES)
 
     # NN config
     self.nn_config = config_stats.get('nn_config', {})
 
-    # Actions list
-    self.actions = [
-      ('attack', self.attack),
-      ('defend', self.defend),
-      ('recover', self.recover),
-    ]
-    for ability_name in self.special_abilities:
-      self.actions.append((ability_name, self.use_special))
+    # Optional NumPy weight snapshot used for rollouts (see numpy_policy.refresh_policy)
+    self.policy = None
+
+    # Training-only activation capture (see training_loop)
+    self.activations_history = []
+
+    # Precompiled action dispatch table and battle constants
+    self.action_names, self.actions = compile_actions(self.special_abilities, self.reward_config)
+    self.reward_win = self.reward_config.get('win', CONFIG['reward_win'])
+    self.reward_lose = self.reward_config.get('lose', CONFIG['reward_lose'])
+    self.attack_damage = CONFIG['attack_damage']
+    self.defended_damage = int(np.ceil(CONFIG['attack_damage'] / 2))
+    self.energy_regen = CONFIG['energy_regen_base']
+    self.energy_recover = CONFIG['energy_regen_recover']
+    self.poison_damage = DOT_DAMAGE['poison_damage']
+
+  @property
+  def nn(self):
+    if self._nn_shared:
+      # Resolved on every access so play creatures pick up newly published weights
+      return shared_model(self.nn_spec, self.name)
+    return self._nn
+
+  @nn.setter
+  def nn(self, model):
+    self._nn = model
+    self._nn_shared = False
+
+  def own_nn(self):
+    """Copy-on-write: swap shared template weights for a private, trainable copy."""
+    if self._nn_shared:
+      self._nn = private_copy(self.nn)
+      self._nn_shared = False
+    return self._nn
+
+  @property
+  def statuses(self):
+    """Active statuses as {name: remaining ticks}."""
+    return {name: n for name, n in zip(STATUS_NAMES, self.status) if n > 0}
+
+  @property
+  def runtime_state(self):
+    return {"hp": self.hp, "energy": self.energy, "statuses": self.statuses}
+
+  def battle_copy(self, name=None, policy=None):
+    """Shallow copy with its own hp/energy/statuses, so concurrent battles never share runtime state.
+
+    Weights and compiled actions are shared with this creature, not copied.
+    """
+    clone = copy.copy(self)
+    clone.status = list(NO_STATUSES)
+    clone.name = name or self.name
+    clone.policy = policy
+    clone.reset()
+    return clone
 
   def reset(self):
     self.hp = self.max_hp
     self.energy = self.max_energy
-    self.statuses = {}
-    self.runtime_state = {
-      "hp": self.hp,
-      "energy": self.energy,
-      "statuses": self.statuses
-    }
+    self.status[:] = NO_STATUSES
 
   def is_alive(self):
     return self.hp > 0
 
-  def process_statuses(self, opponent, abl_zero_reward):
-    for status in list(self.statuses.keys()):
-      if status == 'poison':
-        self.hp -= DOT_DAMAGE['poison_damage']
-        if self.hp <= 0:
-          abl_zero_reward(self, opponent, '*POISONED*', 99)
-      self.statuses[status] -= 1
-      if self.statuses[status] <= 0:
-        del self.statuses[status]
-
-  def attack(self, opponent):
-    dmg = CONFIG['attack_damage']
-    if 'defend' in opponent.statuses:
-      dmg = int(np.ceil(dmg / 2))
-    opponent.hp -= dmg
-    self.energy = min(self.max_energy, self.energy + CONFIG['energy_regen_base'])
-    return self.reward_config.get('attack', CONFIG['reward_attack'])
-
-  def defend(self, opponent=None):
-    self.statuses['defend'] = 1
-    self.energy = min(self.max_energy, self.energy + CONFIG['energy_regen_base'])
-    return self.reward_config.get('defend', CONFIG['reward_defend'])
-
-  def use_special(self, opponent, ability_name):
-    ability = SPECIAL_ABILITIES.get(ability_name)
-    if ability and self.energy >= ability['energy_cost']:
-      self.energy -= ability['energy_cost']
-      ability['apply'](self, opponent)
-      return self.reward_config.get(ability_name, 0.01)
-    return 0.0
+  def take_poison_damage(self):
+    """Apply damage over time (before count_down_statuses); returns True if poison knocked us out."""
+    if self.status[POISON]:
+      self.hp -= self.poison_damage
+      return self.hp <= 0
+    return False
+
+  def count_down_statuses(self):
+    status = self.status
+    for i, n in enumerate(status):
+      if n:
+        status[i] = n - 1
 
-  def recover(self, opponent=None):
-    if self.energy >= self.max_energy:
-      return -self.reward_config.get('recover', CONFIG['reward_recover'])
-    self.energy = min(self.max_energy, self.energy + CONFIG['energy_regen_recover'])
-    return self.reward_config.get('recover', CONFIG['reward_recover'])
+  def act(self, action_index, opponent):
+    """Execute compiled action action_index against opponent; returns its reward."""
+    kind, reward, energy_cost, status_index, duration, blocked_by = self.actions[action_index]
+    if kind == ACT_ATTACK:
+      opponent.hp -= self.defended_damage if opponent.status[DEFEND] else self.attack_damage
+      self.energy = min(self.max_energy, self.energy + self.energy_regen)
+      return reward
+    if kind == ACT_DEFEND:
+      self.status[DEFEND] = 1
+      self.energy = min(self.max_energy, self.energy + self.energy_regen)
+      return reward
+    if kind == ACT_RECOVER:
+      if self.energy >= self.max_energy:
+        return -reward
+      self.energy = min(self.max_energy, self.energy + self.energy_recover)
+      return reward
+    if kind == ACT_SPECIAL and self.energy >= energy_cost:
+      self.energy -= energy_cost
+      if blocked_by < 0 or not opponent.status[blocked_by]:
+        opponent.status[status_index] = duration
+      return reward
+    return 0.0
 
   def to_dict(self):
     return {
@@ -136,54 +221,67 @@ class Creature:
     return creature
 
 def init_creatures(creature_dict):
+  """Build trainable creatures (private weights + optimizer) for the training loop."""
   creatures = {}
   optimizers = {}
-  input_size = len(ACTION_NAMES)
 
   for name, stats in creature_dict.items():
-    nn_output_size = 3 + len(stats.get('special_abilities', []))
-    nn = NeuralNetwork(input_size, stats.get('nn_config', {}).get('hidden_sizes', CONFIG['hidden_sizes']), nn_output_size)
-    optimizer = optim.Adam(nn.parameters(), lr=stats.get('nn_config', {}).get('learning_rate', CONFIG['learning_rate']))
-    creature = Creature(name, owner="SYSTEM", nn_model=nn, config_stats=stats)
+    # Not persisted, so they take TEMPLATE_CREATURE_ID instead of durable IDs from the registry
+    creature = Creature(name, owner="SYSTEM", nn_model=build_model(model_spec(stats)), config_stats=stats,
+                        creature_id=TEMPLATE_CREATURE_ID)
+    creature.optimizer = create_optimizer(creature)
     creatures[name] = creature
-    optimizers[name] = optimizer
+    optimizers[name] = creature.optimizer
   return creatures, optimizers
 
+def init_template_creatures(creature_dict):
+  """Build play-only creatures that share template weights; no models or optimizers are created.
+
+  They are placeholders for creatures without a stored record, so they take
+  TEMPLATE_CREATURE_ID rather than using up durable IDs on every login.
+  """
+  return {name: Creature(name, owner="SYSTEM", nn_model=None, config_stats=stats, creature_id=TEMPLATE_CREATURE_ID)
+          for name, stats in creature_dict.items()}
+
 def save_creature(creature: Creature):
-  os.makedirs(CREATURE_DIR, exist_ok=True)
-  path = os.path.join(CREATURE_DIR, f"creature_{creature.id}_{creature.name}.json")
-  with open(path, "w") as f:
-    json.dump(creature.to_dict(), f, indent=2)
+  get_storage().save_creatures([creature.to_dict()])
   _active_creatures[_make_key(creature.id, creature.name)] = creature
-  return path
+  return creature
 
 def load_creature(creature_id, name, nn_model):
-  path = os.path.join(CREATURE_DIR, f"creature_{creature_id}_{name}.json")
-  if not os.path.exists(path):
+  data = get_storage().load_creature(creature_id, name)
+  if data is None:
     return None
-  with open(path, "r") as f:
-    data = json.load(f)
   creature = Creature.from_dict(data, nn_model)
   _active_creatures[_make_key(creature.id, creature.name)] = creature
   return creature
 
+def creature_session(creature: Creature):
+  """The (kind, key, data) session entry that marks creature as active."""
+  return ('creature', _make_key(creature.id, creature.name),
+          {"id": creature.id, "name": creature.name, "owner": creature.owner})
+
 def add_active_creature(creature: Creature):
   key = _make_key(creature.id, creature.name)
   _active_creatures[key] = creature
+  touch_sessions([creature_session(creature)])
+  # Slot in the stacked weight bank for batched play inference
+  assign_slot(key, creature)
   return creature
 
 def remove_active_creature(creature_id, name):
   key = _make_key(creature_id, name)
   _active_creatures.pop(key, None)
+  release_slot(key)
+  remove_session('creature', key)
 
 def list_active_creatures():
-  return list(_active_creatures.keys())
+  """Keys of creatures active on any worker."""
+  return list(active_sessions('creature'))
 
 def create_creature(template_key, owner):
   template = CREATURE_TEMPLATES[template_key]
-  nn_output_size = 3 + len(template.get('special_abilities', []))
-  nn_model = NeuralNetwork(len(ACTION_NAMES), template.get('nn_config', {}).get('hidden_sizes', CONFIG['hidden_sizes']), nn_output_size)
   creature_id = next(_creature_id_counter)
-  creature = Creature(template['name'], owner, nn_model, template, creature_id=creature_id)
+  creature = Creature(template['name'], owner, None, template, creature_id=creature_id)
   save_creature(creature)
   return creature
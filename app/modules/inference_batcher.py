@@ -0,0 +1,100 @@
+import asyncio
+import time
+import weakref
+import numpy as np
+from app.config import ACTION_NAMES, CONFIG
+from app.modules.metrics import enabled as metrics_enabled, inference_batch_size, inference_queue_depth, inference_wait_seconds
+from app.modules.weight_bank import assign_slot, bank_slot
+
+# ------------------ Inference Batcher ------------------
+#
+# Concurrent battles (PvP games, several jobs) each ask for one action at a
+# time. Instead of one forward pass per request, async callers enqueue
+# (creature, state) and await a future; the queue is flushed when it holds
+# CONFIG['inference_batch_max_size'] requests or CONFIG['inference_batch_max_latency']
+# seconds after the first request of the batch arrived. A flush runs one
+# WeightBank forward per architecture and resolves every future with
+# (action_idx, probs), sampled exactly as NumpyPolicy.choose_action does.
+# One batcher serves each event loop (see get_batcher).
+
+
+class InferenceBatcher:
+  def __init__(self, max_batch_size=None, max_latency=None):
+    self.max_batch_size = max_batch_size or CONFIG['inference_batch_max_size']
+    self.max_latency = CONFIG['inference_batch_max_latency'] if max_latency is None else max_latency
+    self.pending = []  # (bank, slot, state, eps, future, enqueued_at)
+    self.timer = None
+
+  async def choose_action(self, creature, state, eps):
+    """Queue one action request for creature; returns (action_idx, probs) once its batch ran."""
+    key = f"{creature.id}_{creature.name}"
+    located = bank_slot(key)
+    if located is None or located[0].creatures.get(located[1]) is not creature:
+      located = assign_slot(key, creature)
+    bank, slot = located
+
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    self.pending.append((bank, slot, np.asarray(state, dtype=np.float32), eps, future, time.perf_counter()))
+    if len(self.pending) >= self.max_batch_size:
+      self.flush()
+    elif self.timer is None:
+      self.timer = loop.call_later(self.max_latency, self.flush)
+    return await future
+
+  def flush(self):
+    if self.timer is not None:
+      self.timer.cancel()
+      self.timer = None
+    batch, self.pending = self.pending, []
+    if not batch:
+      return
+    started = time.perf_counter()
+    if metrics_enabled():
+      inference_batch_size.observe(len(batch))
+      for request in batch:
+        inference_wait_seconds.observe(started - request[5])
+
+    # One forward per architecture present in the batch
+    groups = {}
+    for request in batch:
+      groups.setdefault(id(request[0]), []).append(request)
+    for requests in groups.values():
+      try:
+        bank = requests[0][0]
+        probs = bank.probs(np.array([r[1] for r in requests]), np.stack([r[2] for r in requests]))
+      except Exception as e:
+        for request in requests:
+          if not request[4].done():
+            request[4].set_exception(e)
+        continue
+      for (_, _, _, eps, future, _), row in zip(requests, probs):
+        if not future.done():
+          future.set_result((sample_action(row, eps), row))
+
+
+def sample_action(probs, eps):
+  """Epsilon-greedy inverse-CDF sample, as in NumpyPolicy.choose_action."""
+  if np.random.rand() < eps:
+    return np.random.randint(len(ACTION_NAMES))
+  cdf = np.cumsum(probs)
+  return min(int(np.searchsorted(cdf, np.random.rand() * cdf[-1], side='right')), len(probs) - 1)
+
+
+_batchers: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, InferenceBatcher]' = weakref.WeakKeyDictionary()
+
+inference_queue_depth.set_function(lambda: sum(len(b.pending) for b in list(_batchers.values())))
+
+
+def get_batcher() -> InferenceBatcher:
+  """The batcher of the running event loop (futures and timers are bound to one loop)."""
+  loop = asyncio.get_running_loop()
+  batcher = _batchers.get(loop)
+  if batcher is None:
+    batcher = _batchers[loop] = InferenceBatcher()
+  return batcher
+
+
+async def choose_action_batched(creature, state, eps):
+  """Async counterpart of utils.choose_action through the running loop's batcher."""
+  return await get_batcher().choose_action(creature, state, eps)
@@ -0,0 +1,249 @@
+import os
+import threading
+import time
+from sortedcontainers import SortedList
+from app.config import CONFIG
+from app.modules.storage import SqlitePool
+
+# ------------------ Leaderboard ------------------
+#
+# Elo ratings for players and creatures, updated after every PvP battle.
+# Each process keeps a rating-ordered index per kind (a SortedList, built
+# with one sort on the initial load), so updates, top-K pages, rank-of and
+# neighborhood queries are O(log n) plus the slice rather than a sort per request.
+#
+# Rating changes are applied to the local index immediately and accumulated as
+# deltas; at most every CONFIG['leaderboard_flush_seconds'] the deltas are
+# added to the ratings table (in the storage database) and rows changed by
+# other workers since the last sync are read back. Because flushes add deltas
+# instead of overwriting ratings, concurrent workers never lose each other's
+# results.
+
+KINDS = ('player', 'creature')
+# Re-read window before the newest row seen, for flushes that committed after
+# they stamped updated_at (re-reading a row is harmless: values are absolute)
+SYNC_OVERLAP_SECONDS = 5.0
+
+
+def expected_score(rating, opponent_rating):
+  return 1.0 / (1.0 + 10 ** ((opponent_rating - rating) / 400.0))
+
+
+class RatingIndex:
+  """Entries ordered by rating (highest first, ties by key) with O(log n) positional queries."""
+
+  def __init__(self, entries=()):
+    """Index entries (e.g. every stored row) with a single sort."""
+    self.entries = {entry['key']: entry for entry in entries}  # key -> entry dict
+    self.order = SortedList((-entry['rating'], key) for key, entry in self.entries.items())
+
+  def upsert(self, entry):
+    previous = self.entries.get(entry['key'])
+    if previous is not None:
+      self.order.remove((-previous['rating'], previous['key']))
+    self.entries[entry['key']] = entry
+    self.order.add((-entry['rating'], entry['key']))
+
+  def rank(self, key):
+    """1-based rank of key, or None."""
+    entry = self.entries.get(key)
+    if entry is None:
+      return None
+    return self.order.bisect_left((-entry['rating'], key)) + 1
+
+  def page(self, limit, after=None):
+    """Up to limit entries after the cursor position after=(rating, key) (from the top if None)."""
+    start = self.order.bisect_right((-after[0], after[1])) if after else 0
+    return [self._ranked(start + i, key) for i, (_, key) in enumerate(self.order[start:start + limit])]
+
+  def around(self, key, radius):
+    rank = self.rank(key)
+    if rank is None:
+      return []
+    start = max(0, rank - 1 - radius)
+    return [self._ranked(start + i, k) for i, (_, k) in enumerate(self.order[start:rank + radius])]
+
+  def _ranked(self, position, key):
+    return {"rank": position + 1, **self.entries[key]}
+
+  def __len__(self):
+    return len(self.order)
+
+
+class Leaderboard(SqlitePool):
+  SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS ratings (
+      kind TEXT NOT NULL,
+      key TEXT NOT NULL,
+      name TEXT NOT NULL,
+      rating REAL NOT NULL,
+      games INTEGER NOT NULL,
+      wins INTEGER NOT NULL,
+      losses INTEGER NOT NULL,
+      draws INTEGER NOT NULL,
+      updated_at REAL NOT NULL,
+      PRIMARY KEY (kind, key)
+    )""",
+    "CREATE INDEX IF NOT EXISTS ratings_by_update ON ratings (updated_at)",
+  )
+
+  # Deltas are added to the stored row, so flushes from several workers commute
+  UPSERT_DELTA = (
+    "INSERT INTO ratings (kind, key, name, rating, games, wins, losses, draws, updated_at) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (kind, key) DO UPDATE SET name = excluded.name, "
+    "rating = ratings.rating + excluded.rating - ?, games = ratings.games + excluded.games, "
+    "wins = ratings.wins + excluded.wins, losses = ratings.losses + excluded.losses, "
+    "draws = ratings.draws + excluded.draws, updated_at = excluded.updated_at"
+  )
+  COUNTERS = ('rating', 'games', 'wins', 'losses', 'draws')
+
+  def __init__(self, path, pool_size=4):
+    super().__init__(path, pool_size)
+    self.indexes = {kind: RatingIndex() for kind in KINDS}
+    self.pending = {kind: {} for kind in KINDS}  # key -> unflushed deltas
+    self.lock = threading.RLock()
+    self.synced_at = None   # database clock of the last sync (None before the initial load)
+    self.flushed_at = None  # monotonic time of the last flush
+    self.sync()
+
+  def _entry(self, kind, key, name):
+    entry = self.indexes[kind].entries.get(key)
+    if entry is None:
+      entry = {"key": key, "name": name, "rating": CONFIG['rating_initial'],
+               "games": 0, "wins": 0, "losses": 0, "draws": 0}
+    return entry
+
+  def _apply(self, kind, key, name, delta, score):
+    counts = {"rating": delta, "games": 1, "wins": int(score > 0.5),
+              "losses": int(score < 0.5), "draws": int(score == 0.5)}
+    entry = dict(self._entry(kind, key, name))
+    for field, value in counts.items():
+      entry[field] += value
+    entry['name'] = name
+    self.indexes[kind].upsert(entry)
+    pending = self.pending[kind].setdefault(key, {"name": name, **{field: 0 for field in self.COUNTERS}})
+    for field, value in counts.items():
+      pending[field] += value
+
+  def record(self, kind, a, b, score_a):
+    """Elo update for one result between a=(key, name) and b.
+
+    score_a is 1 (a won), 0 or 0.5 for a game, or a's average score over a
+    series; a result counts as one game, won by whoever scored more.
+    """
+    with self.lock:
+      rating_a = self._entry(kind, *a)['rating']
+      rating_b = self._entry(kind, *b)['rating']
+      delta = CONFIG['rating_k_factor'] * (score_a - expected_score(rating_a, rating_b))
+      self._apply(kind, *a, delta, score_a)
+      self._apply(kind, *b, -delta, 1.0 - score_a)
+
+  def flush(self):
+    """Add pending deltas to the ratings table and pull rows other workers changed."""
+    with self.lock:
+      rows = []
+      now = time.time()
+      initial = CONFIG['rating_initial']
+      for kind, pending in self.pending.items():
+        for key, d in pending.items():
+          rows.append((kind, key, d['name'], initial + d['rating'], d['games'], d['wins'],
+                       d['losses'], d['draws'], now, initial))
+      if rows:
+        with self.transaction() as conn:
+          conn.executemany(self.UPSERT_DELTA, rows)
+      self.pending = {kind: {} for kind in KINDS}
+      self.flushed_at = time.monotonic()
+      self.sync()
+
+  def sync(self):
+    """Re-read rows updated since the last sync (absolute values, then local unflushed deltas on top).
+
+    The first sync loads every row and builds each index with one sort.
+    """
+    with self.lock:
+      initial = self.synced_at is None
+      since = float('-inf') if initial else self.synced_at - SYNC_OVERLAP_SECONDS
+      with self.connection() as conn:
+        rows = conn.execute(
+          "SELECT kind, key, name, rating, games, wins, losses, draws, updated_at FROM ratings "
+          "WHERE updated_at >= ?", (since,)).fetchall()
+      synced_at = self.synced_at or 0.0
+      loaded = {kind: [] for kind in KINDS}
+      for kind, key, name, rating, games, wins, losses, draws, updated_at in rows:
+        entry = {"key": key, "name": name, "rating": rating, "games": games,
+                 "wins": wins, "losses": losses, "draws": draws}
+        for field, value in self.pending[kind].get(key, {}).items():
+          if field != 'name':
+            entry[field] += value
+        if initial:
+          loaded[kind].append(entry)
+        else:
+          self.indexes[kind].upsert(entry)
+        synced_at = max(synced_at, updated_at)
+      self.synced_at = synced_at
+      if initial:
+        self.indexes = {kind: RatingIndex(entries) for kind, entries in loaded.items()}
+
+  def maybe_flush(self):
+    if self.flushed_at is None or time.monotonic() - self.flushed_at >= CONFIG['leaderboard_flush_seconds']:
+      self.flush()
+
+  def index(self, kind):
+    self.maybe_flush()
+    return self.indexes[kind]
+
+
+_leaderboard: Leaderboard | None = None
+_leaderboard_pid = None
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard() -> Leaderboard:
+  """Process-wide leaderboard, loaded on first use (and again in a forked child)."""
+  global _leaderboard, _leaderboard_pid
+  if _leaderboard is None or _leaderboard_pid != os.getpid():
+    with _leaderboard_lock:
+      if _leaderboard is None or _leaderboard_pid != os.getpid():
+        _leaderboard = Leaderboard(CONFIG['storage_sqlite_path'], CONFIG['storage_pool_size'])
+        _leaderboard_pid = os.getpid()
+  return _leaderboard
+
+
+def flush_leaderboard():
+  """Write this process's pending rating deltas (on shutdown); a no-op if it never loaded the leaderboard."""
+  if _leaderboard is not None and _leaderboard_pid == os.getpid():
+    _leaderboard.flush()
+
+
+# ------------------ Battle Results ------------------
+
+def _score(winner):
+  """Side 0's score for a winner of 0, 1, 'stalemate' or None (draw)."""
+  if winner == 0:
+    return 1.0
+  if winner == 1:
+    return 0.0
+  return 0.5
+
+
+def record_battle(players, creatures, winner):
+  """Rate one PvP result. players: ((key, name), (key, name)); winner: 0, 1, 'stalemate' or None (draw)."""
+  _record(players, creatures, _score(winner))
+
+
+def record_series(players, creatures, winners):
+  """Rate a series of rematches as one result (side 0's average score), so a series moves ratings by at most K."""
+  _record(players, creatures, sum(_score(winner) for winner in winners) / len(winners))
+
+
+def _record(players, creatures, score):
+  board = get_leaderboard()
+  board.record('player', *players, score)
+  board.record('creature', *((f"{c.id}_{c.name}", c.name) for c in creatures), score)
+  board.maybe_flush()
+
+
+def rating_of(kind, key):
+  entry = get_leaderboard().index(kind).entries.get(key)
+  return entry['rating'] if entry else CONFIG['rating_initial']
@@ -1,31 +1,230 @@
 import json
 import os
-from app.config import CONFIG
-from app.modules.utils import create_state
+import numpy as np
+from app.config import ACTION_NAMES, CONFIG, SPECIAL_ABILITIES, STATUS_NAMES
+
+# ------------------ Battle Log ------------------
+
+# Event vocabulary shared by every log: real actions first, then the
+# zero-reward markers written by simulate_battle.
+EVENT_MESSAGES = ['*KNOCKOUT*', '*STUNNED*', '*POISONED*', '*STALEMATE*']
+LOG_ACTIONS = ['attack', 'defend', 'recover', *SPECIAL_ABILITIES.keys(), *EVENT_MESSAGES]
+LOG_ACTION_CODES = {name: code for code, name in enumerate(LOG_ACTIONS)}
+
+class BattleLog:
+  """Preallocated columnar trajectory buffer for one battle (or a concatenation of battles).
+
+  Rows are events; iterating or indexing yields dict views with the same keys
+  the dict-based log used, built lazily for the text/JSON writers.
+  """
+  def __init__(self, epoch, creatures, max_ticks=None, capacity=None):
+    self.epoch = epoch
+    self.names = tuple(c.name for c in creatures)
+    self.action_names = tuple(tuple(c.action_names) for c in creatures)
+    self.prob_width = max(max(len(names) for names in self.action_names), len(ACTION_NAMES))
+    capacity = capacity or 2 * (max_ticks or CONFIG['max_ticks']) + 4
+    self.size = 0
+    self.tick = np.zeros(capacity, dtype=np.int16)
+    self.creature = np.zeros(capacity, dtype=np.int8)
+    self.action = np.zeros(capacity, dtype=np.int8)
+    self.action_idx = np.zeros(capacity, dtype=np.int8)
+    self.state = np.zeros((capacity, len(ACTION_NAMES)), dtype=np.float32)
+    self.probs = np.zeros((capacity, self.prob_width), dtype=np.float32)
+    self.hp = np.zeros(capacity, dtype=np.int16)
+    self.energy = np.zeros(capacity, dtype=np.int16)
+    self.statuses = np.zeros((capacity, len(STATUS_NAMES)), dtype=np.int8)
+    self.reward = np.zeros(capacity, dtype=np.float32)
+
+  COLUMNS = ('tick', 'creature', 'action', 'action_idx', 'state', 'probs', 'hp', 'energy', 'statuses', 'reward')
+
+  def _grow(self):
+    for column in self.COLUMNS:
+      values = getattr(self, column)
+      grown = np.zeros((len(values) * 2, *values.shape[1:]), dtype=values.dtype)
+      grown[:len(values)] = values
+      setattr(self, column, grown)
+
+  def append(self, tick, creature_idx, action_name, action_idx, state, probs, hp, energy, statuses, reward):
+    if self.size == len(self.tick):
+      self._grow()
+    i = self.size
+    self.tick[i] = tick
+    self.creature[i] = creature_idx
+    self.action[i] = LOG_ACTION_CODES[action_name]
+    self.action_idx[i] = action_idx
+    self.state[i] = state
+    if probs is not None:
+      self.probs[i, :len(probs)] = probs
+    self.hp[i] = hp
+    self.energy[i] = energy
+    self.statuses[i] = statuses
+    self.reward[i] = reward
+    self.size += 1
+
+  def trim(self):
+    """Release unused preallocated rows once the battle is over."""
+    for column in self.COLUMNS:
+      setattr(self, column, getattr(self, column)[:self.size].copy())
+    return self
+
+  @classmethod
+  def from_columns(cls, epoch, creatures, **columns):
+    """Wrap already-built column arrays (e.g. from the batched engine)."""
+    log = cls(epoch, creatures, capacity=1)
+    for column in cls.COLUMNS:
+      setattr(log, column, columns[column])
+    log.size = len(columns['tick'])
+    return log
+
+  def columns(self, creature_name=None, actions_only=False):
+    """Dict of column views, optionally restricted to one creature's (non-marker) rows."""
+    mask = np.ones(self.size, dtype=bool)
+    if creature_name is not None:
+      mask &= self.creature[:self.size] == self.names.index(creature_name)
+    if actions_only:
+      mask &= self.action_idx[:self.size] >= 0
+    return {column: getattr(self, column)[:self.size][mask] for column in self.COLUMNS}
+
+  def add_final_reward(self, creature_idx, amount):
+    """Add amount to the creature's last entry, as finalize_battle credits episode rewards."""
+    rows = np.flatnonzero(self.creature[:self.size] == creature_idx)
+    if rows.size:
+      self.reward[rows[-1]] += amount
+
+  def sort_by_creature(self):
+    rank = np.argsort(np.argsort(self.names))
+    order = np.lexsort((self.tick[:self.size], rank[self.creature[:self.size]]))
+    for column in self.COLUMNS:
+      values = getattr(self, column)
+      values[:self.size] = values[:self.size][order]
+
+  @classmethod
+  def concatenate(cls, logs):
+    """One log holding every row of logs (same creature pair), e.g. all battles of an epoch."""
+    merged = cls.__new__(cls)
+    merged.epoch = logs[0].epoch
+    merged.names = logs[0].names
+    merged.action_names = logs[0].action_names
+    merged.prob_width = logs[0].prob_width
+    merged.size = sum(log.size for log in logs)
+    for column in cls.COLUMNS:
+      setattr(merged, column, np.concatenate([getattr(log, column)[:log.size] for log in logs]))
+    return merged
+
+  def __len__(self):
+    return self.size
+
+  def __getitem__(self, i):
+    if i < 0:
+      i += self.size
+    if not 0 <= i < self.size:
+      raise IndexError(i)
+    creature_idx = int(self.creature[i])
+    action_idx = int(self.action_idx[i])
+    if action_idx >= 0:
+      probs = self.probs[i, :len(self.action_names[creature_idx])].tolist()
+    else:
+      probs = [0.0] * len(ACTION_NAMES)
+    return {
+      'epoch': self.epoch,
+      'tick': int(self.tick[i]),
+      'creature': self.names[creature_idx],
+      'state': self.state[i].tolist(),
+      'action': LOG_ACTIONS[self.action[i]],
+      'action_idx': action_idx,
+      'probs': probs,
+      'hp': int(self.hp[i]),
+      'energy': int(self.energy[i]),
+      'statuses': {status: int(n) for status, n in zip(STATUS_NAMES, self.statuses[i]) if n > 0},
+      'reward': float(self.reward[i]),
+    }
+
+  def __iter__(self):
+    return (self[i] for i in range(self.size))
 
 # ------------------ Append Battle Log ------------------
 
-def append_battle_log(epoch, tick, creature, opponent, battle_log, action_name, probs, action_idx, reward):
-  """Append a single battle event to the log."""
-  data = {
-    'epoch': epoch,
-    'tick': tick,
-    'creature': creature.name,
-    'state': create_state(creature, opponent).detach().numpy().tolist(),
-    'action': action_name,
-    'action_idx': int(action_idx),
-    'probs': probs.detach().numpy().tolist() if hasattr(probs, 'detach') else list(probs),
-    'hp': creature.hp,
-    'energy': creature.energy,
-    'statuses': creature.statuses.copy(),
-    'reward': reward,
-  }
-  battle_log.append(data)
+def append_battle_log(epoch, tick, creature, opponent, battle_log, action_name, probs, action_idx, reward, state=None):
+  """Append a single battle event to the log.
+
+  state is the input the action was chosen from; marker events without one
+  record the current hp/energy of both creatures.
+  """
+  if state is None:
+    state = (creature.hp, creature.energy, opponent.hp, opponent.energy)
+  elif hasattr(state, 'detach'):
+    state = state.detach().numpy()
+  if hasattr(probs, 'detach'):
+    probs = probs.detach().numpy()
+  battle_log.append(
+    tick,
+    battle_log.names.index(creature.name),
+    action_name,
+    action_idx,
+    state,
+    probs if action_idx >= 0 else None,
+    creature.hp,
+    creature.energy,
+    creature.status,
+    reward
+  )
+
+# ------------------ Training Statistics ------------------
+
+# Summary stat key for every counted log action
+SUMMARY_STAT_KEYS = {
+  'attack': 'attack', 'defend': 'defend', 'poison': 'poison', 'stun': 'stun', 'recover': 'recover',
+  '*KNOCKOUT*': 'knockout', '*STUNNED*': 'stunned', '*POISONED*': 'poisoned', '*STALEMATE*': 'stalemates'
+}
+
+class TrainingStats:
+  """Running totals for the final summary, updated as each battle finishes.
+
+  Memory is constant in the number of battles: per-creature action/outcome
+  counters, wins, and reward mean/variance (Welford).
+  """
+  def __init__(self, creature_names):
+    self.names = list(creature_names)
+    self.battles = 0
+    self.stalemates = 0
+    self.wins = {c: 0 for c in self.names}
+    self.action_counts = np.zeros((len(self.names), len(LOG_ACTIONS)), dtype=np.int64)
+    self.reward_mean = {c: 0.0 for c in self.names}
+    self.reward_m2 = {c: 0.0 for c in self.names}
+
+  def add_battle(self, battle_log, rewards, winner):
+    """Fold one finished battle in; rewards maps creature name -> episode reward."""
+    self.battles += 1
+    if winner in self.wins:
+      self.wins[winner] += 1
+    elif winner == 'stalemate':
+      self.stalemates += 1
+
+    n = battle_log.size
+    rows = np.array([self.names.index(name) for name in battle_log.names])[battle_log.creature[:n]]
+    flat = np.bincount(rows * len(LOG_ACTIONS) + battle_log.action[:n], minlength=self.action_counts.size)
+    self.action_counts += flat.reshape(self.action_counts.shape)
+
+    for c, reward in rewards.items():
+      delta = reward - self.reward_mean[c]
+      self.reward_mean[c] += delta / self.battles
+      self.reward_m2[c] += delta * (reward - self.reward_mean[c])
+
+  def reward_std(self, c):
+    return (self.reward_m2[c] / (self.battles - 1)) ** 0.5 if self.battles > 1 else 0.0
+
+  def action_stats(self, c):
+    counts = self.action_counts[self.names.index(c)]
+    stats = {key: 0 for key in SUMMARY_STAT_KEYS.values()}
+    for action, key in SUMMARY_STAT_KEYS.items():
+      if action in LOG_ACTION_CODES:
+        stats[key] += int(counts[LOG_ACTION_CODES[action]])
+    return stats
 
 # ------------------ Batched Logging ------------------
 
-def write_logs(batched_logs, last_epochs, finalLog, final_wins=None):
-  """Write batched logs or final summary to disk."""
+def write_logs(batched_logs, last_epochs, finalLog, final_wins=None, stats=None):
+  """Write batched logs, or the final summary from a TrainingStats accumulator."""
   start_epoch = batched_logs[0][0] if batched_logs else 0
   end_epoch = batched_logs[-1][0] if batched_logs else 0
   filename = os.path.join(CONFIG['log_dir'], f'battle_log_{start_epoch:04d}_{end_epoch:04d}.txt')
@@ -46,41 +245,21 @@ def write_logs(batched_logs, last_epochs, finalLog, final_wins=None):
   summary_data = None
 
   # Write final summary log
-  if finalLog and final_wins and CONFIG['write_battle_summary_log']:
+  if finalLog and stats and CONFIG['write_battle_summary_log']:
+    final_wins = final_wins or stats.wins
     creature_names = list(final_wins.keys())
     epoch_batch_size = CONFIG['epoch_batch_size']
-
-    # Initialize stats dynamically, including stalemates
-    total_stats = {
-      c: {
-        'attack': 0, 'defend': 0, 'poison': 0, 'stun': 0,
-        'recover': 0, 'knockout': 0, 'stunned': 0, 'poisoned': 0,
-        'stalemates': 0
-      } for c in creature_names
-    }
-
-    # Count actions and outcomes
-    for epoch, battle_log, _, _, _, _ in batched_logs:
-      for entry in battle_log:
-        c = entry['creature']
-        action = entry['action']
-        if action in ['attack', 'defend', 'recover', 'poison', 'stun']:
-          total_stats[c][action] += 1
-        elif action == '*KNOCKOUT*':
-          total_stats[c]['knockout'] += 1
-        elif action == '*STUNNED*':
-          total_stats[c]['stunned'] += 1
-        elif action == '*POISONED*':
-          total_stats[c]['poisoned'] += 1
-        elif action == '*STALEMATE*':
-          total_stats[c]['stalemates'] += 1
+    num_battles = stats.battles or epoch_batch_size
+    total_stats = {c: stats.action_stats(c) for c in creature_names}
 
     summary_data = {
       c: {
         "name": c,
         "totalWins": final_wins[c],
-        "avgWins": final_wins[c] / epoch_batch_size,
+        "avgWins": final_wins[c] / num_battles,
         "totalEpochs": last_epochs[c],
+        "avgReward": stats.reward_mean[c],
+        "rewardStd": stats.reward_std(c),
         "stats": total_stats[c],
       }
       for c in creature_names
@@ -95,7 +274,7 @@ def write_logs(batched_logs, last_epochs, finalLog, final_wins=None):
     with open(filenameFinal, 'w') as f:
       for c in creature_names:
         f.write("---------------------------------------------------------------\n")
-        f.write(f"{c} | Total Wins: {final_wins[c]} | Avg Wins: {final_wins[c]/epoch_batch_size:.0%} | Total Epochs: {last_epochs[c]}\n")
+        f.write(f"{c} | Total Wins: {final_wins[c]} | Avg Wins: {final_wins[c]/num_battles:.0%} | Total Epochs: {last_epochs[c]}\n")
         f.write("---------------------------------------------------------------\n")
         f.write(f"  Attack:    {total_stats[c]['attack']}\n")
         f.write(f"  Defend:    {total_stats[c]['defend']}\n")
@@ -106,7 +285,8 @@ def write_logs(batched_logs, last_epochs, finalLog, final_wins=None):
         f.write(f"  KO'd:      {total_stats[c]['knockout']}\n")
         f.write(f"  Stunned:   {total_stats[c]['stunned']}\n")
         f.write(f"  Poisoned:  {total_stats[c]['poisoned']}\n")
-        f.write(f"  Stalemates:{total_stats[c]['stalemates']}\n\n")
+        f.write(f"  Stalemates:{total_stats[c]['stalemates']}\n")
+        f.write(f"  Reward:    {stats.reward_mean[c]:.2f} ± {stats.reward_std(c):.2f}\n\n")
       f.write("---------------------------------------------------------------\n")
       f.write(f"Epoch Batch Size: {epoch_batch_size} \n")
       f.write("---------------------------------------------------------------\n")
@@ -0,0 +1,250 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from starlette.concurrency import run_in_threadpool
+from app.config import CONFIG
+from app.modules.metrics import (
+  enabled as metrics_enabled, matchmaking_matches_total, matchmaking_queue_depth, matchmaking_wait_seconds
+)
+from app.modules.storage import SqlitePool
+
+# ------------------ Matchmaking ------------------
+#
+# Logged-in players join a queue shared by every worker (a table in the same
+# SQLite file as the session registry). Waiting tickets are indexed by rating,
+# so each player's nearest opponent is two B-tree lookups (first rating above,
+# first below) rather than a scan of the queue.
+#
+# Pairing runs in ticks of CONFIG['matchmaking_tick_seconds'] on every worker;
+# a tick pairs the longest-waiting tickets first, each accepting opponents
+# within a tolerance that widens with its wait time, and expires tickets
+# waiting longer than CONFIG['matchmaking_timeout_seconds']. Ticks serialize
+# on the database write lock, and the worker that paired a batch plays all of
+# its battles concurrently, so their decisions share the inference batcher.
+
+
+def tolerance(wait_seconds):
+  """Largest rating difference a ticket accepts after waiting wait_seconds."""
+  return min(CONFIG['matchmaking_tolerance_base'] + CONFIG['matchmaking_tolerance_growth'] * wait_seconds,
+             CONFIG['matchmaking_tolerance_max'])
+
+
+class MatchmakingQueue(SqlitePool):
+  SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS matchmaking (
+      key TEXT PRIMARY KEY,
+      name TEXT NOT NULL,
+      player_id INTEGER NOT NULL,
+      rating REAL NOT NULL,
+      status TEXT NOT NULL,
+      enqueued_at REAL NOT NULL,
+      updated_at REAL NOT NULL,
+      opponent TEXT,
+      result TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS matchmaking_by_rating ON matchmaking (status, rating)",
+    "CREATE INDEX IF NOT EXISTS matchmaking_by_wait ON matchmaking (status, enqueued_at)",
+  )
+
+  NEAREST_ABOVE = ("SELECT key, rating FROM matchmaking WHERE status = 'waiting' AND rating >= ? AND key != ? "
+                   "ORDER BY rating LIMIT 1")
+  NEAREST_BELOW = ("SELECT key, rating FROM matchmaking WHERE status = 'waiting' AND rating <= ? AND key != ? "
+                   "ORDER BY rating DESC LIMIT 1")
+  SET_STATUS = "UPDATE matchmaking SET status = ?, opponent = ?, updated_at = ? WHERE key = ?"
+
+  def join(self, key, name, player_id, rating):
+    """Queue a ticket (a player already waiting keeps their place)."""
+    now = time.time()
+    with self.transaction() as conn:
+      conn.execute(
+        "INSERT INTO matchmaking (key, name, player_id, rating, status, enqueued_at, updated_at) "
+        "VALUES (?, ?, ?, ?, 'waiting', ?, ?) "
+        "ON CONFLICT (key) DO UPDATE SET rating = excluded.rating, updated_at = excluded.updated_at, "
+        "enqueued_at = CASE WHEN matchmaking.status = 'waiting' THEN matchmaking.enqueued_at ELSE excluded.enqueued_at END, "
+        "status = 'waiting', opponent = NULL, result = NULL",
+        (key, name, player_id, rating, now, now))
+    return self.get(key)
+
+  def leave(self, key):
+    with self.transaction() as conn:
+      return conn.execute("DELETE FROM matchmaking WHERE key = ? AND status = 'waiting'", (key,)).rowcount > 0
+
+  def get(self, key):
+    with self.connection() as conn:
+      row = conn.execute("SELECT key, name, player_id, rating, status, enqueued_at, opponent, result "
+                         "FROM matchmaking WHERE key = ?", (key,)).fetchone()
+    return self._ticket(row) if row else None
+
+  @staticmethod
+  def _ticket(row):
+    key, name, player_id, rating, status, enqueued_at, opponent, result = row
+    return {"key": key, "name": name, "player_id": player_id, "rating": rating, "status": status,
+            "enqueued_at": enqueued_at, "opponent": opponent, "result": json.loads(result) if result else None}
+
+  def waiting_count(self):
+    with self.connection() as conn:
+      return conn.execute("SELECT COUNT(*) FROM matchmaking WHERE status = 'waiting'").fetchone()[0]
+
+  def pair(self, batch_size):
+    """One matchmaking tick; returns (pairs, timed_out) with pairs as [(ticket_a, ticket_b), ...]."""
+    now = time.time()
+    pairs = []
+    with self.transaction() as conn:
+      # Expire tickets that waited too long
+      cutoff = now - CONFIG['matchmaking_timeout_seconds']
+      timed_out = conn.execute("SELECT key, enqueued_at FROM matchmaking WHERE status = 'waiting' AND enqueued_at < ?",
+                               (cutoff,)).fetchall()
+      conn.execute("UPDATE matchmaking SET status = 'timeout', updated_at = ? WHERE status = 'waiting' AND enqueued_at < ?",
+                   (now, cutoff))
+      # Forget finished tickets nobody polled for
+      conn.execute("DELETE FROM matchmaking WHERE status != 'waiting' AND updated_at < ?",
+                   (now - CONFIG['matchmaking_result_ttl'],))
+
+      seekers = conn.execute(
+        "SELECT key, name, player_id, rating, enqueued_at FROM matchmaking WHERE status = 'waiting' "
+        "ORDER BY enqueued_at LIMIT ?", (batch_size,)).fetchall()
+      paired = set()
+      for key, name, player_id, rating, enqueued_at in seekers:
+        if key in paired:
+          continue
+        candidates = [row for row in (conn.execute(self.NEAREST_ABOVE, (rating, key)).fetchone(),
+                                      conn.execute(self.NEAREST_BELOW, (rating, key)).fetchone()) if row]
+        if not candidates:
+          continue
+        opponent_key, opponent_rating = min(candidates, key=lambda row: abs(row[1] - rating))
+        if abs(opponent_rating - rating) > tolerance(now - enqueued_at):
+          continue
+        conn.execute(self.SET_STATUS, ('matched', opponent_key, now, key))
+        conn.execute(self.SET_STATUS, ('matched', key, now, opponent_key))
+        paired.update((key, opponent_key))
+        opponent = conn.execute("SELECT key, name, player_id, rating, enqueued_at FROM matchmaking WHERE key = ?",
+                                (opponent_key,)).fetchone()
+        pairs.append((
+          {"key": key, "name": name, "player_id": player_id, "rating": rating, "wait": now - enqueued_at},
+          {"key": opponent[0], "name": opponent[1], "player_id": opponent[2], "rating": opponent[3],
+           "wait": now - opponent[4]},
+        ))
+    return pairs, [now - enqueued_at for _, enqueued_at in timed_out]
+
+  def set_result(self, key, result):
+    with self.transaction() as conn:
+      conn.execute("UPDATE matchmaking SET result = ?, updated_at = ? WHERE key = ?",
+                   (json.dumps(result), time.time(), key))
+
+
+_queue: MatchmakingQueue | None = None
+_queue_pid = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> MatchmakingQueue:
+  """Process-wide queue handle, created on first use (and again in a forked child)."""
+  global _queue, _queue_pid
+  if _queue is None or _queue_pid != os.getpid():
+    with _queue_lock:
+      if _queue is None or _queue_pid != os.getpid():
+        _queue = MatchmakingQueue(CONFIG['storage_sqlite_path'], CONFIG['storage_pool_size'])
+        _queue_pid = os.getpid()
+  return _queue
+
+
+matchmaking_queue_depth.set_function(lambda: get_queue().waiting_count())
+
+
+# ------------------ Tickets ------------------
+
+def ticket_key(name, player_id):
+  return f"{name}_{player_id}"
+
+
+def player_rating(name, player_id):
+  from app.modules.leaderboard import rating_of
+  return rating_of('player', ticket_key(name, player_id))
+
+
+def join_queue(name, player_id):
+  return get_queue().join(ticket_key(name, player_id), name, player_id, player_rating(name, player_id))
+
+
+def leave_queue(name, player_id):
+  return get_queue().leave(ticket_key(name, player_id))
+
+
+def queue_status(name, player_id):
+  return get_queue().get(ticket_key(name, player_id))
+
+
+# ------------------ Pairing & Dispatch ------------------
+
+def _resolve_pair(pair):
+  """Both players' first creatures, or None if either logged out meanwhile."""
+  from app.modules.player_manager import get_active_player
+  creatures = []
+  for ticket in pair:
+    player = get_active_player(ticket['name'], ticket['player_id'])
+    if player is None or not player.creatures:
+      return None
+    creatures.append(player.creatures[0])
+  return creatures
+
+
+def _play_pair(pair, loop):
+  """Play one matched pair and store the result (or the failure) on both tickets."""
+  from app.modules.pvp import play_battle
+  try:
+    creatures = _resolve_pair(pair)
+    if creatures is None:
+      result = {"winner": None, "cancelled": "opponent unavailable"}
+    else:
+      battle = play_battle(*creatures, 0.0, loop, players=[(ticket['key'], ticket['name']) for ticket in pair])
+      winner = battle['winner']
+      result = {
+        "players": [ticket['key'] for ticket in pair],
+        "winner": pair[winner]['key'] if winner in (0, 1) else winner,
+        "ticks": battle['ticks'],
+        "rewards": battle['rewards'],
+      }
+  except Exception as e:
+    print(f"❌ Matchmaking battle {pair[0]['key']} vs {pair[1]['key']} failed: {e}")
+    result = {"players": [ticket['key'] for ticket in pair], "winner": None, "error": str(e)}
+  for ticket in pair:
+    get_queue().set_result(ticket['key'], result)
+  return result
+
+
+async def _dispatch(pair, loop):
+  """_play_pair on the game executor; a failure there still leaves both tickets with a result."""
+  from app.modules.pvp import run_game
+  try:
+    return await run_game(_play_pair, pair, loop)
+  except Exception as e:
+    result = {"players": [ticket['key'] for ticket in pair], "winner": None, "error": str(e)}
+    for ticket in pair:
+      await run_in_threadpool(get_queue().set_result, ticket['key'], result)
+    return result
+
+
+async def run_tick():
+  """Pair one batch of waiting tickets and play all resulting battles concurrently."""
+  pairs, timed_out = await run_in_threadpool(get_queue().pair, CONFIG['matchmaking_batch_size'])
+  if metrics_enabled():
+    for wait in timed_out:
+      matchmaking_wait_seconds.observe(wait, 'timeout')
+    for pair in pairs:
+      for ticket in pair:
+        matchmaking_wait_seconds.observe(ticket['wait'], 'matched')
+    matchmaking_matches_total.inc(len(pairs))
+  loop = asyncio.get_running_loop()
+  return await asyncio.gather(*(_dispatch(pair, loop) for pair in pairs))
+
+
+async def matchmaking_loop():
+  """Run ticks forever (started with the app when CONFIG['matchmaking_enabled'])."""
+  while True:
+    await asyncio.sleep(CONFIG['matchmaking_tick_seconds'])
+    try:
+      await run_tick()
+    except Exception as e:
+      print(f"❌ Matchmaking tick failed: {e}")
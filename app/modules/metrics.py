@@ -0,0 +1,182 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+import numpy as np
+from app.config import CONFIG
+from app.modules.logging_utils import LOG_ACTION_CODES
+
+# ------------------ Metrics ------------------
+#
+# Minimal in-process counters, gauges and histograms rendered in the
+# Prometheus text exposition format at /metrics. Instrumented code guards
+# anything beyond a counter bump with enabled(), and timed() hands back a
+# shared no-op context manager when CONFIG['metrics_enabled'] is off.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+_noop = nullcontext()
+
+
+def enabled():
+  return CONFIG['metrics_enabled']
+
+
+def _format_labels(names, values, extra=()):
+  pairs = [f'{name}="{value}"' for name, value in zip(names, values)] + list(extra)
+  return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+  return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Metric:
+  TYPE = None
+
+  def __init__(self, name, documentation, labelnames=()):
+    self.name = name
+    self.documentation = documentation
+    self.labelnames = tuple(labelnames)
+    self.values = {}
+    self.lock = threading.Lock()
+    _registry.append(self)
+
+  def samples(self):
+    """(suffix, label values, extra label pairs, value) tuples for rendering."""
+    with self.lock:
+      return [('', labels, (), value) for labels, value in self.values.items()]
+
+  def render(self):
+    lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+    for suffix, labels, extra, value in self.samples():
+      lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, labels, extra)} {_format_value(value)}")
+    return '\n'.join(lines)
+
+
+class Counter(Metric):
+  TYPE = 'counter'
+
+  def __init__(self, name, documentation, labelnames=()):
+    super().__init__(name, documentation, labelnames)
+    if not self.labelnames:
+      self.values[()] = 0
+
+  def inc(self, amount=1, *labels):
+    with self.lock:
+      self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+  """Gauge whose value is read from a callback at scrape time (no cost between scrapes)."""
+  TYPE = 'gauge'
+
+  def __init__(self, name, documentation, function=None):
+    super().__init__(name, documentation)
+    self.function = function
+
+  def set_function(self, function):
+    self.function = function
+
+  def samples(self):
+    return [('', (), (), self.function() if self.function else 0)]
+
+
+class Histogram(Metric):
+  TYPE = 'histogram'
+
+  def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    super().__init__(name, documentation, labelnames)
+    self.buckets = tuple(buckets)
+
+  def observe(self, value, *labels):
+    with self.lock:
+      series = self.values.get(labels)
+      if series is None:
+        series = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+      series[0][bisect.bisect_left(self.buckets, value)] += 1
+      series[1] += value
+
+  def samples(self):
+    with self.lock:
+      snapshot = [(labels, list(counts), total) for labels, (counts, total) in self.values.items()]
+    samples = []
+    for labels, counts, total in snapshot:
+      cumulative = 0
+      for bound, count in zip(self.buckets + (float('inf'),), counts):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        samples.append(('_bucket', labels, (f'le="{le}"',), cumulative))
+      samples.append(('_sum', labels, (), total))
+      samples.append(('_count', labels, (), cumulative))
+    return samples
+
+
+@contextmanager
+def _timer(histogram, labels):
+  start = time.perf_counter()
+  try:
+    yield
+  finally:
+    histogram.observe(time.perf_counter() - start, *labels)
+
+
+def timed(histogram, *labels):
+  """Context manager observing the wall time of its block; a no-op when metrics are off."""
+  return _timer(histogram, labels) if CONFIG['metrics_enabled'] else _noop
+
+
+def render_metrics():
+  return '\n'.join(metric.render() for metric in _registry) + '\n'
+
+
+# ------------------ Application Metrics ------------------
+
+training_phase_seconds = Histogram(
+  'training_phase_seconds', 'Wall time spent in each phase of training_loop.', ('phase',))
+battles_total = Counter('battles_total', 'Battles simulated by training runs.')
+battle_ticks_total = Counter('battle_ticks_total', 'Ticks simulated across all training battles.')
+knockouts_total = Counter('knockouts_total', 'Training battles that ended in a knockout.')
+stalemates_total = Counter('stalemates_total', 'Training battles that ended in a stalemate.')
+policy_cache_lookups_total = Counter(
+  'policy_cache_lookups_total', 'NumPy policy probability lookups by creature and result (hit/miss).',
+  ('creature', 'result'))
+inference_queue_depth = Gauge('inference_queue_depth', 'Action requests waiting in the inference batcher.')
+inference_batch_size = Histogram(
+  'inference_batch_size', 'Requests per batched forward pass of the inference batcher.',
+  buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+inference_wait_seconds = Histogram(
+  'inference_wait_seconds', 'Latency added by the inference batcher (enqueue to batch start).')
+matchmaking_queue_depth = Gauge('matchmaking_queue_depth', 'Tickets waiting in the matchmaking queue (all workers).')
+matchmaking_wait_seconds = Histogram(
+  'matchmaking_wait_seconds', 'Time tickets waited in the matchmaking queue, by outcome (matched/timeout).',
+  ('outcome',), buckets=(0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0))
+matchmaking_matches_total = Counter('matchmaking_matches_total', 'Pairs formed by matchmaking ticks.')
+active_players = Gauge('active_players', 'Players logged in on any worker.')
+active_creatures = Gauge('active_creatures', 'Creatures with an active session on any worker.')
+http_request_duration_seconds = Histogram(
+  'http_request_duration_seconds', 'HTTP request latency by route.', ('method', 'route', 'status'))
+
+
+def record_battles(results):
+  """Count battles, ticks, knockouts and stalemates from simulate_battle* results."""
+  knockout = LOG_ACTION_CODES['*KNOCKOUT*']
+  battles_total.inc(len(results))
+  for _, _, battle_log, winner, _, _ in results:
+    if battle_log.size:
+      battle_ticks_total.inc(int(battle_log.tick[:battle_log.size].max()) + 1)
+    if winner == 'stalemate':
+      stalemates_total.inc()
+    elif np.any(battle_log.action[:battle_log.size] == knockout):
+      knockouts_total.inc()
+
+
+def record_policy_cache(creatures):
+  """Move each creature's policy table hit/miss counts into policy_cache_lookups_total."""
+  for creature in creatures:
+    if creature.policy is None:
+      continue
+    hits, misses = creature.policy.take_cache_stats()
+    policy_cache_lookups_total.inc(hits, creature.name, 'hit')
+    policy_cache_lookups_total.inc(misses, creature.name, 'miss')
@@ -0,0 +1,71 @@
+import copy
+import threading
+from app.config import ACTION_NAMES, CONFIG
+from app.modules.weight_store import published_model
+
+# ------------------ Model Factory ------------------
+#
+# Creatures that only play (logged-in players' creatures) share one read-only
+# NeuralNetwork per architecture, built on first use. A creature gets its own
+# copy of the weights only when it is about to be trained or have weights
+# loaded into it (copy-on-write), and optimizers are created on demand.
+# torch is imported by the first build_model/create_optimizer call, not here.
+
+_template_models: dict[tuple, 'NeuralNetwork'] = {}
+_template_lock = threading.Lock()
+
+
+def model_spec(stats):
+  """(input_size, hidden_sizes, output_size) for a creature's stats/template dict."""
+  hidden_sizes = stats.get('nn_config', {}).get('hidden_sizes', CONFIG['hidden_sizes'])
+  return (len(ACTION_NAMES), tuple(hidden_sizes), 3 + len(stats.get('special_abilities', [])))
+
+
+def build_model(spec):
+  from app.modules.neural_network import NeuralNetwork
+  input_size, hidden_sizes, output_size = spec
+  return NeuralNetwork(input_size, list(hidden_sizes), output_size)
+
+
+def shared_model(spec, name=None):
+  """The shared, frozen model for an architecture; built the first time it is asked for.
+
+  If the trainer has published weights for creature name (see weight_store),
+  the model attached to those is returned instead.
+  """
+  if name is not None:
+    model = published_model(name, spec)
+    if model is not None:
+      return model
+  model = _template_models.get(spec)
+  if model is None:
+    with _template_lock:
+      model = _template_models.get(spec)
+      if model is None:
+        model = build_model(spec)
+        model.requires_grad_(False)
+        model.eval()
+        _template_models[spec] = model
+  return model
+
+
+def private_copy(model):
+  """Trainable copy of a (possibly shared) model."""
+  model = copy.deepcopy(model)
+  model.requires_grad_(True)
+  model.train()
+  return model
+
+
+def create_optimizer(creature):
+  from app.modules.torch_loader import torch
+  learning_rate = creature.nn_config.get('learning_rate', CONFIG['learning_rate'])
+  return torch.optim.Adam(creature.nn.parameters(), lr=learning_rate)
+
+
+def get_optimizer(creature):
+  """Give the creature private weights (if still shared) and a lazily built optimizer."""
+  creature.own_nn()
+  if creature.optimizer is None:
+    creature.optimizer = create_optimizer(creature)
+  return creature.optimizer
@@ -1,60 +1,153 @@
+import json
 import os
-import torch
-from app.config import CONFIG
-from app.modules.utils import create_checkpoint_paths
+import tempfile
+from collections import deque
+from app.config import CONFIG, CREATURE_TEMPLATES
 
 # ------------------ Network Persistence ------------------
+#
+# torch is imported inside the functions that (de)serialize checkpoints, so
+# the path and activations helpers stay usable from torch-free read paths.
 
-def create_checkpoint_file(checkpoint_path, creature, optimizer):
-  print(f"⚠️ Missing checkpoint: {checkpoint_path}. Creating new one...")
-  os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
-  torch.save({
-    'epoch': 0,
-    'model_state_dict': creature.nn.state_dict(),
-    'optimizer_state_dict': optimizer.state_dict(),
-    'special_abilities': creature.special_abilities  # store current specials
-  }, checkpoint_path)
-  print(f"✅ Created fresh checkpoint for {creature.name} at epoch 0: {checkpoint_path}")
+def create_checkpoint_paths(creature_A, creature_B):
+  A_id = f"checkpoint_{creature_A.name}_{CREATURE_TEMPLATES[creature_A.name]['id']}"
+  B_id = f"checkpoint_{creature_B.name}_{CREATURE_TEMPLATES[creature_B.name]['id']}"
+  A_path = f"{CONFIG['checkpoint_dir']}/{A_id}.pt"
+  B_path = f"{CONFIG['checkpoint_dir']}/{B_id}.pt"
+  return A_path, B_path
 
-def save_checkpoint(checkpoint_path, creature, optimizer):
-  checkpoint = torch.load(checkpoint_path)
-  last_epoch = checkpoint.get('epoch', 0)
-  torch.save({
-    'epoch': last_epoch + CONFIG['epoch_batch_size'],
+def create_checkpoint_paths_by_name(creature_name_a: str = 'A', creature_name_b: str = 'B') -> tuple[str, str]:
+  A_id = f"checkpoint_{creature_name_a}_{CREATURE_TEMPLATES[creature_name_a]['id']}"
+  B_id = f"checkpoint_{creature_name_b}_{CREATURE_TEMPLATES[creature_name_b]['id']}"
+  A_path = f"{CONFIG['checkpoint_dir']}/{A_id}.pt"
+  B_path = f"{CONFIG['checkpoint_dir']}/{B_id}.pt"
+  return A_path, B_path
+
+
+def atomic_save(obj, path):
+  """torch.save to a temp file in the same directory, fsync, then rename over path.
+
+  Readers see either the previous checkpoint or the new one, never a partial file.
+  """
+  from app.modules.torch_loader import torch
+  directory = os.path.dirname(path) or '.'
+  os.makedirs(directory, exist_ok=True)
+  fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.pt')
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      torch.save(obj, f)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+  except BaseException:
+    os.unlink(tmp_path)
+    raise
+  if hasattr(os, 'O_DIRECTORY'):
+    dir_fd = os.open(directory, os.O_DIRECTORY)
+    try:
+      os.fsync(dir_fd)
+    finally:
+      os.close(dir_fd)
+
+def activations_path(checkpoint_path):
+  """Append-only JSON-lines sidecar holding a checkpoint's activations history."""
+  return os.path.splitext(checkpoint_path)[0] + '.activations.jsonl'
+
+def append_activations(checkpoint_path, entries):
+  if not entries:
+    return
+  with open(activations_path(checkpoint_path), 'a') as f:
+    f.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+    f.flush()
+    os.fsync(f.fileno())
+
+def load_activations(checkpoint_path, limit=None):
+  """Read the sidecar, skipping a torn last line left by a crash mid-append.
+
+  With a limit only the last limit lines are kept (and parsed), so memory and
+  JSON decoding stay bounded however long the sidecar has grown.
+  """
+  path = activations_path(checkpoint_path)
+  if not os.path.exists(path):
+    return []
+  with open(path, 'r') as f:
+    lines = deque(f, maxlen=limit) if limit else f.readlines()
+  entries = []
+  for line in lines:
+    try:
+      entries.append(json.loads(line))
+    except json.JSONDecodeError:
+      continue
+  return entries
+
+def save_checkpoint(checkpoint_path, creature, optimizer, epoch):
+  atomic_save({
+    'epoch': epoch,
     'model_state_dict': creature.nn.state_dict(),
     'optimizer_state_dict': optimizer.state_dict(),
     'special_abilities': creature.special_abilities
   }, checkpoint_path)
-  print(f"💾 Saved checkpoint for {creature.name} at epoch {last_epoch}: {checkpoint_path}")
+  print(f"💾 Saved checkpoint for {creature.name} at epoch {epoch}: {checkpoint_path}")
 
 def load_checkpoint(checkpoint_path, creature, optimizer):
+  """Load weights and optimizer state; return the saved epoch, or None for a fresh start."""
   if not os.path.isfile(checkpoint_path):
-    create_checkpoint_file(checkpoint_path, creature, optimizer)
-    return 0
+    print(f"⚠️ Missing checkpoint: {checkpoint_path}. Starting from epoch 0.")
+    return None
+  from app.modules.torch_loader import torch
   checkpoint = torch.load(checkpoint_path)
 
   # Check if special abilities match
   saved_specials = checkpoint.get('special_abilities', [])
   if saved_specials != creature.special_abilities:
     print(f"⚠️ Special abilities changed for {creature.name}. Resetting checkpoint.")
-    create_checkpoint_file(checkpoint_path, creature, optimizer)
-    return 0
+    return None
 
-  creature.nn.load_state_dict(checkpoint['model_state_dict'])
+  creature.own_nn().load_state_dict(checkpoint['model_state_dict'])
   optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
   last_epoch = checkpoint.get('epoch', 0)
   print(f"📂 Resumed {creature.name} from {checkpoint_path} at epoch {last_epoch}")
   return last_epoch
 
-def save_checkpoints(creature_A, creature_B, optimizer_A, optimizer_B):
-  A_path, B_path = create_checkpoint_paths(creature_A, creature_B)
-  save_checkpoint(A_path, creature_A, optimizer_A)
-  save_checkpoint(B_path, creature_B, optimizer_B)
-
-def resume_from_checkpoint(creature_A, creature_B, optimizer_A, optimizer_B):
-  A_path, B_path = create_checkpoint_paths(creature_A, creature_B)
-  last_epoch_A = load_checkpoint(A_path, creature_A, optimizer_A)
-  last_epoch_B = load_checkpoint(B_path, creature_B, optimizer_B)
-  print("🔄 Checkpoint summary:")
-  print(f"  {creature_A.name} -> {A_path} (next epoch: {last_epoch_A})")
-  print(f"  {creature_B.name} -> {B_path} (next epoch: {last_epoch_B})")
+# ------------------ Checkpoint Manager ------------------
+
+class CheckpointManager:
+  """Owns the A/B checkpoints for one training run.
+
+  Epoch counters are read once on resume and tracked in memory, each
+  checkpoint is written exactly once per save (atomically), and activations
+  go to an append-only sidecar instead of being folded into the checkpoint.
+  """
+  def __init__(self, creature_A, creature_B, optimizer_A, optimizer_B):
+    self.creatures = (creature_A, creature_B)
+    self.optimizers = (optimizer_A, optimizer_B)
+    self.paths = create_checkpoint_paths(creature_A, creature_B)
+    self.epochs = {creature_A.name: 0, creature_B.name: 0}
+
+  def resume(self):
+    for creature, optimizer, path in zip(self.creatures, self.optimizers, self.paths):
+      last_epoch = load_checkpoint(path, creature, optimizer)
+      if last_epoch is None:
+        # Fresh start: stale activations belong to weights that no longer exist
+        if os.path.exists(activations_path(path)):
+          os.remove(activations_path(path))
+        last_epoch = 0
+      self.epochs[creature.name] = last_epoch
+    print("🔄 Checkpoint summary:")
+    for creature, path in zip(self.creatures, self.paths):
+      print(f"  {creature.name} -> {path} (next epoch: {self.epochs[creature.name]})")
+    return dict(self.epochs)
+
+  def save(self, epochs_trained, activations=None):
+    """Write both checkpoints once, then append this run's activations to their sidecars.
+
+    activations maps creature name -> list of entries with run-local epochs;
+    they are stored with absolute epochs.
+    """
+    for creature, optimizer, path in zip(self.creatures, self.optimizers, self.paths):
+      start_epoch = self.epochs[creature.name]
+      self.epochs[creature.name] = start_epoch + epochs_trained
+      save_checkpoint(path, creature, optimizer, self.epochs[creature.name])
+      entries = (activations or {}).get(creature.name, [])
+      append_activations(path, [{**entry, 'epoch': start_epoch + entry['epoch']} for entry in entries])
+    return dict(self.epochs)
@@ -1,6 +1,9 @@
-import torch
-import torch.nn as nn
+import numpy as np
 from app.config import CONFIG
+from app.modules.logging_utils import LOG_ACTIONS, LOG_ACTION_CODES
+from app.modules.torch_loader import torch
+
+nn = torch.nn
 
 # ------------------ Neural Network ------------------
 
@@ -22,8 +25,13 @@ class NeuralNetwork(nn.Module):
 # ------------------ Reinforce Update ------------------
 
 def reinforce_update(creature, optimizer, battle_log, baseline, entropy_beta=None):
+  """One policy-gradient step over every action the creature took in battle_log.
+
+  The creature's logged states and actions are stacked and pushed through the
+  network in a single forward pass, so log-probs and entropy stay in the graph
+  and the gradient reaches the weights.
+  """
   entropy_beta = entropy_beta or getattr(creature, 'nn_config', {}).get('entropy_beta', CONFIG['entropy_beta'])
-  total_loss = torch.tensor(0.0, dtype=torch.float32, requires_grad=True)
   optimizer.zero_grad()
 
   # Use creature-specific rewards for all actions, including special abilities
@@ -39,23 +47,23 @@ def reinforce_update(creature, optimizer, battle_log, baseline, entropy_beta=Non
   for ability_name in getattr(creature, 'special_abilities', []):
     reward_map[ability_name] = reward_config.get(ability_name, 0.01)
 
-  for entry in battle_log:
-    if entry['creature'] != creature.name or entry['action_idx'] == -1:
-      continue
-    probs = torch.tensor(entry['probs'], dtype=torch.float32) if not isinstance(entry['probs'], torch.Tensor) else entry['probs']
-    action_idx_tensor = torch.tensor(int(entry['action_idx']), dtype=torch.long)
-    dist = torch.distributions.Categorical(probs)
-    log_prob = dist.log_prob(action_idx_tensor)
-
-    # Reward comes from creature-specific reward_map, fallback to battle_log reward
-    action_name = entry['action']
-    reward = reward_map.get(action_name, entry['reward'])
-    reward = torch.tensor(reward, dtype=torch.float32)
-
-    loss = -log_prob * (reward - baseline)
-    entropy = dist.entropy()
-    loss -= entropy_beta * entropy
-    total_loss = total_loss + loss
-
-  total_loss.backward()
+  columns = battle_log.columns(creature.name, actions_only=True)
+  if not len(columns['action']):
+    return
+
+  states = torch.from_numpy(columns['state'])
+  action_idx = torch.from_numpy(columns['action_idx'].astype(np.int64))
+  dist = torch.distributions.Categorical(logits=creature.nn(states))
+  log_prob = dist.log_prob(action_idx)
+
+  # Reward comes from creature-specific reward_map, fallback to battle_log reward
+  reward_table = np.full(len(LOG_ACTIONS), np.nan, dtype=np.float32)
+  for action_name, value in reward_map.items():
+    if action_name in LOG_ACTION_CODES:
+      reward_table[LOG_ACTION_CODES[action_name]] = value
+  reward = reward_table[columns['action']]
+  advantage = torch.from_numpy(np.where(np.isnan(reward), columns['reward'], reward) - np.float32(baseline))
+
+  loss = (-log_prob * advantage - entropy_beta * dist.entropy()).sum()
+  loss.backward()
   optimizer.step()
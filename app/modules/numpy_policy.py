@@ -0,0 +1,112 @@
+import numpy as np
+from app.config import ACTION_NAMES, CONFIG
+
+# ------------------ NumPy Policy Snapshot ------------------
+#
+# Torch dispatch dominates the cost of a forward pass through the tiny policy
+# MLPs, so rollouts can run against a plain NumPy copy of the weights instead.
+# A snapshot is only valid until the next optimizer step and must be refreshed
+# after every reinforce_update.
+#
+# HP and energy are small integers, so rollouts keep revisiting the same
+# (hp, energy, opp_hp, opp_energy) states. Each snapshot memoizes the softmax
+# output per distinct state (up to CONFIG['policy_cache_size'] entries, 0
+# disables it), for single states and for each row of a batched-engine
+# batch alike; because the table lives in the snapshot, refresh_policy after
+# an optimizer step is also what invalidates it.
+
+class NumpyPolicy:
+  def __init__(self, nn_model, cache_size=None):
+    """Copy every Linear layer of nn_model.model into contiguous float32 arrays."""
+    self.layers = []
+    for module in nn_model.model:
+      # Linear layers are the ones with parameters (checked without importing torch here)
+      if getattr(module, 'weight', None) is not None:
+        weight = module.weight.detach().cpu().numpy().T
+        bias = module.bias.detach().cpu().numpy()
+        self.layers.append((np.ascontiguousarray(weight, dtype=np.float32),
+                            np.ascontiguousarray(bias, dtype=np.float32)))
+    self.output_size = self.layers[-1][1].shape[0]
+
+    # Lazily filled state -> probs table (keyed by the state's raw bytes)
+    self.cache_size = CONFIG['policy_cache_size'] if cache_size is None else cache_size
+    self.table = {}
+    self.hits = 0
+    self.misses = 0
+
+  def logits(self, state):
+    """Forward pass for a (4,) state or an (N, 4) batch; ReLU between Linear layers."""
+    x = state
+    for weight, bias in self.layers[:-1]:
+      x = np.maximum(x @ weight + bias, 0.0)
+    weight, bias = self.layers[-1]
+    return x @ weight + bias
+
+  def probs(self, state):
+    logits = self.logits(state)
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+  def cached_probs(self, state):
+    """probs for a single (4,) state, memoized; the returned array is shared, do not modify it."""
+    key = state.tobytes()
+    probs = self.table.get(key)
+    if probs is not None:
+      self.hits += 1
+      return probs
+    self.misses += 1
+    probs = self.probs(state)
+    if len(self.table) < self.cache_size:
+      self.table[key] = probs
+    return probs
+
+  def cached_probs_batch(self, states):
+    """probs for an (N, 4) batch, memoized per row; all misses share one forward pass."""
+    if not self.cache_size:
+      return self.probs(states)
+    keys = [row.tobytes() for row in states]
+    out = np.empty((len(keys), self.output_size), dtype=np.float32)
+    missing = []
+    for i, key in enumerate(keys):
+      probs = self.table.get(key)
+      if probs is None:
+        missing.append(i)
+      else:
+        out[i] = probs
+    self.hits += len(keys) - len(missing)
+    self.misses += len(missing)
+    if missing:
+      computed = self.probs(states[missing])
+      out[missing] = computed
+      for i, probs in zip(missing, computed):
+        if len(self.table) >= self.cache_size:
+          break
+        self.table[keys[i]] = probs
+    return out
+
+  @property
+  def hit_rate(self):
+    lookups = self.hits + self.misses
+    return self.hits / lookups if lookups else 0.0
+
+  def take_cache_stats(self):
+    """Return (hits, misses) since the last call and reset the counters."""
+    stats = (self.hits, self.misses)
+    self.hits = self.misses = 0
+    return stats
+
+  def choose_action(self, state, eps):
+    """NumPy counterpart of utils.choose_action, sampling by inverse CDF."""
+    probs = self.cached_probs(state) if self.cache_size else self.probs(state)
+    if np.random.rand() < eps:
+      action_idx = np.random.randint(len(ACTION_NAMES))
+    else:
+      cdf = np.cumsum(probs)
+      action_idx = int(np.searchsorted(cdf, np.random.rand() * cdf[-1], side='right'))
+      action_idx = min(action_idx, self.output_size - 1)
+    return action_idx, probs
+
+def refresh_policy(creature):
+  """Re-snapshot a creature's weights; call once after each optimizer step."""
+  creature.policy = NumpyPolicy(creature.nn)
+  return creature.policy
@@ -0,0 +1,117 @@
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from app.config import CONFIG, CREATURE_TEMPLATES
+from app.modules.battle_simulation import simulate_battle
+from app.modules.batched_battle_simulation import simulate_battles_batched
+from app.modules.creature_manager import init_creatures
+from app.modules.numpy_policy import refresh_policy
+from app.modules.torch_loader import torch
+
+# ------------------ Parallel Rollouts ------------------
+#
+# Worker processes each keep their own copy of the template creatures. Every
+# epoch the parent ships the current A/B weights as NumPy arrays, each worker
+# plays its share of battles with its own RNG stream and sends back columnar
+# BattleLog trajectories, and the parent runs one batched REINFORCE update over them.
+
+_worker_creatures = None
+_pool = None
+_pool_workers = 0
+
+
+def _init_worker():
+  """Build worker-local creatures once per process; one torch thread per worker."""
+  global _worker_creatures
+  torch.set_num_threads(1)
+  _worker_creatures, _ = init_creatures(CREATURE_TEMPLATES)
+
+
+def _rollout_worker(task):
+  CONFIG.update(task['config'])
+  seed = task['seed']
+  random.seed(seed)
+  np.random.seed(seed)
+  torch.manual_seed(seed)
+
+  creatures = []
+  for name, weights in zip(task['names'], task['weights']):
+    creature = _worker_creatures[name]
+    creature.own_nn().load_state_dict({k: torch.from_numpy(v) for k, v in weights.items()})
+    creature.policy = None
+    if CONFIG['numpy_rollouts']:
+      refresh_policy(creature)
+    creatures.append(creature)
+  creature_A, creature_B = creatures
+
+  if task['num_battles'] > 1:
+    results = simulate_battles_batched(creature_A, creature_B, task['epoch'], task['max_ticks'],
+                                       task['epsilons'], task['num_battles'])
+  else:
+    results = [simulate_battle(creature_A, creature_B, task['epoch'], task['max_ticks'], task['epsilons'])]
+
+  # Battle logs are already compact columnar arrays; inputs go back as NumPy
+  compact = []
+  for reward_A, reward_B, battle_log, winner, input_A, input_B in results:
+    compact.append((reward_A, reward_B, battle_log, winner,
+                    None if input_A is None else np.asarray(input_A, dtype=np.float32),
+                    None if input_B is None else np.asarray(input_B, dtype=np.float32)))
+  return compact
+
+
+def _expand(compact):
+  reward_A, reward_B, battle_log, winner, input_A, input_B = compact
+  return (reward_A, reward_B, battle_log, winner,
+          None if input_A is None else torch.from_numpy(input_A),
+          None if input_B is None else torch.from_numpy(input_B))
+
+
+def get_rollout_pool(workers):
+  """Return the shared worker pool, (re)creating it when the worker count changes."""
+  global _pool, _pool_workers
+  if _pool is None or _pool_workers != workers:
+    if _pool is not None:
+      _pool.shutdown()
+    _pool = ProcessPoolExecutor(max_workers=workers,
+                                mp_context=multiprocessing.get_context('spawn'),
+                                initializer=_init_worker)
+    _pool_workers = workers
+  return _pool
+
+
+def shutdown_rollout_pool():
+  global _pool, _pool_workers
+  if _pool is not None:
+    _pool.shutdown()
+  _pool, _pool_workers = None, 0
+
+
+def simulate_battles_parallel(creature_A, creature_B, epoch, max_ticks, epsilons, num_battles,
+                              workers, seed_sequence):
+  """Split num_battles across worker processes and gather their trajectories.
+
+  Returns the same list of result tuples as simulate_battles_batched.
+  """
+  pool = get_rollout_pool(workers)
+  weights = [{k: v.detach().cpu().numpy() for k, v in c.nn.state_dict().items()}
+             for c in (creature_A, creature_B)]
+  shares = [num_battles // workers + (1 if i < num_battles % workers else 0) for i in range(workers)]
+  shares = [share for share in shares if share > 0]
+  seeds = [int(child.generate_state(1)[0]) for child in seed_sequence.spawn(len(shares))]
+
+  tasks = [{
+    'names': (creature_A.name, creature_B.name),
+    'weights': weights,
+    'epoch': epoch,
+    'max_ticks': max_ticks,
+    'epsilons': epsilons,
+    'num_battles': share,
+    'seed': seed,
+    'config': CONFIG,
+  } for share, seed in zip(shares, seeds)]
+
+  results = []
+  for compact_results in pool.map(_rollout_worker, tasks):
+    results.extend(_expand(compact) for compact in compact_results)
+  return results
@@ -1,10 +1,10 @@
 # app/modules/player.py
 import copy
-import itertools
 from app.modules.creature_manager import create_creature, init_creatures
+from app.modules.session_registry import IdAllocator
 
-# global unique player id counter
-_player_id_counter = itertools.count(1)
+# Durable unique player IDs, block-allocated from the session registry
+_player_id_counter = IdAllocator('player')
 
 class Player:
   def __init__(self, name, player_id=None):
@@ -35,10 +35,7 @@ class Player:
     return player
 
 # app/modules/player.py (continued)
-import os
-import json
-from app.config import PLAYER_TEMPLATES, CREATURE_TEMPLATES, CONFIG
-from app.modules.creature_manager import init_creatures
+from app.config import PLAYER_TEMPLATES, CREATURE_TEMPLATES
 
 def init_players(player_templates=PLAYER_TEMPLATES, creature_templates=CREATURE_TEMPLATES):
   creatures, optimizers = init_creatures(creature_templates)
@@ -54,19 +51,24 @@ def init_players(player_templates=PLAYER_TEMPLATES, creature_templates=CREATURE_
   return players, creatures, optimizers
 
 # app/modules/player_persistence.py
-import os, json
-# from app.modules.player import Player
-
-PLAYER_DIR = "players"
+from app.modules.creature_manager import Creature, add_active_creature
+from app.modules.storage import get_storage
 
 def save_player(player: Player):
-  os.makedirs(PLAYER_DIR, exist_ok=True)
-  path = os.path.join(PLAYER_DIR, f"player_{player.id}.json")
-  with open(path, "w") as f:
-    json.dump(player.to_dict(), f, indent=2)
-  return path
+  """Persist the player together with the creatures they own."""
+  get_storage().save_player(player.to_dict(), [c.to_dict() for c in player.creatures])
+
+def load_player(player_id, all_creatures):
+  """Load a player and their stored creatures in one storage call; None if unknown.
 
-def load_player(path, all_creatures):
-  with open(path, "r") as f:
-    data = json.load(f)
-  return Player.from_dict(data, all_creatures)
+  Creature names without a stored record fall back to all_creatures.
+  """
+  record = get_storage().load_player(player_id)
+  if record is None:
+    return None
+  data, creatures_data = record
+  owned = {}
+  for creature_data in creatures_data:
+    creature = add_active_creature(Creature.from_dict(creature_data, None))
+    owned[creature.name] = creature
+  return Player.from_dict(data, {**all_creatures, **owned})
@@ -1,35 +1,76 @@
 # app/modules/player_manager.py
-import os
+import time
 from typing import Dict
 from app.modules.player import Player, load_player, save_player
-from app.modules.creature_manager import init_creatures, load_creature, add_active_creature, create_creature
-from app.config import CREATURE_TEMPLATES, PLAYER_TEMPLATES
+from app.modules.creature_manager import TEMPLATE_CREATURE_ID, creature_session, init_template_creatures, load_creature, add_active_creature, create_creature, remove_active_creature, _active_creatures
+from app.modules.session_registry import active_sessions, evict_idle_sessions, get_session, remove_session, touch_sessions
+from app.modules.weight_bank import release_slot
+from app.config import CONFIG, CREATURE_TEMPLATES, PLAYER_TEMPLATES
 
-# Active player registry
+# Active player registry (Player objects loaded in this process). Whether a
+# player is logged in is decided by the session registry, shared by all workers.
 # Key: "name_id"
 _active_players: Dict[str, Player] = {}
+_touched_at: Dict[str, float] = {}
 
 def _make_key(name: str, pid: int) -> str:
   return f"{name}_{pid}"
 
+def _touch(key: str, player: Player, force=False):
+  # Refresh last_seen at most every tenth of the TTL rather than on every access.
+  # The player's own creatures are refreshed with it, so they stay active as long as it does.
+  now = time.monotonic()
+  if force or key not in _touched_at or now - _touched_at[key] >= CONFIG['session_ttl_seconds'] / 10:
+    sessions = [('player', key, {"name": player.name, "id": player.id})]
+    sessions += [creature_session(c) for c in player.creatures if c.id != TEMPLATE_CREATURE_ID]
+    touch_sessions(sessions)
+    _touched_at[key] = now
+
+def _drop_local(key: str):
+  _active_players.pop(key, None)
+  _touched_at.pop(key, None)
+
+def _apply_evictions():
+  for kind, key in evict_idle_sessions():
+    if kind == 'player':
+      _drop_local(key)
+    elif kind == 'creature':
+      _active_creatures.pop(key, None)
+      release_slot(key)
+
 def get_active_player(name: str, pid: int) -> Player | None:
-  return _active_players.get(_make_key(name, pid))
+  """The player if logged in on any worker, loaded into this process on first use."""
+  key = _make_key(name, pid)
+  player = _active_players.get(key)
+  if player is not None and key in _touched_at and \
+     time.monotonic() - _touched_at[key] < CONFIG['session_ttl_seconds'] / 10:
+    return player
+  if get_session('player', key) is None:
+    _drop_local(key)  # logged out or evicted (possibly by another worker)
+    return None
+  if player is None:
+    player = load_player(pid, init_template_creatures(CREATURE_TEMPLATES))
+    if player is None:
+      return None
+    _active_players[key] = player
+  _touch(key, player, force=True)
+  return player
 
-def add_active_player(name: str, pid: int, players_dir="players") -> Player | None:
+def add_active_player(name: str, pid: int) -> Player | None:
+  _apply_evictions()
   key = _make_key(name, pid)
   if key in _active_players:
-    return _active_players[key]  # already active
-
-  os.makedirs(players_dir, exist_ok=True)
-  path = os.path.join(players_dir, f"player_{pid}.json")
+    if get_session('player', key) is not None:
+      _touch(key, _active_players[key], force=True)
+      return _active_players[key]  # already active
+    _drop_local(key)  # logged out through another worker; log in afresh
 
-  # Init creatures so we can attach them to player
-  creatures, _ = init_creatures(CREATURE_TEMPLATES)
+  # Template creatures (shared weights, no optimizers) so we can attach them to player
+  creatures = init_template_creatures(CREATURE_TEMPLATES)
 
-  if os.path.exists(path):
-    # Load existing player file
-    player = load_player(path, creatures)
-  else:
+  # Load existing player (and their creatures) from storage
+  player = load_player(pid, creatures)
+  if player is None:
     # Create new player from template or blank
     template = PLAYER_TEMPLATES.get(name, {"name": name, "creatures": []})
     player = Player(template["name"], pid)
@@ -42,10 +83,19 @@ def add_active_player(name: str, pid: int, players_dir="players") -> Player | No
     save_player(player)
 
   _active_players[key] = player
+  _touch(key, player, force=True)
   return player
 
 def remove_active_player(name: str, pid: int):
-  _active_players.pop(_make_key(name, pid), None)
+  key = _make_key(name, pid)
+  player = _active_players.get(key)
+  if player is not None:
+    for creature in player.creatures:
+      remove_active_creature(creature.id, creature.name)
+  _drop_local(key)
+  remove_session('player', key)
 
 def list_active_players():
-  return list(_active_players.keys())
+  """Keys of players logged in on any worker."""
+  _apply_evictions()
+  return list(active_sessions('player'))
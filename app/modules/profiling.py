@@ -0,0 +1,136 @@
+import hmac
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from app.config import CONFIG
+
+# ------------------ Request Profiling ------------------
+#
+# Opt-in, per-request sampling profiler. A request carrying the admin token
+# (X-Profile header or ?profile= query flag) is timed while a sampler thread
+# snapshots every thread's stack at a fixed interval. Sync handlers run on a
+# threadpool thread and training work on its own thread, so all threads are
+# sampled and each stack is rooted at its thread name. Profiles are kept as
+# JSON in a bounded directory (oldest removed first) and can be exported as
+# collapsed stacks for flamegraph.pl / speedscope.
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY = "profile"
+
+
+def profiling_token():
+  return CONFIG['profile_token']
+
+
+def is_authorized(token):
+  expected = profiling_token()
+  return bool(expected and token) and hmac.compare_digest(token, expected)
+
+
+def profiling_requested(request):
+  return is_authorized(request.headers.get(PROFILE_HEADER) or request.query_params.get(PROFILE_QUERY))
+
+
+class StackSampler(threading.Thread):
+  """Collects collapsed stacks ("thread;outer;...;inner" -> samples) until stopped."""
+
+  def __init__(self, interval):
+    super().__init__(name='profile-sampler', daemon=True)
+    self.interval = interval
+    self.stacks = Counter()
+    self.samples = 0
+    self.stop_event = threading.Event()
+
+  def run(self):
+    while not self.stop_event.wait(self.interval):
+      names = {thread.ident: thread.name for thread in threading.enumerate()}
+      for thread_id, frame in sys._current_frames().items():
+        if thread_id == self.ident:
+          continue
+        stack = []
+        while frame is not None:
+          code = frame.f_code
+          stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+          frame = frame.f_back
+        stack.append(names.get(thread_id, str(thread_id)))
+        self.stacks[';'.join(reversed(stack))] += 1
+      self.samples += 1
+
+  def stop(self):
+    self.stop_event.set()
+    self.join()
+
+
+def start_profile():
+  sampler = StackSampler(CONFIG['profile_sample_interval'])
+  sampler.start()
+  return sampler, time.perf_counter()
+
+
+def finish_profile(profile, method, path, status):
+  """Stop sampling and write the profile; returns its id."""
+  sampler, start = profile
+  duration = time.perf_counter() - start
+  sampler.stop()
+  profile_id = f"{time.strftime('%Y%m%dT%H%M%S')}_{uuid.uuid4().hex[:8]}"
+  save_profile(profile_id, {
+    "id": profile_id,
+    "method": method,
+    "path": path,
+    "status": status,
+    "duration_ms": duration * 1e3,
+    "interval_ms": sampler.interval * 1e3,
+    "samples": sampler.samples,
+    "stacks": dict(sampler.stacks.most_common()),
+  })
+  return profile_id
+
+
+# ------------------ Profile Storage ------------------
+
+def _profile_path(profile_id):
+  return os.path.join(CONFIG['profile_dir'], f"{os.path.basename(profile_id)}.json")
+
+
+def save_profile(profile_id, data):
+  os.makedirs(CONFIG['profile_dir'], exist_ok=True)
+  with open(_profile_path(profile_id), 'w') as f:
+    json.dump(data, f)
+  # Rotate: keep only the newest CONFIG['profile_max_files'] profiles
+  for stale in list_profile_files()[CONFIG['profile_max_files']:]:
+    os.remove(stale)
+
+
+def list_profile_files():
+  """Profile files, newest first."""
+  if not os.path.isdir(CONFIG['profile_dir']):
+    return []
+  paths = [entry.path for entry in os.scandir(CONFIG['profile_dir']) if entry.name.endswith('.json')]
+  return sorted(paths, key=os.path.getmtime, reverse=True)
+
+
+def list_profiles():
+  profiles = []
+  for path in list_profile_files():
+    with open(path, 'r') as f:
+      data = json.load(f)
+    data.pop('stacks', None)
+    profiles.append(data)
+  return profiles
+
+
+def load_profile(profile_id):
+  path = _profile_path(profile_id)
+  if not os.path.exists(path):
+    return None
+  with open(path, 'r') as f:
+    return json.load(f)
+
+
+def collapsed_stacks(profile):
+  """Brendan Gregg's folded format: one "frame;frame;frame count" line per stack."""
+  return ''.join(f"{stack} {count}\n" for stack, count in profile['stacks'].items())
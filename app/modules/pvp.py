@@ -0,0 +1,136 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from app.config import CONFIG
+from app.modules.inference_batcher import choose_action_batched, sample_action
+from app.modules.leaderboard import record_battle, record_series
+from app.modules.logging_utils import LOG_ACTIONS
+from app.modules.weight_bank import assign_slot, bank_slot
+
+# ------------------ Player vs Player ------------------
+#
+# Battles between logged-in players' creatures, played on battle_copy()s of
+# the active creatures (their weights are shared, their hp/statuses are not)
+# with no autograd anywhere: actions come from the creatures' WeightBank slots.
+# A single game sends each decision through the event loop's inference batcher
+# so concurrent games share forward passes; rematches run as one lockstep
+# batch in the batched engine. When the players are given, the result
+# updates the leaderboard's Elo ratings (a rematch series as one result).
+#
+# A single game blocks its thread for its whole length (each decision waits
+# on the event loop's batcher), so games run on their own executor of
+# CONFIG['play_max_concurrent_games'] threads rather than Starlette's shared
+# threadpool, which every sync route (/player, /matchmaking, ...) depends on.
+
+_game_executor = ThreadPoolExecutor(max_workers=CONFIG['play_max_concurrent_games'], thread_name_prefix='pvp')
+
+
+async def run_game(fn, *args):
+  """Run a blocking game function (play_battle, play_rematches, ...) on the game executor."""
+  return await asyncio.get_running_loop().run_in_executor(_game_executor, partial(fn, *args))
+
+
+def shutdown_games():
+  """Stop accepting games and drop queued ones (the app lifespan calls this on shutdown)."""
+  _game_executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _slot(creature):
+  key = f"{creature.id}_{creature.name}"
+  located = bank_slot(key)
+  if located is None or located[0].creatures.get(located[1]) is not creature:
+    located = assign_slot(key, creature)
+  return located
+
+
+class BankPolicy:
+  """Policy over one WeightBank slot (the NumpyPolicy interface used by both battle engines)."""
+
+  def __init__(self, creature):
+    self.bank, self.slot = _slot(creature)
+
+  def probs(self, states):
+    return self.bank.probs([self.slot] * len(states), states)
+
+  def choose_action(self, state, eps):
+    probs = self.probs(state[None, :])[0]
+    return sample_action(probs, eps), probs
+
+
+class BatchedPolicy:
+  """Policy that submits each decision to loop's inference batcher (used from a worker thread)."""
+
+  def __init__(self, creature, loop):
+    self.creature = creature
+    self.loop = loop
+
+  def choose_action(self, state, eps):
+    future = asyncio.run_coroutine_threadsafe(choose_action_batched(self.creature, state, eps), self.loop)
+    return future.result()
+
+
+def _contestants(creature_A, creature_B, policies):
+  """Battle copies labelled name#id, so two players' same-template creatures stay distinguishable."""
+  return tuple(c.battle_copy(name=f"{c.name}#{c.id}", policy=policy)
+               for c, policy in zip((creature_A, creature_B), policies))
+
+
+def _winner_side(copies, winner):
+  if winner == 'stalemate' or winner is None:
+    return winner
+  return 0 if winner == copies[0].name else 1
+
+
+def compact_log(battle_log):
+  """Column-wise event list: tick, acting side, action/event name, hp, energy, reward."""
+  n = battle_log.size
+  return {
+    "tick": battle_log.tick[:n].tolist(),
+    "side": battle_log.creature[:n].tolist(),
+    "action": [LOG_ACTIONS[code] for code in battle_log.action[:n].tolist()],
+    "hp": battle_log.hp[:n].tolist(),
+    "energy": battle_log.energy[:n].tolist(),
+    "reward": [round(r, 4) for r in battle_log.reward[:n].tolist()],
+  }
+
+
+def play_battle(creature_A, creature_B, epsilon=0.0, loop=None, players=None):
+  """One battle between two active creatures; with loop, decisions go through its inference batcher.
+
+  players=((key, name), (key, name)) rates the result.
+  """
+  # The battle engines import torch; keep it out of server startup (see model_factory)
+  from app.modules.battle_simulation import simulate_battle
+  if loop is None:
+    policies = (BankPolicy(creature_A), BankPolicy(creature_B))
+  else:
+    policies = (BatchedPolicy(creature_A, loop), BatchedPolicy(creature_B, loop))
+  copies = _contestants(creature_A, creature_B, policies)
+  reward_A, reward_B, battle_log, winner, _, _ = simulate_battle(*copies, 0, CONFIG['max_ticks'], (epsilon, epsilon))
+  winner = _winner_side(copies, winner)
+  if players:
+    record_battle(players, (creature_A, creature_B), winner)
+  return {
+    "winner": winner,
+    "ticks": int(battle_log.tick[:battle_log.size].max()) + 1 if battle_log.size else 0,
+    "rewards": [reward_A, reward_B],
+    "log": compact_log(battle_log),
+  }
+
+
+def play_rematches(creature_A, creature_B, rematches, epsilon=0.0, players=None):
+  """rematches independent battles in lockstep; per-battle winner side (0, 1, 'stalemate' or None) and ticks."""
+  from app.modules.batched_battle_simulation import simulate_battles_batched
+  from app.modules.torch_loader import torch
+  copies = _contestants(creature_A, creature_B, (BankPolicy(creature_A), BankPolicy(creature_B)))
+  with torch.inference_mode():
+    results = simulate_battles_batched(*copies, 0, CONFIG['max_ticks'], (epsilon, epsilon), rematches)
+  winners = [_winner_side(copies, winner) for _, _, _, winner, _, _ in results]
+  if players:
+    record_series(players, (creature_A, creature_B), winners)
+  return {
+    "wins": [winners.count(0), winners.count(1)],
+    "stalemates": winners.count('stalemate'),
+    "winners": winners,
+    "ticks": [int(log.tick[:log.size].max()) + 1 if log.size else 0 for _, _, log, _, _, _ in results],
+  }
@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from fastapi.responses import Response
+from app.config import CONFIG
+
+# ------------------ Response Cache ------------------
+#
+# Read-through cache for endpoints whose payload is derived from one file on
+# disk (checkpoints, summary.json), or a small fixed set of files. Entries are
+# keyed by name and versioned by each file's (mtime_ns, size), hold the
+# already-serialized JSON body, and are evicted least-recently-used once the
+# total body size exceeds the cap.
+
+class CachedResponse:
+  def __init__(self, version, body):
+    self.version = version
+    self.body = body
+    self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def _file_version(path):
+  try:
+    stat = os.stat(path)
+  except FileNotFoundError:
+    return None
+  return (stat.st_mtime_ns, stat.st_size)
+
+
+class ResponseCache:
+  def __init__(self, max_bytes):
+    self.max_bytes = max_bytes
+    self.entries: OrderedDict[str, CachedResponse] = OrderedDict()
+    self.total_bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.lock = threading.Lock()
+
+  def get(self, key, paths, build_payload):
+    """Return the CachedResponse for key, rebuilding it when any of paths changed on disk."""
+    version = tuple(_file_version(path) for path in ((paths,) if isinstance(paths, str) else paths))
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry and entry.version == version:
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+      self.misses += 1
+
+    # Build outside the lock; concurrent misses for one key just build twice
+    entry = CachedResponse(version, json.dumps(build_payload()).encode())
+    with self.lock:
+      old = self.entries.pop(key, None)
+      if old:
+        self.total_bytes -= len(old.body)
+      if len(entry.body) <= self.max_bytes:
+        self.entries[key] = entry
+        self.total_bytes += len(entry.body)
+      while self.total_bytes > self.max_bytes:
+        _, evicted = self.entries.popitem(last=False)
+        self.total_bytes -= len(evicted.body)
+    return entry
+
+  def invalidate(self, key=None):
+    with self.lock:
+      if key is None:
+        self.entries.clear()
+        self.total_bytes = 0
+      elif key in self.entries:
+        self.total_bytes -= len(self.entries.pop(key).body)
+
+
+response_cache = ResponseCache(CONFIG['response_cache_max_bytes'])
+
+
+def cached_json_response(request, key, paths, build_payload):
+  """Serve a cached JSON payload, answering 304 when the client's ETag is current."""
+  entry = response_cache.get(key, paths, build_payload)
+  headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+  if entry.etag in request.headers.get("if-none-match", ""):
+    return Response(status_code=304, headers=headers)
+  return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,180 @@
+import json
+import os
+import socket
+import threading
+import time
+from app.config import CONFIG
+from app.modules.storage import SqlitePool
+
+# ------------------ Session Registry & ID Allocation ------------------
+#
+# State that must agree across every worker process (and every host sharing
+# the database file): which players/creatures are active, and which IDs have
+# been handed out. Both live in the same embedded SQLite file as storage.
+#
+# IDs are allocated in blocks of CONFIG['id_block_size']: a process reserves
+# a range with one write and hands it out from memory. Sessions carry a
+# last_seen timestamp; sessions idle for CONFIG['session_ttl_seconds'] are
+# evicted.
+
+# Tables whose existing IDs new allocations must start above
+ID_TABLES = {'player': 'players', 'creature': 'creatures'}
+
+
+class SessionRegistry(SqlitePool):
+  SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS id_blocks (
+      kind TEXT PRIMARY KEY,
+      next_id INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS sessions (
+      kind TEXT NOT NULL,
+      key TEXT NOT NULL,
+      data TEXT,
+      owner TEXT NOT NULL,
+      last_seen REAL NOT NULL,
+      PRIMARY KEY (kind, key)
+    )""",
+    "CREATE INDEX IF NOT EXISTS sessions_by_last_seen ON sessions (last_seen)",
+  )
+
+  UPSERT_SESSION = (
+    "INSERT INTO sessions (kind, key, data, owner, last_seen) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (kind, key) DO UPDATE SET "
+    "data = COALESCE(excluded.data, sessions.data), owner = excluded.owner, last_seen = excluded.last_seen"
+  )
+  SELECT_SESSIONS = "SELECT key, data FROM sessions WHERE kind = ? AND last_seen >= ? ORDER BY key"
+  SELECT_SESSION = "SELECT data FROM sessions WHERE kind = ? AND key = ? AND last_seen >= ?"
+
+  def allocate_block(self, kind, size):
+    """Reserve size consecutive IDs for kind; returns the first one."""
+    with self.transaction() as conn:
+      row = conn.execute("SELECT next_id FROM id_blocks WHERE kind = ?", (kind,)).fetchone()
+      # Never below existing IDs, which may have been imported after the last block
+      first = max(row[0] if row else 1, self._initial_id(conn, kind))
+      conn.execute("INSERT INTO id_blocks (kind, next_id) VALUES (?, ?) "
+                   "ON CONFLICT (kind) DO UPDATE SET next_id = excluded.next_id", (kind, first + size))
+    return first
+
+  @staticmethod
+  def _initial_id(conn, kind):
+    table = ID_TABLES.get(kind)
+    exists = table and conn.execute(
+      "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    if not exists:
+      return 1
+    return conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}").fetchone()[0]
+
+  def touch(self, kind, key, data=None):
+    self.touch_many([(kind, key, data)])
+
+  def touch_many(self, sessions):
+    """Touch several (kind, key, data) sessions in one transaction."""
+    owner, now = _owner(), time.time()
+    with self.transaction() as conn:
+      conn.executemany(self.UPSERT_SESSION,
+                       [(kind, key, json.dumps(data) if data is not None else None, owner, now)
+                        for kind, key, data in sessions])
+
+  def remove(self, kind, key):
+    with self.transaction() as conn:
+      conn.execute("DELETE FROM sessions WHERE kind = ? AND key = ?", (kind, key))
+
+  def get(self, kind, key, ttl):
+    """Session data if key is active (seen within ttl seconds) on any worker, else None."""
+    with self.connection() as conn:
+      row = conn.execute(self.SELECT_SESSION, (kind, key, time.time() - ttl)).fetchone()
+    return (json.loads(row[0]) if row[0] else {}) if row else None
+
+  def active(self, kind, ttl):
+    """{key: data} of sessions of kind seen within ttl seconds."""
+    with self.connection() as conn:
+      rows = conn.execute(self.SELECT_SESSIONS, (kind, time.time() - ttl)).fetchall()
+    return {key: json.loads(data) if data else {} for key, data in rows}
+
+  def evict(self, ttl):
+    """Delete sessions idle for longer than ttl seconds; returns the evicted (kind, key) pairs."""
+    cutoff = time.time() - ttl
+    with self.transaction() as conn:
+      evicted = conn.execute("SELECT kind, key FROM sessions WHERE last_seen < ?", (cutoff,)).fetchall()
+      conn.execute("DELETE FROM sessions WHERE last_seen < ?", (cutoff,))
+    return evicted
+
+
+def _owner():
+  return f"{socket.gethostname()}:{os.getpid()}"
+
+
+_registry: SessionRegistry | None = None
+_registry_pid = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> SessionRegistry:
+  """Process-wide registry, created on first use (and again in a forked child)."""
+  global _registry, _registry_pid
+  if _registry is None or _registry_pid != os.getpid():
+    with _registry_lock:
+      if _registry is None or _registry_pid != os.getpid():
+        _registry = SessionRegistry(CONFIG['storage_sqlite_path'], CONFIG['storage_pool_size'])
+        _registry_pid = os.getpid()
+  return _registry
+
+
+# ------------------ ID Allocation ------------------
+
+class IdAllocator:
+  """Hands out IDs for one kind from a block reserved in the registry."""
+
+  def __init__(self, kind):
+    self.kind = kind
+    self.next_id = 0
+    self.end = 0
+    self.pid = None
+    self.lock = threading.Lock()
+
+  def __next__(self):
+    with self.lock:
+      # A forked child must not reuse the parent's remaining block
+      if self.next_id >= self.end or self.pid != os.getpid():
+        size = CONFIG['id_block_size']
+        self.next_id = get_registry().allocate_block(self.kind, size)
+        self.end = self.next_id + size
+        self.pid = os.getpid()
+      allocated = self.next_id
+      self.next_id += 1
+      return allocated
+
+  def __iter__(self):
+    return self
+
+
+# ------------------ Sessions ------------------
+
+_last_eviction = None
+
+
+def touch_sessions(sessions):
+  get_registry().touch_many(sessions)
+
+
+def remove_session(kind, key):
+  get_registry().remove(kind, key)
+
+
+def get_session(kind, key):
+  return get_registry().get(kind, key, CONFIG['session_ttl_seconds'])
+
+
+def active_sessions(kind):
+  return get_registry().active(kind, CONFIG['session_ttl_seconds'])
+
+
+def evict_idle_sessions(force=False):
+  """Evict idle sessions at most once per CONFIG['session_evict_interval'] seconds per process."""
+  global _last_eviction
+  now = time.monotonic()
+  if not force and _last_eviction is not None and now - _last_eviction < CONFIG['session_evict_interval']:
+    return []
+  _last_eviction = now
+  return get_registry().evict(CONFIG['session_ttl_seconds'])
@@ -0,0 +1,267 @@
+import abc
+import glob
+import json
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from app.config import CONFIG
+
+# ------------------ Storage Backends ------------------
+#
+# Players and creatures are persisted as plain dicts (Player.to_dict /
+# Creature.to_dict) through a backend chosen by CONFIG['storage_backend']:
+#
+#   'json'   - one pretty-printed file per entity under players/ and creatures/
+#   'sqlite' - one embedded database (WAL mode, pooled connections); a player
+#              and all their creatures are read back with a single query
+#
+# Existing JSON directories can be copied into SQLite with
+# `python -m app.modules.storage_migration`; this also happens automatically
+# the first time an empty SQLite store is opened next to JSON player data.
+
+class StorageBackend(abc.ABC):
+  """Interface shared by the storage backends. Records are JSON-serializable dicts."""
+
+  @abc.abstractmethod
+  def save_player(self, player_data, creatures_data=()):
+    """Upsert a player and (optionally) the creatures they own."""
+
+  @abc.abstractmethod
+  def load_player(self, player_id):
+    """Return (player_data, [creature_data, ...]) or None if the player does not exist."""
+
+  @abc.abstractmethod
+  def save_creatures(self, creatures_data, player_id=None):
+    """Bulk upsert of creature records."""
+
+  @abc.abstractmethod
+  def load_creature(self, creature_id, name):
+    """Return one creature record, or None."""
+
+  def close(self):
+    pass
+
+
+class JsonStorage(StorageBackend):
+  def __init__(self, player_dir='players', creature_dir='creatures'):
+    self.player_dir = player_dir
+    self.creature_dir = creature_dir
+
+  def _player_path(self, player_id):
+    return os.path.join(self.player_dir, f"player_{player_id}.json")
+
+  def _creature_path(self, creature_id, name):
+    return os.path.join(self.creature_dir, f"creature_{creature_id}_{name}.json")
+
+  def save_player(self, player_data, creatures_data=()):
+    self.save_creatures(creatures_data, player_data['id'])
+    if creatures_data:
+      # Player files record which creature files are theirs, as SQLite's player_id column does
+      player_data = {**player_data, "creature_ids": [[data['id'], data['name']] for data in creatures_data]}
+    os.makedirs(self.player_dir, exist_ok=True)
+    with open(self._player_path(player_data['id']), "w") as f:
+      json.dump(player_data, f, indent=2)
+
+  def load_player(self, player_id):
+    path = self._player_path(player_id)
+    if not os.path.exists(path):
+      return None
+    with open(path, "r") as f:
+      player_data = json.load(f)
+    refs = player_data.pop("creature_ids", None)
+    if refs is None:
+      refs = self._owned_creature_refs(player_data)
+    creatures = [self.load_creature(creature_id, name) for creature_id, name in refs]
+    return player_data, [data for data in creatures if data is not None]
+
+  def _owned_creature_refs(self, player_data):
+    """(id, name) of creature files owned by the player, for player files written without creature_ids."""
+    refs = []
+    for name in player_data.get('creatures', []):
+      for path in sorted(glob.glob(os.path.join(self.creature_dir, f"creature_*_{name}.json"))):
+        with open(path, "r") as f:
+          data = json.load(f)
+        if data.get('owner') == player_data['name'] and data.get('name') == name:
+          refs.append((data['id'], name))
+          break
+    return refs
+
+  def save_creatures(self, creatures_data, player_id=None):
+    os.makedirs(self.creature_dir, exist_ok=True)
+    for data in creatures_data:
+      with open(self._creature_path(data['id'], data['name']), "w") as f:
+        json.dump(data, f, indent=2)
+
+  def load_creature(self, creature_id, name):
+    path = self._creature_path(creature_id, name)
+    if not os.path.exists(path):
+      return None
+    with open(path, "r") as f:
+      return json.load(f)
+
+
+class SqlitePool:
+  """Pooled connections to one SQLite file in WAL mode, shared by the SQLite-backed stores."""
+  SCHEMA = ()
+
+  def __init__(self, path, pool_size=4):
+    self.path = path
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    self.pool = queue.LifoQueue()
+    for _ in range(pool_size):
+      self.pool.put(self._connect())
+    with self.connection() as conn:
+      for statement in self.SCHEMA:
+        conn.execute(statement)
+
+  def _connect(self):
+    conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, cached_statements=64)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL + NORMAL: commits are durable across crashes of the process, not of the OS
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=5000")
+    return conn
+
+  @contextmanager
+  def connection(self):
+    """Borrow a pooled connection; blocks while every connection is in use."""
+    conn = self.pool.get()
+    try:
+      yield conn
+    finally:
+      self.pool.put(conn)
+
+  @contextmanager
+  def transaction(self):
+    with self.connection() as conn:
+      conn.execute("BEGIN IMMEDIATE")
+      try:
+        yield conn
+      except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+      conn.execute("COMMIT")
+
+  def close(self):
+    while True:
+      try:
+        self.pool.get_nowait().close()
+      except queue.Empty:
+        return
+
+
+class SqliteStorage(SqlitePool, StorageBackend):
+  SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS players (
+      id INTEGER PRIMARY KEY,
+      name TEXT NOT NULL,
+      data TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS creatures (
+      id INTEGER NOT NULL,
+      name TEXT NOT NULL,
+      player_id INTEGER,
+      data TEXT NOT NULL,
+      PRIMARY KEY (id, name)
+    )""",
+    "CREATE INDEX IF NOT EXISTS creatures_by_player ON creatures (player_id)",
+  )
+
+  # Fixed SQL strings, so sqlite3's per-connection statement cache keeps them prepared
+  UPSERT_PLAYER = (
+    "INSERT INTO players (id, name, data) VALUES (?, ?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET name = excluded.name, data = excluded.data"
+  )
+  UPSERT_CREATURE = (
+    "INSERT INTO creatures (id, name, player_id, data) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (id, name) DO UPDATE SET "
+    "player_id = COALESCE(excluded.player_id, creatures.player_id), data = excluded.data"
+  )
+  SELECT_PLAYER = (
+    "SELECT p.data, c.data FROM players p "
+    "LEFT JOIN creatures c ON c.player_id = p.id "
+    "WHERE p.id = ? ORDER BY c.id"
+  )
+  SELECT_CREATURE = "SELECT data FROM creatures WHERE id = ? AND name = ?"
+
+  @staticmethod
+  def _creature_rows(creatures_data, player_id):
+    return [(data['id'], data['name'], player_id, json.dumps(data)) for data in creatures_data]
+
+  def save_player(self, player_data, creatures_data=()):
+    with self.transaction() as conn:
+      conn.execute(self.UPSERT_PLAYER, (player_data['id'], player_data['name'], json.dumps(player_data)))
+      conn.executemany(self.UPSERT_CREATURE, self._creature_rows(creatures_data, player_data['id']))
+
+  def save_players(self, records):
+    """Bulk upsert of (player_data, creatures_data) pairs in one transaction."""
+    player_rows, creature_rows = [], []
+    for player_data, creatures_data in records:
+      player_rows.append((player_data['id'], player_data['name'], json.dumps(player_data)))
+      creature_rows.extend(self._creature_rows(creatures_data, player_data['id']))
+    with self.transaction() as conn:
+      conn.executemany(self.UPSERT_PLAYER, player_rows)
+      conn.executemany(self.UPSERT_CREATURE, creature_rows)
+
+  def load_player(self, player_id):
+    with self.connection() as conn:
+      rows = conn.execute(self.SELECT_PLAYER, (player_id,)).fetchall()
+    if not rows:
+      return None
+    return json.loads(rows[0][0]), [json.loads(creature) for _, creature in rows if creature is not None]
+
+  def save_creatures(self, creatures_data, player_id=None):
+    with self.transaction() as conn:
+      conn.executemany(self.UPSERT_CREATURE, self._creature_rows(creatures_data, player_id))
+
+  def load_creature(self, creature_id, name):
+    with self.connection() as conn:
+      row = conn.execute(self.SELECT_CREATURE, (creature_id, name)).fetchone()
+    return json.loads(row[0]) if row else None
+
+  def is_empty(self):
+    with self.connection() as conn:
+      return conn.execute("SELECT 1 FROM players LIMIT 1").fetchone() is None
+
+
+def import_legacy_json(storage, player_dir='players', creature_dir='creatures'):
+  """Migrate JSON player data into storage if storage has no players yet.
+
+  Keeps players saved under the old JSON backend from silently becoming new
+  accounts after switching to SQLite. Returns True if a migration ran.
+  """
+  if not glob.glob(os.path.join(player_dir, "player_*.json")) or not storage.is_empty():
+    return False
+  from app.modules.storage_migration import migrate_json_to_sqlite
+  print(f"⚠️ Found JSON player data in {player_dir}/ and an empty database; migrating it into {storage.path}")
+  migrate_json_to_sqlite(player_dir, creature_dir, storage)
+  return True
+
+
+def create_storage(backend=None):
+  backend = backend or CONFIG['storage_backend']
+  if backend == 'sqlite':
+    storage = SqliteStorage(CONFIG['storage_sqlite_path'], CONFIG['storage_pool_size'])
+    import_legacy_json(storage)
+    return storage
+  if backend == 'json':
+    return JsonStorage()
+  raise ValueError(f"Unknown storage backend: {backend}")
+
+
+_storage: StorageBackend | None = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> StorageBackend:
+  """Process-wide backend, created on first use."""
+  global _storage
+  if _storage is None:
+    with _storage_lock:
+      if _storage is None:
+        _storage = create_storage()
+  return _storage
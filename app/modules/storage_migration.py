@@ -0,0 +1,66 @@
+"""
+storage_migration.py
+Copy the JSON players/ and creatures/ directories into the SQLite store.
+Run: python -m app.modules.storage_migration [--players players] [--creatures creatures] [--db data/game.db]
+"""
+import argparse
+import glob
+import json
+import os
+from app.config import CONFIG
+from app.modules.storage import SqliteStorage
+
+def _read_json_dir(directory, pattern):
+  for path in sorted(glob.glob(os.path.join(directory, pattern))):
+    try:
+      with open(path, "r") as f:
+        yield json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+      print(f"⚠️ Skipping unreadable {path}: {e}")
+
+def migrate_json_to_sqlite(player_dir, creature_dir, storage, batch_size=1000):
+  """Upsert every JSON record into storage in batches; safe to re-run.
+
+  Creatures are linked to the player file listing them in creature_ids, else
+  to the player whose name matches their owner when that name is unique,
+  otherwise they are stored unowned.
+  """
+  players = list(_read_json_dir(player_dir, "player_*.json"))
+  player_ids_by_name = {}
+  player_by_creature = {}
+  for data in players:
+    player_ids_by_name.setdefault(data['name'], []).append(data['id'])
+    for creature_id, name in data.pop('creature_ids', []):
+      player_by_creature[(creature_id, name)] = data['id']
+
+  by_player = {data['id']: [] for data in players}
+  unowned = []
+  for data in _read_json_dir(creature_dir, "creature_*.json"):
+    ids = player_ids_by_name.get(data.get('owner'), [])
+    if (data['id'], data['name']) in player_by_creature:
+      by_player[player_by_creature[(data['id'], data['name'])]].append(data)
+    elif len(ids) == 1:
+      by_player[ids[0]].append(data)
+    else:
+      unowned.append(data)
+
+  for start in range(0, len(players), batch_size):
+    storage.save_players((data, by_player[data['id']]) for data in players[start:start + batch_size])
+  for start in range(0, len(unowned), batch_size):
+    storage.save_creatures(unowned[start:start + batch_size])
+
+  creatures = sum(len(c) for c in by_player.values()) + len(unowned)
+  print(f"📦 Migrated {len(players)} players and {creatures} creatures into {storage.path}")
+  return len(players), creatures
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--players", default="players")
+  parser.add_argument("--creatures", default="creatures")
+  parser.add_argument("--db", default=CONFIG['storage_sqlite_path'])
+  args = parser.parse_args()
+  storage = SqliteStorage(args.db)
+  try:
+    migrate_json_to_sqlite(args.players, args.creatures, storage)
+  finally:
+    storage.close()
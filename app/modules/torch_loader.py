@@ -0,0 +1,12 @@
+import torch
+from app.config import CONFIG
+
+# ------------------ Torch Loader ------------------
+#
+# The one place torch is imported from. Modules that need torch import it
+# from here (at module level when they are torch-only, inside functions on
+# read paths that must start without it), so whichever path loads torch
+# first also seeds it, exactly once per process.
+
+if CONFIG['use_seed']:
+  torch.manual_seed(CONFIG['seed'])
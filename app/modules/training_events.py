@@ -0,0 +1,111 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from app.config import CONFIG
+
+# ------------------ Training Event Stream ------------------
+#
+# The trainer thread publishes one event per epoch; every connected client
+# gets its own bounded mailbox. Publishing never waits on a client: when a
+# slow client's mailbox is full the oldest pending event is dropped and the
+# number of dropped events is reported on the next one it receives. Progress
+# fields (wins, rolling win rates) are cumulative, so nothing is lost that a
+# later event does not already carry.
+
+class Subscription:
+  def __init__(self, job_id, loop, include_activations=False):
+    self.job_id = job_id
+    self.loop = loop
+    self.include_activations = include_activations
+    self.pending = deque()
+    self.coalesced = 0
+    self.closed = False
+    self.lock = threading.Lock()
+    self.wakeup = asyncio.Event()
+
+  def push(self, event, final=False):
+    """Called from the trainer thread; never blocks on the client."""
+    with self.lock:
+      if self.closed:
+        return
+      if len(self.pending) >= CONFIG['stream_max_pending_events']:
+        self.pending.popleft()
+        self.coalesced += 1
+      self.pending.append(event)
+      self.closed = final
+    try:
+      self.loop.call_soon_threadsafe(self.wakeup.set)
+    except RuntimeError:
+      pass  # event loop already gone; the client disconnected
+
+  def drain(self):
+    with self.lock:
+      events = list(self.pending)
+      self.pending.clear()
+      coalesced, self.coalesced = self.coalesced, 0
+      return events, coalesced, self.closed
+
+
+_subscriptions: dict[str, list[Subscription]] = {}
+_subscriptions_lock = threading.Lock()
+
+
+def subscribe(job_id, include_activations=False) -> Subscription:
+  """Register a subscription owned by the running event loop."""
+  subscription = Subscription(job_id, asyncio.get_running_loop(), include_activations)
+  with _subscriptions_lock:
+    _subscriptions.setdefault(job_id, []).append(subscription)
+  return subscription
+
+
+def unsubscribe(subscription: Subscription):
+  with _subscriptions_lock:
+    subscribers = _subscriptions.get(subscription.job_id, [])
+    if subscription in subscribers:
+      subscribers.remove(subscription)
+    if not subscribers:
+      _subscriptions.pop(subscription.job_id, None)
+
+
+def publish(job_id, event, final=False):
+  """Fan an event out to every subscriber of job_id (trainer thread)."""
+  with _subscriptions_lock:
+    subscribers = list(_subscriptions.get(job_id, []))
+  for subscription in subscribers:
+    if not subscription.include_activations and 'activations' in event:
+      event_for_client = {k: v for k, v in event.items() if k != 'activations'}
+    else:
+      event_for_client = event
+    subscription.push(event_for_client, final=final)
+
+
+def _format_sse(event_type, data):
+  return f"event: {event_type}\ndata: {json.dumps(data)}\n\n"
+
+
+async def stream_job_events(job, include_activations=False):
+  """Async generator of Server-Sent Events for a training job."""
+  subscription = subscribe(job.id, include_activations)
+  try:
+    # Current state first, so late subscribers do not wait for the next epoch
+    yield _format_sse('status', job.to_dict())
+    if job.finished_at is not None:
+      return
+    while True:
+      try:
+        await asyncio.wait_for(subscription.wakeup.wait(), CONFIG['stream_keepalive_seconds'])
+      except asyncio.TimeoutError:
+        yield ": keepalive\n\n"
+        continue
+      subscription.wakeup.clear()
+      events, coalesced, closed = subscription.drain()
+      for event in events:
+        if coalesced:
+          event = {**event, 'coalesced': coalesced}
+          coalesced = 0
+        yield _format_sse(event.get('type', 'progress'), event)
+      if closed:
+        return
+  finally:
+    unsubscribe(subscription)
@@ -0,0 +1,157 @@
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from app.config import CONFIG
+from app.modules.training_events import publish
+
+# ------------------ Training Jobs ------------------
+#
+# /battle/train hands runs to a dedicated executor instead of blocking a
+# FastAPI threadpool worker. Jobs run one at a time (they share checkpoint
+# files) and report progress through training_loop's progress_callback.
+# training_loop (and with it torch) is imported when the first job runs.
+
+class TrainingJob:
+  def __init__(self):
+    self.id = uuid.uuid4().hex
+    self.status = 'queued'
+    self.created_at = time.time()
+    self.started_at = None
+    self.finished_at = None
+    self.epochs_total = CONFIG['epoch_batch_size']
+    self.epochs_done = 0
+    self.battles = 0
+    self.wins = {}
+    self.recent = deque(maxlen=CONFIG['win_rate_window'])
+    self.summary = None
+    self.error = None
+    self.cancel_event = threading.Event()
+
+  def on_progress(self, progress):
+    """progress_callback for training_loop; raises to abort a cancelled run."""
+    if self.cancel_event.is_set():
+      from app.modules.training_loop import TrainingCancelled
+      raise TrainingCancelled(self.id)
+    self.epochs_done = progress['epoch'] + 1
+    self.epochs_total = progress['epochs_total']
+    self.battles = progress['battles']
+    self.wins = progress['wins']
+    self.recent.append((progress['epoch_wins'], progress['epoch_battles']))
+    publish(self.id, {
+      'type': 'progress',
+      'epoch': progress['epoch'],
+      'epochs_total': progress['epochs_total'],
+      'winner': progress['winner'],
+      'wins': progress['wins'],
+      'rewards': progress['rewards'],
+      'epsilons': progress['epsilons'],
+      'rolling_win_rates': self.rolling_win_rates(),
+      'eta_seconds': self.eta_seconds(),
+      'activations': progress['activations'],
+    })
+
+  def rolling_win_rates(self):
+    """Win rates over the last CONFIG['win_rate_window'] epochs."""
+    battles = sum(epoch_battles for _, epoch_battles in self.recent)
+    if not battles:
+      return {}
+    totals = {}
+    for epoch_wins, _ in self.recent:
+      for name, wins in epoch_wins.items():
+        totals[name] = totals.get(name, 0) + wins
+    return {name: wins / battles for name, wins in totals.items()}
+
+  def eta_seconds(self):
+    if self.status != 'running' or not self.epochs_done:
+      return None
+    elapsed = time.time() - self.started_at
+    return elapsed / self.epochs_done * (self.epochs_total - self.epochs_done)
+
+  def to_dict(self):
+    return {
+      "job_id": self.id,
+      "status": self.status,
+      "epochs_done": self.epochs_done,
+      "epochs_total": self.epochs_total,
+      "battles": self.battles,
+      "win_rates": {name: wins / self.battles for name, wins in self.wins.items()} if self.battles else {},
+      "rolling_win_rates": self.rolling_win_rates(),
+      "eta_seconds": self.eta_seconds(),
+      "created_at": self.created_at,
+      "started_at": self.started_at,
+      "finished_at": self.finished_at,
+      "summary": self.summary,
+      "error": self.error,
+    }
+
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='training')
+_jobs: OrderedDict[str, TrainingJob] = OrderedDict()
+_jobs_lock = threading.Lock()
+
+
+def _run_job(job: TrainingJob):
+  if job.cancel_event.is_set():
+    return
+  from app.modules.training_loop import training_loop, TrainingCancelled
+  job.status = 'running'
+  job.started_at = time.time()
+  try:
+    result = training_loop(progress_callback=job.on_progress)
+    job.summary = result.get('summary')
+    job.status = 'completed'
+  except TrainingCancelled:
+    job.status = 'cancelled'
+  except Exception as e:
+    job.error = str(e)
+    job.status = 'failed'
+  finally:
+    job.finished_at = time.time()
+    publish(job.id, {'type': 'done', **job.to_dict()}, final=True)
+
+
+def submit_training_job() -> TrainingJob:
+  job = TrainingJob()
+  with _jobs_lock:
+    _jobs[job.id] = job
+    # Forget the oldest finished jobs beyond the retention limit
+    finished = [j.id for j in _jobs.values() if j.finished_at is not None]
+    for job_id in finished[:max(0, len(_jobs) - CONFIG['training_jobs_retained'])]:
+      del _jobs[job_id]
+  _executor.submit(_run_job, job)
+  return job
+
+
+def get_training_job(job_id: str) -> TrainingJob | None:
+  return _jobs.get(job_id)
+
+
+def cancel_training_job(job_id: str) -> TrainingJob | None:
+  job = _jobs.get(job_id)
+  if job and job.finished_at is None:
+    job.cancel_event.set()
+    if job.status == 'queued':
+      job.status = 'cancelled'
+      job.finished_at = time.time()
+      publish(job.id, {'type': 'done', **job.to_dict()}, final=True)
+  return job
+
+
+def list_training_jobs():
+  return [job.to_dict() for job in list(_jobs.values())]
+
+
+def shutdown_training_jobs():
+  """Cancel outstanding jobs, wait for the running one, and stop the rollout worker processes."""
+  with _jobs_lock:
+    jobs = list(_jobs.values())
+  for job in jobs:
+    cancel_training_job(job.id)
+  _executor.shutdown(wait=True)
+  # Only loaded (together with torch) if a job used rollout workers
+  parallel_rollouts = sys.modules.get('app.modules.parallel_rollouts')
+  if parallel_rollouts is not None:
+    parallel_rollouts.shutdown_rollout_pool()
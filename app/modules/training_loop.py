@@ -1,13 +1,20 @@
 import os
 import copy
-import torch
+from collections import deque
+import numpy as np
 from app.config import CONFIG, CREATURE_TEMPLATES
 from app.modules.creature_manager import init_creatures, Creature
 from app.modules.battle_simulation import simulate_battle
-from app.modules.logging_utils import write_logs
+from app.modules.batched_battle_simulation import simulate_battles_batched
+from app.modules.logging_utils import BattleLog, TrainingStats, write_logs
+from app.modules.metrics import enabled as metrics_enabled, record_battles, record_policy_cache, timed, training_phase_seconds
+from app.modules.model_factory import get_optimizer
 from app.modules.neural_network import reinforce_update
-from app.modules.network_persistence import resume_from_checkpoint, save_checkpoints
-from app.modules.utils import create_checkpoint_paths
+from app.modules.network_persistence import CheckpointManager
+from app.modules.numpy_policy import refresh_policy
+from app.modules.parallel_rollouts import simulate_battles_parallel
+from app.modules.torch_loader import torch
+from app.modules.weight_store import publish_weights
 
 def capture_activations(creature, input_tensor):
   """Return a list of neuron activations (layer outputs) for visualization."""
@@ -29,35 +36,51 @@ def capture_activations(creature, input_tensor):
     if isinstance(module, torch.nn.Linear):
       hooks.append(module.register_forward_hook(forward_hook))
 
-  creature.nn(input_tensor)
+  creature.nn(torch.as_tensor(input_tensor))
 
   for hook in hooks:
     hook.remove()
 
   return activations
 
-def training_loop():
-  """Run full training loop using cloned creatures (training state)."""
+class TrainingCancelled(Exception):
+  """Raised by a progress_callback to abort a run before checkpoints are saved."""
+
+def training_loop(progress_callback=None):
+  """Run full training loop using cloned creatures (training state).
+
+  progress_callback, if given, is called once per epoch with a progress dict
+  and may raise TrainingCancelled to stop the run.
+  """
   os.makedirs(CONFIG['log_dir'], exist_ok=True)
   os.makedirs(CONFIG['checkpoint_dir'], exist_ok=True)
 
-  # Initialize persistent creature instances and their optimizers
-  base_creatures, optimizers = init_creatures(CREATURE_TEMPLATES)
+  # Initialize persistent creature instances
+  base_creatures, _ = init_creatures(CREATURE_TEMPLATES)
 
-  # Clone creatures to use purely for training
+  # Clone creatures to use purely for training, each with a fresh optimizer
+  # over the clone's own parameters so steps reach the trained networks
   creature_names = list(base_creatures.keys())[:2]
   creature_A = copy.deepcopy(base_creatures[creature_names[0]])
   creature_B = copy.deepcopy(base_creatures[creature_names[1]])
-  optimizer_A = optimizers[creature_names[0]]
-  optimizer_B = optimizers[creature_names[1]]
+  creature_A.optimizer = creature_B.optimizer = None
+  optimizer_A = get_optimizer(creature_A)
+  optimizer_B = get_optimizer(creature_B)
 
-  # Reset runtime stats for training
+  # Reset runtime stats for training. Only the newest activations are kept:
+  # /battle/nn-graph shows at most activations_history_limit entries, so
+  # memory stays bounded however many epochs the run has
   for c in [creature_A, creature_B]:
     c.reset()
-    c.activations_history = []
+    c.activations_history = deque(maxlen=CONFIG['activations_history_limit'])
 
   # Resume from existing checkpoints if available
-  resume_from_checkpoint(creature_A, creature_B, optimizer_A, optimizer_B)
+  checkpoints = CheckpointManager(creature_A, creature_B, optimizer_A, optimizer_B)
+  with timed(training_phase_seconds, 'checkpoint_load'):
+    checkpoints.resume()
+  if CONFIG['numpy_rollouts']:
+    refresh_policy(creature_A)
+    refresh_policy(creature_B)
 
   nn_config_A = getattr(creature_A, 'nn_config', {})
   nn_config_B = getattr(creature_B, 'nn_config', {})
@@ -66,8 +89,13 @@ def training_loop():
   epsilon_A = nn_config_A.get('epsilon', CONFIG['epsilon'])
   epsilon_B = nn_config_B.get('epsilon', CONFIG['epsilon'])
   wins = {creature_A.name: 0, creature_B.name: 0}
+  battles = 0
+  stats = TrainingStats([creature_A.name, creature_B.name])
 
-  batched_logs, batched_logs_total = [], []
+  batched_logs = []
+
+  # Independent RNG streams for rollout workers, derived from the run seed
+  seed_sequence = np.random.SeedSequence(CONFIG['seed'] if CONFIG['use_seed'] else None)
 
   for epoch in range(CONFIG['epoch_batch_size']):
     epsilon_A = max(nn_config_A.get('eps_min', CONFIG['eps_min']),
@@ -75,63 +103,108 @@ def training_loop():
     epsilon_B = max(nn_config_B.get('eps_min', CONFIG['eps_min']),
                     epsilon_B * nn_config_B.get('eps_decay_rate', CONFIG['eps_decay_rate']))
 
-    reward_A, reward_B, battle_log, winner, state_tensor_A, state_tensor_B = simulate_battle(
-      creature_A, creature_B, epoch, CONFIG['max_ticks'], (epsilon_A, epsilon_B)
-    )
-
-    if winner and winner != 'stalemate':
-      wins[winner] += 1
-
-    reinforce_update(creature_A, optimizer_A, battle_log, baseline_A,
-                     nn_config_A.get('entropy_beta', CONFIG['entropy_beta']))
-    reinforce_update(creature_B, optimizer_B, battle_log, baseline_B,
-                     nn_config_B.get('entropy_beta', CONFIG['entropy_beta']))
+    with timed(training_phase_seconds, 'rollout'):
+      if CONFIG['rollout_workers'] > 0:
+        results = simulate_battles_parallel(
+          creature_A, creature_B, epoch, CONFIG['max_ticks'], (epsilon_A, epsilon_B),
+          CONFIG['rollout_batch_size'], CONFIG['rollout_workers'], seed_sequence
+        )
+      elif CONFIG['rollout_batch_size'] > 1:
+        results = simulate_battles_batched(
+          creature_A, creature_B, epoch, CONFIG['max_ticks'], (epsilon_A, epsilon_B), CONFIG['rollout_batch_size']
+        )
+      else:
+        results = [simulate_battle(creature_A, creature_B, epoch, CONFIG['max_ticks'], (epsilon_A, epsilon_B))]
+
+    battles += len(results)
+    if metrics_enabled():
+      record_battles(results)
+      # Before refresh_policy below replaces the snapshots (and their tables)
+      record_policy_cache((creature_A, creature_B))
+    for reward_A, reward_B, battle_log, winner, _, _ in results:
+      if winner and winner != 'stalemate':
+        wins[winner] += 1
+      stats.add_battle(battle_log, {creature_A.name: reward_A, creature_B.name: reward_B}, winner)
+      batched_logs.append((epoch, battle_log, reward_A, reward_B,
+                           wins[creature_A.name], wins[creature_B.name]))
+
+    # One REINFORCE step per epoch over every battle rolled out in it
+    epoch_log = BattleLog.concatenate([result[2] for result in results])
+    reward_A = sum(result[0] for result in results) / len(results)
+    reward_B = sum(result[1] for result in results) / len(results)
+    state_tensor_A, state_tensor_B = results[-1][4], results[-1][5]
+
+    with timed(training_phase_seconds, 'reinforce_update'):
+      reinforce_update(creature_A, optimizer_A, epoch_log, baseline_A,
+                       nn_config_A.get('entropy_beta', CONFIG['entropy_beta']))
+      reinforce_update(creature_B, optimizer_B, epoch_log, baseline_B,
+                       nn_config_B.get('entropy_beta', CONFIG['entropy_beta']))
+    if CONFIG['numpy_rollouts']:
+      refresh_policy(creature_A)
+      refresh_policy(creature_B)
 
     baseline_A = (1 - nn_config_A.get('alpha_baseline', CONFIG['alpha_baseline'])) * baseline_A + \
                  nn_config_A.get('alpha_baseline', CONFIG['alpha_baseline']) * reward_A
     baseline_B = (1 - nn_config_B.get('alpha_baseline', CONFIG['alpha_baseline'])) * baseline_B + \
                  nn_config_B.get('alpha_baseline', CONFIG['alpha_baseline']) * reward_B
 
-    batched_logs.append((epoch, battle_log, reward_A, reward_B,
-                         wins[creature_A.name], wins[creature_B.name]))
-    batched_logs_total.append((epoch, battle_log, reward_A, reward_B,
-                               wins[creature_A.name], wins[creature_B.name]))
-
-    if state_tensor_A is not None:
-      creature_A.activations_history.append({
-        "name": creature_A.name,
-        "epoch": epoch,
-        "layers": capture_activations(creature_A, state_tensor_A)
-      })
-    if state_tensor_B is not None:
-      creature_B.activations_history.append({
-        "name": creature_B.name,
-        "epoch": epoch,
-        "layers": capture_activations(creature_B, state_tensor_B)
-      })
-
-    if len(batched_logs) % CONFIG['max_ticks'] == 0:
-      write_logs(batched_logs, {}, finalLog=False)
+    with timed(training_phase_seconds, 'capture_activations'):
+      if state_tensor_A is not None:
+        creature_A.activations_history.append({
+          "name": creature_A.name,
+          "epoch": epoch,
+          "layers": capture_activations(creature_A, state_tensor_A)
+        })
+      if state_tensor_B is not None:
+        creature_B.activations_history.append({
+          "name": creature_B.name,
+          "epoch": epoch,
+          "layers": capture_activations(creature_B, state_tensor_B)
+        })
+
+    if len(batched_logs) >= CONFIG['max_ticks']:
+      with timed(training_phase_seconds, 'write_logs'):
+        write_logs(batched_logs, {}, finalLog=False)
       batched_logs = []
 
-  # Save training-specific checkpoints
-  save_checkpoints(creature_A, creature_B, optimizer_A, optimizer_B)
-  A_path, B_path = create_checkpoint_paths(creature_A, creature_B)
-  checkpoint_A = torch.load(A_path)
-  checkpoint_A['activations_history'] = creature_A.activations_history
-  torch.save(checkpoint_A, A_path)
-  checkpoint_B = torch.load(B_path)
-  checkpoint_B['activations_history'] = creature_B.activations_history
-  torch.save(checkpoint_B, B_path)
+    if progress_callback:
+      epoch_wins = {creature_A.name: 0, creature_B.name: 0}
+      for result in results:
+        if result[3] in epoch_wins:
+          epoch_wins[result[3]] += 1
+      progress_callback({
+        'epoch': epoch,
+        'epochs_total': CONFIG['epoch_batch_size'],
+        'battles': battles,
+        'epoch_battles': len(results),
+        'winner': results[-1][3],
+        'wins': dict(wins),
+        'epoch_wins': epoch_wins,
+        'activations': {
+          c.name: c.activations_history[-1]['layers']
+          for c in (creature_A, creature_B)
+          if c.activations_history and c.activations_history[-1]['epoch'] == epoch
+        },
+        'rewards': {creature_A.name: reward_A, creature_B.name: reward_B},
+        'epsilons': {creature_A.name: epsilon_A, creature_B.name: epsilon_B},
+      })
 
-  last_epochs = {creature_A.name: checkpoint_A.get('epoch', 0),
-                 creature_B.name: checkpoint_B.get('epoch', 0)}
-  summary_data = write_logs(batched_logs_total, last_epochs, finalLog=True, final_wins=wins)
+  # Save training-specific checkpoints (one atomic write each) and activation sidecars
+  with timed(training_phase_seconds, 'checkpoint_save'):
+    last_epochs = checkpoints.save(CONFIG['epoch_batch_size'], {
+      creature_A.name: creature_A.activations_history,
+      creature_B.name: creature_B.activations_history
+    })
+    # Hand the new weights to every server worker through the shared store
+    for c in (creature_A, creature_B):
+      publish_weights(c.name, c.nn, c.nn_spec)
+  with timed(training_phase_seconds, 'write_logs'):
+    summary_data = write_logs([], last_epochs, finalLog=True, final_wins=wins, stats=stats)
 
   return {
     "summary": summary_data,
     "activations": {
-      creature_A.name: creature_A.activations_history,
-      creature_B.name: creature_B.activations_history
+      creature_A.name: list(creature_A.activations_history),
+      creature_B.name: list(creature_B.activations_history)
     }
   }
@@ -0,0 +1,188 @@
+import threading
+import time
+import numpy as np
+from app.config import CONFIG
+from app.modules.weight_store import attachment
+
+# ------------------ Weight Bank ------------------
+#
+# Logged-in players' creatures each have their own policy, but most share an
+# architecture. A WeightBank packs every creature of one architecture (same
+# model_spec) into stacked float32 arrays, one (capacity, in, out) weight and
+# one (capacity, out) bias per layer, so any subset of them can be evaluated
+# with one batched matmul per layer instead of one module call per creature.
+#
+# Slots are reserved when a creature becomes active (add_active_creature) and
+# freed on logout/eviction. Weights are copied in lazily, on the first
+# evaluation that needs them, so logging in stays cheap and torch-free when the
+# weights come from the shared weight store. Slots backed by published weights
+# are re-copied when a new version appears (checked at most every
+# CONFIG['weight_store_poll_seconds']); slots backed by a creature's private
+# model are re-copied whenever its parameters have been written in place.
+
+
+def _layer_arrays(state):
+  """[(weight (in, out), bias (out,)), ...] from a Linear-only state dict in layer order."""
+  values = list(state.values())
+  return [(np.asarray(weight, dtype=np.float32).T, np.asarray(bias, dtype=np.float32))
+          for weight, bias in zip(values[0::2], values[1::2])]
+
+
+def _source(creature):
+  """(version, layers loader) for the weights a creature currently plays with."""
+  if creature._nn_shared:
+    current = attachment(creature.name)
+    if current is not None and current.matches(creature.nn_spec):
+      return ('published', current.version), lambda: _layer_arrays(current.arrays)
+    return ('template',), lambda: _layer_arrays(_torch_state(creature.nn))
+  # Private weights change in place (load_state_dict, optimizer steps), which
+  # bumps every written parameter's autograd version counter
+  model = creature._nn
+  return ('private', id(model), _parameter_versions(model)), lambda: _layer_arrays(_torch_state(model))
+
+
+def _parameter_versions(model):
+  return tuple(param._version for param in model.parameters())
+
+
+def _torch_state(model):
+  return {key: tensor.detach().cpu().numpy() for key, tensor in model.state_dict().items()}
+
+
+class WeightBank:
+  """Stacked weights for every active creature of one architecture."""
+
+  def __init__(self, spec, capacity=None):
+    self.spec = spec
+    self.sizes = [spec[0], *spec[1], spec[2]]
+    capacity = capacity or CONFIG['weight_bank_initial_capacity']
+    self.weights = [np.zeros((capacity, n_in, n_out), dtype=np.float32)
+                    for n_in, n_out in zip(self.sizes[:-1], self.sizes[1:])]
+    self.biases = [np.zeros((capacity, n_out), dtype=np.float32) for n_out in self.sizes[1:]]
+    self.slots: dict[str, int] = {}      # creature key -> slot
+    self.creatures: dict[int, object] = {}  # slot -> creature
+    self.versions: dict[int, tuple] = {}    # slot -> version of the copied weights
+    self.free = list(range(capacity - 1, -1, -1))
+    self.lock = threading.Lock()
+    self.synced_at = None
+
+  @property
+  def capacity(self):
+    return len(self.biases[0])
+
+  def _grow(self):
+    old = self.capacity
+    self.weights = [np.concatenate([w, np.zeros_like(w)]) for w in self.weights]
+    self.biases = [np.concatenate([b, np.zeros_like(b)]) for b in self.biases]
+    self.free.extend(range(2 * old - 1, old - 1, -1))
+
+  def allocate(self, key, creature):
+    """Reserve a slot for creature (idempotent per key); its weights are copied on first use."""
+    with self.lock:
+      slot = self.slots.get(key)
+      if slot is None:
+        if not self.free:
+          self._grow()
+        slot = self.slots[key] = self.free.pop()
+      self.creatures[slot] = creature
+      self.versions.pop(slot, None)
+      return slot
+
+  def release(self, key):
+    with self.lock:
+      slot = self.slots.pop(key, None)
+      if slot is None:
+        return
+      self.creatures.pop(slot, None)
+      self.versions.pop(slot, None)
+      self.free.append(slot)
+
+  def invalidate(self, key):
+    """Force key's weights to be copied again before its next evaluation."""
+    with self.lock:
+      slot = self.slots.get(key)
+      if slot is not None:
+        self.versions.pop(slot, None)
+
+  def _load(self, slot):
+    version, load = _source(self.creatures[slot])
+    if self.versions.get(slot) == version:
+      return
+    for (weight, bias), w, b in zip(load(), self.weights, self.biases):
+      w[slot] = weight
+      b[slot] = bias
+    self.versions[slot] = version
+
+  def _sync(self, slots):
+    now = time.monotonic()
+    if self.synced_at is None or now - self.synced_at >= CONFIG['weight_store_poll_seconds']:
+      # Periodically re-check every requested slot for newly published weights
+      self.synced_at = now
+      pending = set(slots.tolist())
+    else:
+      # Private weights are checked on every use: their version is a cheap counter read
+      pending = {slot for slot in slots.tolist()
+                 if slot not in self.versions or not self.creatures[slot]._nn_shared}
+    for slot in pending:
+      self._load(slot)
+
+  def logits(self, slots, states):
+    """Logits of creature slots[i] for states[i]; slots (N,) ints, states (N, in) -> (N, out)."""
+    slots = np.asarray(slots, dtype=np.intp)
+    with self.lock:
+      self._sync(slots)
+      layers = [(w[slots], b[slots]) for w, b in zip(self.weights, self.biases)]
+    x = np.asarray(states, dtype=np.float32)[:, None, :]
+    for i, (weight, bias) in enumerate(layers):
+      x = np.matmul(x, weight) + bias[:, None, :]
+      if i < len(layers) - 1:
+        x = np.maximum(x, 0.0)
+    return x[:, 0, :]
+
+  def probs(self, slots, states):
+    logits = self.logits(slots, states)
+    exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+
+# ------------------ Bank Registry ------------------
+
+_banks: dict[tuple, WeightBank] = {}
+_bank_keys: dict[str, WeightBank] = {}  # creature key -> bank holding its slot
+_banks_lock = threading.Lock()
+
+
+def bank_for(spec) -> WeightBank:
+  """The process-wide bank for an architecture, created on first use."""
+  bank = _banks.get(spec)
+  if bank is None:
+    with _banks_lock:
+      bank = _banks.get(spec)
+      if bank is None:
+        bank = _banks[spec] = WeightBank(spec)
+  return bank
+
+
+def assign_slot(key, creature):
+  """Reserve (or re-point) a bank slot for an active creature; returns (bank, slot)."""
+  bank = bank_for(creature.nn_spec)
+  previous = _bank_keys.get(key)
+  if previous is not None and previous is not bank:
+    previous.release(key)
+  _bank_keys[key] = bank
+  return bank, bank.allocate(key, creature)
+
+
+def release_slot(key):
+  bank = _bank_keys.pop(key, None)
+  if bank is not None:
+    bank.release(key)
+
+
+def bank_slot(key):
+  """(bank, slot) of an active creature, or None if it has no slot in this process."""
+  bank = _bank_keys.get(key)
+  if bank is None:
+    return None
+  slot = bank.slots.get(key)
+  return None if slot is None else (bank, slot)
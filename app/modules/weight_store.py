@@ -0,0 +1,148 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import numpy as np
+from app.config import CONFIG
+
+# ------------------ Shared Weight Store ------------------
+#
+# Read-mostly weights shared by every uvicorn worker on the host. The trainer
+# publishes a creature's weights as one flat float32 file per version plus a
+# small JSON manifest (version, architecture, parameter layout). Workers map
+# the file copy-on-write and build their frozen play models on top of those
+# pages, so each version is held once in the page cache however many workers
+# attach to it. Workers re-read the manifest at most every
+# CONFIG['weight_store_poll_seconds'] and re-attach when its version changed.
+
+KEEP_VERSIONS = 2  # older files may still be mapped by workers that have not re-attached yet
+
+
+def _store_dir():
+  return CONFIG['weight_store_dir']
+
+
+def manifest_path(name):
+  return os.path.join(_store_dir(), f"{name}.json")
+
+
+def _write_atomic(path, write):
+  directory = os.path.dirname(path)
+  fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_')
+  try:
+    with os.fdopen(fd, 'wb') as f:
+      write(f)
+      f.flush()
+      os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+  except BaseException:
+    os.unlink(tmp_path)
+    raise
+
+
+def _read_manifest(name):
+  try:
+    with open(manifest_path(name), 'r') as f:
+      return json.load(f)
+  except (FileNotFoundError, json.JSONDecodeError):
+    return None
+
+
+def publish_weights(name, model, spec):
+  """Write a new version of name's weights (trainer side); returns the version number."""
+  os.makedirs(_store_dir(), exist_ok=True)
+  state = {key: tensor.detach().cpu().numpy().astype(np.float32).ravel()
+           for key, tensor in model.state_dict().items()}
+  previous = _read_manifest(name)
+  version = (previous['version'] if previous else 0) + 1
+
+  params, offset = [], 0
+  for key, tensor in model.state_dict().items():
+    params.append({"key": key, "shape": list(tensor.shape), "offset": offset})
+    offset += state[key].size
+  data_file = f"{name}.v{version}.bin"
+  _write_atomic(os.path.join(_store_dir(), data_file), lambda f: f.write(np.concatenate(list(state.values())).tobytes()))
+  manifest = {"name": name, "version": version, "spec": [spec[0], list(spec[1]), spec[2]],
+              "file": data_file, "numel": offset, "params": params}
+  _write_atomic(manifest_path(name), lambda f: f.write(json.dumps(manifest).encode()))
+
+  for old in range(1, version - KEEP_VERSIONS + 1):
+    try:
+      os.remove(os.path.join(_store_dir(), f"{name}.v{old}.bin"))
+    except OSError:
+      pass
+  return version
+
+
+class Attachment:
+  """One worker's view of a published version: memory-mapped arrays and, on demand, a model."""
+
+  def __init__(self, manifest):
+    self.manifest = manifest
+    self.version = manifest['version']
+    flat = np.memmap(os.path.join(_store_dir(), manifest['file']), dtype=np.float32,
+                     mode='c', shape=(manifest['numel'],))
+    self.arrays = {
+      p['key']: flat[p['offset']:p['offset'] + int(np.prod(p['shape']))].reshape(p['shape'])
+      for p in manifest['params']
+    }
+    self.model = None
+
+  def matches(self, spec):
+    return self.manifest['spec'] == [spec[0], list(spec[1]), spec[2]]
+
+  def build_model(self, spec):
+    """Frozen model whose parameters are views of the mapped file (no copy)."""
+    from app.modules.torch_loader import torch
+    from app.modules.model_factory import build_model
+    model = build_model(spec)
+    for key, tensor in model.state_dict(keep_vars=True).items():
+      tensor.data = torch.from_numpy(self.arrays[key])
+    model.requires_grad_(False)
+    model.eval()
+    return model
+
+
+_attachments: dict[str, Attachment] = {}
+_checked_at: dict[str, float] = {}
+_attach_lock = threading.Lock()
+
+
+def attachment(name):
+  """Current Attachment for name, or None if nothing was published."""
+  now = time.monotonic()
+  checked_at = _checked_at.get(name)
+  if checked_at is not None and now - checked_at < CONFIG['weight_store_poll_seconds']:
+    return _attachments.get(name)
+  with _attach_lock:
+    _checked_at[name] = now
+    manifest = _read_manifest(name)
+    if manifest is None:
+      _attachments.pop(name, None)
+      return None
+    current = _attachments.get(name)
+    if current is None or current.version != manifest['version']:
+      try:
+        current = _attachments[name] = Attachment(manifest)
+      except FileNotFoundError:
+        pass  # superseded between reading the manifest and mapping; keep the old one
+    return current
+
+
+def published_model(name, spec):
+  """Shared frozen model for name's latest published weights, or None."""
+  current = attachment(name)
+  if current is None or not current.matches(spec):
+    return None
+  if current.model is None:
+    with _attach_lock:
+      if current.model is None:
+        current.model = current.build_model(spec)
+  return current.model
+
+
+def published_arrays(name):
+  """{parameter key: array view} of name's latest published weights, or None."""
+  current = attachment(name)
+  return current.arrays if current else None
@@ -1,32 +1,119 @@
+import asyncio
 import json
 import os
-import torch
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from app.config import CONFIG
-from app.modules.training_loop import training_loop  # <- updated synchronous version
-from app.modules.utils import create_checkpoint_paths_by_name
+from app.modules.player_manager import get_active_player
+from app.modules.pvp import play_battle, play_rematches, run_game
+from app.modules.network_persistence import activations_path, create_checkpoint_paths_by_name, load_activations
+from app.modules.response_cache import cached_json_response
+from app.modules.training_events import stream_job_events
+from app.modules.training_jobs import submit_training_job, get_training_job, cancel_training_job, list_training_jobs
+from app.modules.weight_store import manifest_path, published_arrays
 
 router = APIRouter()
 
 @router.get("/train")
-def train_endpoint():
-  """Run full training loop and save checkpoints, returning final summary."""
-  result = training_loop()
-  return {"status": "completed", "summary": result.get("summary")}
+async def train_endpoint():
+  """Queue a training run and return its job ID immediately."""
+  job = submit_training_job()
+  return {"status": job.status, "job_id": job.id}
+
+@router.get("/train/jobs")
+async def training_jobs():
+  """List queued, running and recently finished training jobs."""
+  return {"jobs": list_training_jobs()}
+
+@router.get("/train/{job_id}")
+async def training_job_status(job_id: str):
+  """Return status, epochs done, current win rates and ETA for a training job."""
+  job = get_training_job(job_id)
+  if not job:
+    return JSONResponse({"error": "Training job not found"}, status_code=404)
+  return job.to_dict()
+
+@router.get("/train/{job_id}/events")
+async def training_job_events(job_id: str, activations: bool = False):
+  """Stream per-epoch training events as Server-Sent Events until the job finishes."""
+  job = get_training_job(job_id)
+  if not job:
+    return JSONResponse({"error": "Training job not found"}, status_code=404)
+  return StreamingResponse(
+    stream_job_events(job, include_activations=activations),
+    media_type="text/event-stream",
+    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+  )
+
+@router.post("/train/{job_id}/cancel")
+async def cancel_training(job_id: str):
+  """Cancel a queued or running training job; checkpoints are left untouched."""
+  job = cancel_training_job(job_id)
+  if not job:
+    return JSONResponse({"error": "Training job not found"}, status_code=404)
+  return job.to_dict()
+
+def _find_creature(player, creature_name):
+  for creature in player.creatures:
+    if creature_name is None or creature.name == creature_name:
+      return creature
+  return None
+
+@router.post("/play")
+async def play(player_a: str, player_a_id: int, player_b: str, player_b_id: int,
+               creature_a: str | None = None, creature_b: str | None = None,
+               rematches: int = 1, epsilon: float = 0.0):
+  """Battle two logged-in players' creatures (each player's first creature unless named).
+
+  rematches=1 plays one game and returns its compact log; rematches > 1 plays
+  them all as one batch and returns only the outcomes. Greedy play (epsilon=0)
+  is rated, a rematch series as one aggregated result; exploratory play is not.
+  """
+  if not 1 <= rematches <= CONFIG['play_max_rematches']:
+    return JSONResponse({"error": f"rematches must be between 1 and {CONFIG['play_max_rematches']}"}, status_code=400)
+  players = await run_in_threadpool(lambda: (get_active_player(player_a, player_a_id), get_active_player(player_b, player_b_id)))
+  creatures = []
+  for name, player, creature_name in zip((player_a, player_b), players, (creature_a, creature_b)):
+    if player is None:
+      return JSONResponse({"error": f"Player {name} is not logged in"}, status_code=404)
+    creature = _find_creature(player, creature_name)
+    if creature is None:
+      return JSONResponse({"error": f"Player {name} has no creature {creature_name or ''}".rstrip()}, status_code=404)
+    creatures.append(creature)
+  if creatures[0] is creatures[1]:
+    return JSONResponse({"error": "A creature cannot battle itself"}, status_code=400)
+
+  rated = ((f"{player_a}_{player_a_id}", player_a), (f"{player_b}_{player_b_id}", player_b)) if epsilon == 0 else None
+  if rematches == 1:
+    result = await run_game(play_battle, *creatures, epsilon, asyncio.get_running_loop(), rated)
+  else:
+    result = await run_game(play_rematches, *creatures, rematches, epsilon, rated)
+  return {
+    "players": [player_a, player_b],
+    "creatures": [{"id": c.id, "name": c.name} for c in creatures],
+    "rated": rated is not None,
+    **result,
+  }
+
+def _load_summary(filename):
+  with open(filename, 'r') as f:
+    return json.load(f)
 
 @router.get("/summary")
-def get_summary():
-  """Return summary JSON if available."""
+def get_summary(request: Request):
+  """Return summary JSON if available (cached until summary.json changes)."""
   filename = os.path.join(CONFIG['log_dir'], 'summary.json')
   if os.path.exists(filename):
-    with open(filename, 'r') as f:
-      return json.load(f)
+    return cached_json_response(request, 'summary', filename, lambda: _load_summary(filename))
   return {"error": "Summary not available yet"}
 
 @router.get("/nn-graph/{creature_name}")
-def nn_graph(creature_name: str):
-  """Return weights, biases, and normalized activations_history for a creature."""
+def nn_graph(creature_name: str, request: Request):
+  """Return weights, biases, and normalized activations_history for a creature.
+
+  The built payload is cached until the checkpoint file changes.
+  """
 
   A_path, B_path = create_checkpoint_paths_by_name('A', 'B')
   path_map = {'A': A_path, 'B': B_path}
@@ -38,9 +125,18 @@ def nn_graph(creature_name: str):
   if not os.path.exists(checkpoint_path):
     return JSONResponse({"error": "Checkpoint not found"}, status_code=404)
 
-  checkpoint = torch.load(checkpoint_path)
-  state_dict = checkpoint.get('model_state_dict', {})
-  activations_history = checkpoint.get('activations_history', [])
+  return cached_json_response(request, f"nn-graph:{creature_name}",
+                              (checkpoint_path, activations_path(checkpoint_path), manifest_path(creature_name)),
+                              lambda: _build_nn_graph(creature_name, checkpoint_path))
+
+def _build_nn_graph(creature_name, checkpoint_path):
+  # Prefer the weights mapped from the shared store; fall back to loading the checkpoint
+  state_dict = published_arrays(creature_name)
+  if state_dict is None:
+    from app.modules.torch_loader import torch  # only on a cache miss; keeps torch out of the read-only startup path
+    checkpoint = torch.load(checkpoint_path)
+    state_dict = checkpoint.get('model_state_dict', {})
+  activations_history = load_activations(checkpoint_path, CONFIG['activations_history_limit'])
 
   # print('activations_history: ', activations_history)
 
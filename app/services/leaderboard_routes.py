@@ -0,0 +1,63 @@
+import base64
+import binascii
+import json
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.config import CONFIG
+from app.modules.leaderboard import KINDS, get_leaderboard
+
+router = APIRouter()
+
+def _encode_cursor(entry):
+  return base64.urlsafe_b64encode(json.dumps([entry['rating'], entry['key']]).encode()).decode()
+
+def _decode_cursor(cursor):
+  rating, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+  return float(rating), str(key)
+
+def _index(kind):
+  if kind not in KINDS:
+    return None
+  return get_leaderboard().index(kind)
+
+@router.get("")
+def leaderboard(kind: str = 'player', limit: int = 20, cursor: str | None = None):
+  """Ratings from the top, one page at a time; pass next_cursor back as cursor for the next page."""
+  index = _index(kind)
+  if index is None:
+    return JSONResponse({"error": f"kind must be one of {', '.join(KINDS)}"}, status_code=400)
+  limit = max(1, min(limit, CONFIG['leaderboard_page_max']))
+  try:
+    after = _decode_cursor(cursor) if cursor else None
+  except (ValueError, TypeError, binascii.Error):
+    return JSONResponse({"error": "Invalid cursor"}, status_code=400)
+  entries = index.page(limit, after)
+  return {
+    "kind": kind,
+    "total": len(index),
+    "entries": entries,
+    "next_cursor": _encode_cursor(entries[-1]) if len(entries) == limit else None,
+  }
+
+@router.get("/rank")
+def rank(key: str, kind: str = 'player'):
+  """Rank and rating of one player (name_id) or creature (id_name)."""
+  index = _index(kind)
+  if index is None:
+    return JSONResponse({"error": f"kind must be one of {', '.join(KINDS)}"}, status_code=400)
+  position = index.rank(key)
+  if position is None:
+    return JSONResponse({"error": f"{key} has no rated games"}, status_code=404)
+  return {"kind": kind, "rank": position, **index.entries[key]}
+
+@router.get("/around")
+def around(key: str, kind: str = 'player', radius: int = 5):
+  """The entries ranked within radius places of key."""
+  index = _index(kind)
+  if index is None:
+    return JSONResponse({"error": f"kind must be one of {', '.join(KINDS)}"}, status_code=400)
+  radius = max(0, min(radius, CONFIG['leaderboard_page_max'] // 2))
+  entries = index.around(key, radius)
+  if not entries:
+    return JSONResponse({"error": f"{key} has no rated games"}, status_code=404)
+  return {"kind": kind, "entries": entries}
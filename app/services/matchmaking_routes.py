@@ -0,0 +1,29 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.modules.matchmaking import join_queue, leave_queue, queue_status
+from app.modules.player_manager import get_active_player
+
+router = APIRouter()
+
+@router.post("/join")
+def join(name: str, player_id: int):
+  """Queue a logged-in player for a rated battle; poll /matchmaking/status for the match."""
+  player = get_active_player(name, player_id)
+  if player is None:
+    return JSONResponse({"error": f"Player {name} is not logged in"}, status_code=404)
+  if not player.creatures:
+    return JSONResponse({"error": f"Player {name} has no creatures"}, status_code=400)
+  return join_queue(name, player_id)
+
+@router.post("/leave")
+def leave(name: str, player_id: int):
+  """Leave the queue (only while still waiting)."""
+  return {"left": leave_queue(name, player_id)}
+
+@router.get("/status")
+def status(name: str, player_id: int):
+  """Ticket state: waiting, matched (with the battle result once played) or timeout."""
+  ticket = queue_status(name, player_id)
+  if ticket is None:
+    return JSONResponse({"error": "Not in the matchmaking queue"}, status_code=404)
+  return ticket
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.modules.metrics import active_creatures, active_players, render_metrics
+from app.modules.session_registry import active_sessions
+
+router = APIRouter()
+
+# Counted across all workers from the session registry
+active_players.set_function(lambda: len(active_sessions('player')))
+active_creatures.set_function(lambda: len(active_sessions('creature')))
+
+@router.get("/metrics")
+def metrics():
+  """Training phase timers, battle counters, active sessions and request latency (Prometheus text format)."""
+  return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -2,7 +2,6 @@
 from fastapi import APIRouter
 from app.modules.player_manager import add_active_player, remove_active_player, list_active_players
 from app.modules.creature_manager import load_creature, add_active_creature, _active_creatures
-from app.modules.creature_manager import init_creatures  # for nn_model template
 
 router = APIRouter()
 
@@ -21,10 +20,8 @@ def login_player(name: str, player_id: int):
   for i, creature in enumerate(player.creatures):
     key = f"{creature.id}_{creature.name}"
     if key not in _active_creatures:
-      # Create a fresh NN model based on template
-      template_stats = creature.__dict__  # keep existing stats as fallback
-      nn_model = init_creatures({creature.name: template_stats})[0][creature.name].nn
-      loaded = load_creature(creature.id, creature.name, nn_model)
+      # Loaded creatures share their template's weights until they first train
+      loaded = load_creature(creature.id, creature.name, None)
       if loaded:
         player.creatures[i] = loaded
         add_active_creature(loaded)
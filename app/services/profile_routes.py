@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.modules.profiling import collapsed_stacks, list_profiles, load_profile, profiling_requested
+
+router = APIRouter()
+
+def _forbidden():
+  return JSONResponse({"error": "Profiling token required"}, status_code=403)
+
+@router.get("")
+def profiles(request: Request):
+  """List stored request profiles (newest first), without their stacks."""
+  if not profiling_requested(request):
+    return _forbidden()
+  return {"profiles": list_profiles()}
+
+@router.get("/{profile_id}")
+def profile(profile_id: str, request: Request):
+  """Return one profile, including its collapsed stacks and sample counts."""
+  if not profiling_requested(request):
+    return _forbidden()
+  data = load_profile(profile_id)
+  if data is None:
+    return JSONResponse({"error": "Profile not found"}, status_code=404)
+  return data
+
+@router.get("/{profile_id}/collapsed")
+def profile_collapsed(profile_id: str, request: Request):
+  """Export a profile in folded-stack format (flamegraph.pl, speedscope)."""
+  if not profiling_requested(request):
+    return _forbidden()
+  data = load_profile(profile_id)
+  if data is None:
+    return JSONResponse({"error": "Profile not found"}, status_code=404)
+  return PlainTextResponse(collapsed_stacks(data))
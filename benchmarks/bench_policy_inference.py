@@ -0,0 +1,68 @@
+"""
+bench_policy_inference.py
+Compare torch choose_action against the NumPy policy snapshot (and its lookup table) for every creature template.
+Run: python -m benchmarks.bench_policy_inference
+"""
+
+import timeit
+import numpy as np
+import torch
+from app.config import CREATURE_TEMPLATES
+from app.modules.creature_manager import init_creatures
+from app.modules.numpy_policy import NumpyPolicy
+from app.modules.utils import choose_action, create_state, create_state_array
+
+NUMBER = 20000
+TOLERANCE = 1e-5
+
+
+def check_parity(creature, policy, samples=1000):
+  """Max abs difference between torch and NumPy softmax over random game states."""
+  states = np.random.randint(0, 101, size=(samples, 4)).astype(np.float32)
+  with torch.no_grad():
+    expected = torch.softmax(creature.nn(torch.from_numpy(states)), dim=1).numpy()
+  return float(np.abs(policy.probs(states) - expected).max())
+
+
+def bench_creature(creature, opponent):
+  policy = NumpyPolicy(creature.nn)
+  torch_state = create_state(creature, opponent)
+  numpy_state = create_state_array(creature, opponent)
+
+  torch_s = timeit.timeit(lambda: choose_action(creature.nn, torch_state, 0.0), number=NUMBER)
+  uncached = NumpyPolicy(creature.nn, cache_size=0)
+  numpy_s = timeit.timeit(lambda: uncached.choose_action(numpy_state, 0.0), number=NUMBER)
+  cached_s = timeit.timeit(lambda: policy.choose_action(numpy_state, 0.0), number=NUMBER)
+  snapshot_s = timeit.timeit(lambda: NumpyPolicy(creature.nn), number=1000) / 1000
+
+  return {
+    "creature": creature.name,
+    "hidden_sizes": creature.nn_config.get('hidden_sizes'),
+    "max_abs_diff": check_parity(creature, policy),
+    "torch_us": torch_s / NUMBER * 1e6,
+    "numpy_us": numpy_s / NUMBER * 1e6,
+    "cached_us": cached_s / NUMBER * 1e6,
+    "snapshot_us": snapshot_s * 1e6,
+    "speedup": torch_s / numpy_s,
+  }
+
+
+def main():
+  creatures, _ = init_creatures(CREATURE_TEMPLATES)
+  names = list(creatures.keys())
+  ok = True
+  for name in names:
+    opponent = creatures[names[1] if name == names[0] else names[0]]
+    result = bench_creature(creatures[name], opponent)
+    ok = ok and result["max_abs_diff"] < TOLERANCE
+    print(f"{result['creature']} {str(result['hidden_sizes']):14} "
+          f"torch {result['torch_us']:7.2f}us | numpy {result['numpy_us']:6.2f}us | "
+          f"table hit {result['cached_us']:5.2f}us | "
+          f"x{result['speedup']:.1f} | snapshot {result['snapshot_us']:.1f}us | "
+          f"max diff {result['max_abs_diff']:.1e}")
+  if not ok:
+    raise SystemExit(f"NumPy policy differs from torch by more than {TOLERANCE}")
+
+
+if __name__ == "__main__":
+  main()
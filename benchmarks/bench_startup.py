@@ -0,0 +1,75 @@
+"""
+bench_startup.py
+Cold-start time and memory of a fresh worker importing app.main, with and without torch preloaded.
+Run: python -m benchmarks.bench_startup [--runs 5] [--output startup_results.json]
+
+Each run is a new interpreter (as a uvicorn worker would be) that imports the
+app, serves /player/active and /battle/summary in-process, and reports its
+import time, first-request latency, peak RSS and whether torch got loaded.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import json, resource, sys, time
+start = time.perf_counter()
+if {preload_torch}:
+  import torch
+from app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(app)
+for url in ("/player/active", "/battle/summary"):
+  client.get(url).raise_for_status()
+served = time.perf_counter()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+  "import_s": imported - start,
+  "first_requests_s": served - imported,
+  "max_rss_mb": rss / (1024 * 1024 if sys.platform == "darwin" else 1024),
+  "torch_loaded": "torch" in sys.modules,
+}}))
+"""
+
+
+def run_child(preload_torch):
+  out = subprocess.run([sys.executable, "-c", CHILD.format(preload_torch=preload_torch)],
+                       capture_output=True, text=True, check=True)
+  return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def summarize(runs):
+  return {
+    "import_s": statistics.median(r["import_s"] for r in runs),
+    "first_requests_s": statistics.median(r["first_requests_s"] for r in runs),
+    "max_rss_mb": statistics.median(r["max_rss_mb"] for r in runs),
+    "torch_loaded": any(r["torch_loaded"] for r in runs),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--runs", type=int, default=5)
+  parser.add_argument("--output", help="optional JSON file for the results")
+  args = parser.parse_args()
+
+  results = {
+    "lazy": summarize([run_child(False) for _ in range(args.runs)]),
+    "torch_preloaded": summarize([run_child(True) for _ in range(args.runs)]),
+  }
+  for label, r in results.items():
+    print(f"{label:16} import {r['import_s'] * 1e3:8.1f}ms | first requests {r['first_requests_s'] * 1e3:7.1f}ms | "
+          f"max RSS {r['max_rss_mb']:7.1f}MB | torch loaded: {r['torch_loaded']}")
+  if args.output:
+    with open(args.output, "w") as f:
+      json.dump(results, f, indent=2)
+  if results["lazy"]["torch_loaded"]:
+    raise SystemExit("❌ Read-only startup imported torch")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,304 @@
+"""
+bench_suite.py
+Offline benchmarks for the simulation, learning, persistence and API hot paths.
+Run: python -m benchmarks.bench_suite [--output bench_results.json] [--compare baseline.json] [--threshold 0.15] [--quick]
+
+Every run is seeded from CONFIG['seed'] and writes only to a temporary
+directory. With --compare, each metric is checked against the baseline file
+and the run exits non-zero if any got worse by more than --threshold.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import numpy as np
+import torch
+from app.config import CONFIG, CREATURE_TEMPLATES
+from app.modules.battle_simulation import simulate_battle
+from app.modules.batched_battle_simulation import simulate_battles_batched
+from app.modules.creature_manager import init_creatures
+from app.modules.logging_utils import BattleLog, TrainingStats, append_battle_log, write_logs
+from app.modules.network_persistence import create_checkpoint_paths, load_checkpoint, save_checkpoint
+from app.modules.neural_network import reinforce_update
+from app.modules.utils import choose_action, create_state
+
+DEFAULT_THRESHOLD = 0.15
+
+
+def seed_everything():
+  random.seed(CONFIG['seed'])
+  np.random.seed(CONFIG['seed'])
+  torch.manual_seed(CONFIG['seed'])
+
+
+def metric(value, unit, higher_is_better):
+  return {"value": float(value), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def percentile_ms(samples, q):
+  return float(np.percentile(samples, q) * 1e3)
+
+
+@contextlib.contextmanager
+def quiet():
+  """Silence the emoji progress prints of the code under test."""
+  with contextlib.redirect_stdout(io.StringIO()):
+    yield
+
+
+# ------------------ Benchmarks ------------------
+
+def bench_simulation(creatures, battles):
+  A, B = creatures
+  epsilons = (CONFIG['eps_min'], CONFIG['eps_min'])
+  results = []
+  start = time.perf_counter()
+  for epoch in range(battles):
+    results.append(simulate_battle(A, B, epoch, CONFIG['max_ticks'], epsilons))
+  elapsed = time.perf_counter() - start
+  ticks = sum(int(log.tick[:log.size].max()) + 1 for _, _, log, _, _, _ in results)
+
+  start = time.perf_counter()
+  simulate_battles_batched(A, B, 0, CONFIG['max_ticks'], epsilons, battles)
+  batched_elapsed = time.perf_counter() - start
+
+  return results, {
+    "simulate_battle.battles_per_sec": metric(battles / elapsed, "battles/s", True),
+    "simulate_battle.ticks_per_sec": metric(ticks / elapsed, "ticks/s", True),
+    "simulate_battles_batched.battles_per_sec": metric(battles / batched_elapsed, "battles/s", True),
+  }
+
+
+class ScriptedPolicy:
+  """Cycles through the actions at negligible cost, isolating the game-state update from inference."""
+
+  def __init__(self, num_actions):
+    self.probs = np.full(num_actions, 1.0 / num_actions, dtype=np.float32)
+    self.next_action = 0
+
+  def choose_action(self, state, eps):
+    action_idx = self.next_action
+    self.next_action = (action_idx + 1) % len(self.probs)
+    return action_idx, self.probs
+
+
+def bench_engine(creatures, battles):
+  """Ticks/sec of simulate_battle with scripted policies: state updates, action dispatch and logging only."""
+  A, B = creatures
+  for c in creatures:
+    c.policy = ScriptedPolicy(len(c.action_names))
+  try:
+    ticks = 0
+    start = time.perf_counter()
+    for epoch in range(battles):
+      _, _, log, _, _, _ = simulate_battle(A, B, epoch, CONFIG['max_ticks'], (0.0, 0.0))
+      ticks += int(log.tick[:log.size].max()) + 1
+    elapsed = time.perf_counter() - start
+  finally:
+    for c in creatures:
+      c.policy = None
+  return {"simulate_battle.engine_ticks_per_sec": metric(ticks / elapsed, "ticks/s", True)}
+
+
+def bench_choose_action(creatures, calls):
+  A, B = creatures
+  state = create_state(A, B)
+  start = time.perf_counter()
+  for _ in range(calls):
+    choose_action(A.nn, state, 0.0)
+  elapsed = time.perf_counter() - start
+  return {"choose_action.latency_us": metric(elapsed / calls * 1e6, "us", False)}
+
+
+def bench_reinforce_update(creatures, optimizers, results, updates):
+  A, _ = creatures
+  epoch_log = BattleLog.concatenate([log for _, _, log, _, _, _ in results[:16]])
+  samples = []
+  for _ in range(updates):
+    start = time.perf_counter()
+    reinforce_update(A, optimizers[A.name], epoch_log, 0.0)
+    samples.append(time.perf_counter() - start)
+  return {
+    "reinforce_update.p50_ms": metric(percentile_ms(samples, 50), "ms", False),
+    "reinforce_update.p99_ms": metric(percentile_ms(samples, 99), "ms", False),
+  }
+
+
+def bench_append_battle_log(creatures, events):
+  A, B = creatures
+  probs = np.full(len(A.action_names), 1.0 / len(A.action_names), dtype=np.float32)
+  state = np.zeros(4, dtype=np.float32)
+  log = BattleLog(0, (A, B), capacity=events)
+  start = time.perf_counter()
+  for tick in range(events):
+    append_battle_log(0, tick, A, B, log, 'attack', probs, 0, 0.01, state=state)
+  elapsed = time.perf_counter() - start
+  return {"append_battle_log.events_per_sec": metric(events / elapsed, "events/s", True)}
+
+
+def bench_write_logs(creatures, results):
+  A, B = creatures
+  batched_logs = [(epoch, log, rA, rB, 0, 0) for epoch, (rA, rB, log, _, _, _) in enumerate(results)]
+  path = os.path.join(CONFIG['log_dir'], f"battle_log_0000_{len(results) - 1:04d}.txt")
+  start = time.perf_counter()
+  write_logs(batched_logs, None, False)
+  elapsed = time.perf_counter() - start
+  megabytes = os.path.getsize(path) / 1e6
+
+  stats = TrainingStats([A.name, B.name])
+  for rA, rB, log, winner, _, _ in results:
+    stats.add_battle(log, {A.name: rA, B.name: rB}, winner)
+  write_logs([], {A.name: len(results), B.name: len(results)}, True, stats=stats)
+  return {"write_logs.mb_per_sec": metric(megabytes / elapsed, "MB/s", True)}
+
+
+def bench_checkpoints(creatures, optimizers, repeats):
+  save_samples, load_samples = [], []
+  for creature, path in zip(creatures, create_checkpoint_paths(*creatures)):
+    for _ in range(repeats):
+      with quiet():
+        start = time.perf_counter()
+        save_checkpoint(path, creature, optimizers[creature.name], 1)
+        save_samples.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        load_checkpoint(path, creature, optimizers[creature.name])
+        load_samples.append(time.perf_counter() - start)
+  return {
+    "checkpoint.save_p50_ms": metric(percentile_ms(save_samples, 50), "ms", False),
+    "checkpoint.load_p50_ms": metric(percentile_ms(load_samples, 50), "ms", False),
+  }
+
+
+def bench_endpoints(requests):
+  """p50/p99 through the in-process test client; needs the checkpoints and summary written above."""
+  from fastapi.testclient import TestClient
+  from app.main import app
+  from app.modules.response_cache import response_cache
+
+  client = TestClient(app)
+  endpoints = {"nn_graph": "/battle/nn-graph/A", "summary": "/battle/summary"}
+  metrics = {}
+  for name, url in endpoints.items():
+    for cached in (False, True):
+      samples = []
+      for _ in range(requests):
+        if not cached:
+          response_cache.invalidate()
+        start = time.perf_counter()
+        response = client.get(url)
+        samples.append(time.perf_counter() - start)
+        response.raise_for_status()
+      label = f"endpoint.{name}{'' if cached else '_uncached'}"
+      metrics[f"{label}.p50_ms"] = metric(percentile_ms(samples, 50), "ms", False)
+      metrics[f"{label}.p99_ms"] = metric(percentile_ms(samples, 99), "ms", False)
+  return metrics
+
+
+def run_suite(quick=False):
+  scale = 0.2 if quick else 1.0
+  seed_everything()
+  with tempfile.TemporaryDirectory() as tmp:
+    saved_dirs = {key: CONFIG[key] for key in ('log_dir', 'checkpoint_dir', 'weight_store_dir')}
+    CONFIG['log_dir'] = os.path.join(tmp, 'battle_logs')
+    CONFIG['checkpoint_dir'] = os.path.join(tmp, 'checkpoints')
+    CONFIG['weight_store_dir'] = os.path.join(tmp, 'shared_weights')
+    os.makedirs(CONFIG['log_dir'])
+    os.makedirs(CONFIG['checkpoint_dir'])
+    try:
+      all_creatures, optimizers = init_creatures(CREATURE_TEMPLATES)
+      creatures = tuple(all_creatures.values())[:2]
+
+      results, metrics = bench_simulation(creatures, int(200 * scale))
+      metrics.update(bench_engine(creatures, int(1000 * scale)))
+      metrics.update(bench_choose_action(creatures, int(20000 * scale)))
+      metrics.update(bench_reinforce_update(creatures, optimizers, results, int(200 * scale)))
+      metrics.update(bench_append_battle_log(creatures, int(50000 * scale)))
+      metrics.update(bench_write_logs(creatures, results))
+      metrics.update(bench_checkpoints(creatures, optimizers, int(20 * scale)))
+      metrics.update(bench_endpoints(int(200 * scale)))
+    finally:
+      CONFIG.update(saved_dirs)
+
+  return {
+    "meta": {
+      "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+      "seed": CONFIG['seed'],
+      "quick": quick,
+      "python": platform.python_version(),
+      "torch": torch.__version__,
+      "numpy": np.__version__,
+      "torch_threads": torch.get_num_threads(),
+    },
+    "metrics": metrics,
+  }
+
+
+# ------------------ Compare ------------------
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+  """Relative change per metric; a metric regresses when it got worse by more than threshold."""
+  rows = []
+  for name, current in results["metrics"].items():
+    previous = baseline.get("metrics", {}).get(name)
+    if not previous or not previous["value"]:
+      continue
+    change = (current["value"] - previous["value"]) / previous["value"]
+    worse = -change if current["higher_is_better"] else change
+    rows.append({
+      "metric": name,
+      "baseline": previous["value"],
+      "current": current["value"],
+      "change": change,
+      "regression": worse > threshold,
+    })
+  return rows
+
+
+def print_metrics(results):
+  for name, m in results["metrics"].items():
+    print(f"  {name:44} {m['value']:12.2f} {m['unit']}")
+
+
+def print_comparison(rows, threshold):
+  for row in rows:
+    flag = "❌ REGRESSION" if row["regression"] else ""
+    print(f"  {row['metric']:44} {row['baseline']:12.2f} -> {row['current']:12.2f} "
+          f"({row['change']:+.1%}) {flag}")
+  regressions = sum(row["regression"] for row in rows)
+  if regressions:
+    print(f"❌ {regressions} metric(s) regressed by more than {threshold:.0%}")
+  else:
+    print(f"✅ No regressions beyond {threshold:.0%}")
+  return regressions
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--output", default="bench_results.json", help="where to write this run's results")
+  parser.add_argument("--compare", metavar="BASELINE", help="baseline results JSON to check against")
+  parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="allowed relative slowdown")
+  parser.add_argument("--quick", action="store_true", help="smaller iteration counts (noisier)")
+  args = parser.parse_args()
+
+  results = run_suite(quick=args.quick)
+  with open(args.output, "w") as f:
+    json.dump(results, f, indent=2)
+  print(f"📊 Benchmark results ({args.output}):")
+  print_metrics(results)
+
+  if args.compare:
+    with open(args.compare, "r") as f:
+      baseline = json.load(f)
+    print(f"📈 Compared with {args.compare}:")
+    if print_comparison(compare(results, baseline, args.threshold), args.threshold):
+      raise SystemExit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,60 @@
+"""
+bench_weight_bank.py
+Evaluate many player-owned creatures at once: one torch module call per creature vs one WeightBank call.
+Run: python -m benchmarks.bench_weight_bank [--creatures 1000]
+
+Every creature gets its own randomly initialized weights (as if it had
+trained), a slot in the bank of its architecture, and one game state.
+"""
+
+import argparse
+import time
+import numpy as np
+import torch
+from app.config import CREATURE_TEMPLATES
+from app.modules.creature_manager import Creature
+from app.modules.model_factory import build_model, model_spec
+from app.modules.weight_bank import WeightBank
+
+TOLERANCE = 1e-5
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--creatures", type=int, default=1000)
+  parser.add_argument("--repeats", type=int, default=5)
+  args = parser.parse_args()
+
+  ok = True
+  for name, template in CREATURE_TEMPLATES.items():
+    spec = model_spec(template)
+    bank = WeightBank(spec)
+    # Benchmark-local IDs: these creatures are never stored, so they draw nothing from the registry
+    creatures = [Creature(name, f"player_{i}", build_model(spec), template, creature_id=i + 1)
+                 for i in range(args.creatures)]
+    slots = np.array([bank.allocate(f"{c.id}_{c.name}", c) for c in creatures])
+    states = np.random.randint(1, 101, size=(args.creatures, spec[0])).astype(np.float32)
+    bank.probs(slots, states)  # copy the weights in
+
+    torch_states = torch.from_numpy(states)
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+      with torch.no_grad():
+        expected = torch.stack([torch.softmax(c.nn(s), dim=0) for c, s in zip(creatures, torch_states)]).numpy()
+    per_module = (time.perf_counter() - start) / args.repeats
+
+    start = time.perf_counter()
+    for _ in range(args.repeats):
+      probs = bank.probs(slots, states)
+    banked = (time.perf_counter() - start) / args.repeats
+
+    diff = float(np.abs(probs - expected).max())
+    ok = ok and diff < TOLERANCE
+    print(f"{name} {str(list(spec[1])):14} {args.creatures} creatures | per-module {per_module * 1e3:8.2f}ms | "
+          f"bank {banked * 1e3:6.2f}ms | x{per_module / banked:.1f} | capacity {bank.capacity} | max diff {diff:.1e}")
+  if not ok:
+    raise SystemExit(f"WeightBank differs from torch by more than {TOLERANCE}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,28 @@
+import pytest
+from app.config import CONFIG
+from app.modules import creature_manager, leaderboard, matchmaking, player, player_manager, session_registry, storage, weight_bank
+
+# Process-wide dicts that other modules import by name, so they are emptied rather than replaced
+REGISTRIES = (player_manager._active_players, player_manager._touched_at, creature_manager._active_creatures,
+              weight_bank._banks, weight_bank._bank_keys)
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+  """Run every test in its own directory and database, with empty process-wide registries."""
+  monkeypatch.chdir(tmp_path)
+  monkeypatch.setitem(CONFIG, 'storage_sqlite_path', str(tmp_path / 'game.db'))
+  for module, name in ((storage, '_storage'), (session_registry, '_registry'),
+                       (leaderboard, '_leaderboard'), (matchmaking, '_queue')):
+    monkeypatch.setattr(module, name, None)
+  monkeypatch.setattr(session_registry, '_last_eviction', None)
+  for allocator in (creature_manager._creature_id_counter, player._player_id_counter):
+    monkeypatch.setattr(allocator, 'end', 0)
+  for registry in REGISTRIES:
+    registry.clear()
+  yield
+  for registry in REGISTRIES:
+    registry.clear()
+  for pool in (storage._storage, session_registry._registry, leaderboard._leaderboard, matchmaking._queue):
+    if pool is not None:
+      pool.close()
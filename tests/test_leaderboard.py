@@ -0,0 +1,102 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.config import CONFIG
+from app.main import app
+from app.modules.leaderboard import Leaderboard, RatingIndex, get_leaderboard
+
+
+ALICE, BOB, CAROL = ('Alice_1', 'Alice'), ('Bob_2', 'Bob'), ('Carol_3', 'Carol')
+
+
+@pytest.fixture
+def workers(tmp_path):
+  """Two leaderboards on one database, as two worker processes would have."""
+  path = str(tmp_path / 'ratings.db')
+  boards = [Leaderboard(path), Leaderboard(path)]
+  yield boards
+  for board in boards:
+    board.close()
+
+
+def _ratings(board, kind='player'):
+  return {key: entry['rating'] for key, entry in board.indexes[kind].entries.items()}
+
+
+def test_record_is_zero_sum_and_counts_the_game(workers):
+  board, _ = workers
+  board.record('player', ALICE, BOB, 1.0)
+  alice, bob = (board.indexes['player'].entries[key] for key in ('Alice_1', 'Bob_2'))
+  assert alice['rating'] + bob['rating'] == pytest.approx(2 * CONFIG['rating_initial'])
+  assert alice['rating'] - CONFIG['rating_initial'] == pytest.approx(CONFIG['rating_k_factor'] / 2)
+  assert (alice['games'], alice['wins'], bob['losses'], bob['draws']) == (1, 1, 1, 0)
+
+
+def test_flush_and_sync_round_trip(workers, tmp_path):
+  first, second = workers
+  first.record('player', ALICE, BOB, 1.0)
+  assert _ratings(second) == {}  # nothing reaches other workers before a flush
+  first.flush()
+  second.sync()
+  assert _ratings(second) == pytest.approx(_ratings(first))
+  reloaded = Leaderboard(str(tmp_path / 'ratings.db'))
+  assert _ratings(reloaded) == pytest.approx(_ratings(first))
+  assert reloaded.indexes['player'].entries['Alice_1']['wins'] == 1
+  reloaded.close()
+
+
+def test_concurrent_flushes_add_up(workers, tmp_path):
+  first, second = workers
+  first.record('player', ALICE, BOB, 1.0)
+  second.record('player', ALICE, CAROL, 0.0)
+  second.record('player', BOB, CAROL, 0.5)
+  expected = {key: first.indexes['player'].entries.get(key, {}).get('rating', CONFIG['rating_initial'])
+              + second.indexes['player'].entries[key]['rating'] - CONFIG['rating_initial']
+              for key in ('Alice_1', 'Bob_2')}
+  first.flush()
+  second.flush()
+  first.sync()
+  for board in workers:
+    entries = board.indexes['player'].entries
+    assert entries['Alice_1']['games'] == 2 and entries['Bob_2']['games'] == 2
+    assert {key: entries[key]['rating'] for key in expected} == pytest.approx(expected)
+
+
+def test_unflushed_deltas_survive_a_sync(workers):
+  first, second = workers
+  first.record('player', ALICE, BOB, 1.0)
+  first.flush()
+  second.record('player', ALICE, BOB, 1.0)
+  pending = second.pending['player']['Alice_1']['rating']
+  second.sync()
+  alice = second.indexes['player'].entries['Alice_1']
+  assert alice['rating'] == pytest.approx(first.indexes['player'].entries['Alice_1']['rating'] + pending)
+  assert alice['games'] == 2
+
+
+def test_cursor_pages_cover_every_entry_once():
+  entries = [{"key": f"p{i:02}", "name": f"p{i:02}", "rating": 1000 + 10 * (i % 7)} for i in range(23)]
+  index = RatingIndex(entries)
+  seen, after = [], None
+  while True:
+    page = index.page(5, after)
+    seen += page
+    if len(page) < 5:
+      break
+    after = (page[-1]['rating'], page[-1]['key'])
+  assert [entry['rank'] for entry in seen] == list(range(1, 24))
+  assert [(-entry['rating'], entry['key']) for entry in seen] == sorted((-e['rating'], e['key']) for e in entries)
+  assert all(index.rank(entry['key']) == entry['rank'] for entry in seen)
+  assert [entry['key'] for entry in index.around(seen[10]['key'], 2)] == [entry['key'] for entry in seen[8:13]]
+
+
+def test_leaderboard_route_pages_with_cursors():
+  board = get_leaderboard()
+  board.record('player', ALICE, BOB, 1.0)
+  board.record('player', CAROL, BOB, 0.5)
+  client = TestClient(app)
+  first = client.get('/leaderboard', params={"limit": 2}).json()
+  assert [entry['key'] for entry in first['entries']] == ['Alice_1', 'Carol_3'] and first['total'] == 3
+  second = client.get('/leaderboard', params={"limit": 2, "cursor": first['next_cursor']}).json()
+  assert [entry['key'] for entry in second['entries']] == ['Bob_2'] and second['next_cursor'] is None
+  assert client.get('/leaderboard', params={"cursor": "not-a-cursor"}).status_code == 400
+  assert client.get('/leaderboard/rank', params={"key": 'Bob_2'}).json()['rank'] == 3
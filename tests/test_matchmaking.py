@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from app.config import CONFIG
+from app.modules.matchmaking import MatchmakingQueue, join_queue, queue_status, run_tick, tolerance
+from app.modules.player_manager import add_active_player
+
+
+@pytest.fixture
+def queue(tmp_path):
+  queue = MatchmakingQueue(str(tmp_path / 'queue.db'))
+  yield queue
+  queue.close()
+
+
+def _wait(queue, key, seconds):
+  """Backdate key's ticket as if it had been waiting for seconds."""
+  with queue.transaction() as conn:
+    conn.execute("UPDATE matchmaking SET enqueued_at = enqueued_at - ? WHERE key = ?", (seconds, key))
+
+
+def _pairs(pairs):
+  return [{ticket['key'] for ticket in pair} for pair in pairs]
+
+
+def test_pairs_nearest_ratings(queue):
+  for key, rating in (('a', 1000), ('b', 1120), ('c', 1030), ('d', 1150)):
+    queue.join(key, key, 1, rating)
+  pairs, timed_out = queue.pair(10)
+  assert _pairs(pairs) == [{'a', 'c'}, {'b', 'd'}] and timed_out == []
+  assert queue.get('a')['status'] == 'matched' and queue.get('a')['opponent'] == 'c'
+  assert queue.waiting_count() == 0
+
+
+def test_tolerance_widens_with_wait(queue):
+  queue.join('a', 'a', 1, 1000)
+  queue.join('b', 'b', 2, 1200)
+  assert queue.pair(10) == ([], [])
+  _wait(queue, 'a', 20)
+  pairs, _ = queue.pair(10)
+  assert _pairs(pairs) == [{'a', 'b'}]
+  assert tolerance(0) == CONFIG['matchmaking_tolerance_base']
+  assert tolerance(1e6) == CONFIG['matchmaking_tolerance_max']
+
+
+def test_rejoining_keeps_the_place_in_the_queue(queue):
+  queue.join('a', 'a', 1, 1000)
+  _wait(queue, 'a', 30)
+  enqueued_at = queue.get('a')['enqueued_at']
+  assert queue.join('a', 'a', 1, 1010)['enqueued_at'] == enqueued_at
+  assert queue.leave('a') and not queue.leave('a')
+  assert queue.get('a') is None
+
+
+def test_tickets_time_out(queue):
+  queue.join('a', 'a', 1, 1000)
+  queue.join('b', 'b', 2, 1000)
+  _wait(queue, 'a', CONFIG['matchmaking_timeout_seconds'] + 1)
+  pairs, timed_out = queue.pair(10)
+  assert pairs == [] and len(timed_out) == 1 and timed_out[0] > CONFIG['matchmaking_timeout_seconds']
+  assert queue.get('a')['status'] == 'timeout' and queue.get('b')['status'] == 'waiting'
+
+
+def test_tick_plays_matched_players():
+  for name, pid in (('Alice', 1), ('Bob', 2)):
+    add_active_player(name, pid)
+    join_queue(name, pid)
+  [result] = asyncio.run(run_tick())
+  assert set(result['players']) == {'Alice_1', 'Bob_2'} and 'error' not in result
+  for name, pid in (('Alice', 1), ('Bob', 2)):
+    ticket = queue_status(name, pid)
+    assert ticket['status'] == 'matched' and ticket['result'] == result
+
+
+def test_tick_cancels_pairs_whose_players_logged_out():
+  join_queue('Alice', 1)
+  join_queue('Bob', 2)
+  [result] = asyncio.run(run_tick())
+  assert result == {"winner": None, "cancelled": "opponent unavailable"}
+  assert queue_status('Alice', 1)['result'] == result
@@ -0,0 +1,79 @@
+import json
+import os
+import pytest
+from fastapi.testclient import TestClient
+from app.config import CONFIG
+from app.main import app
+from app.modules.response_cache import ResponseCache, response_cache
+
+
+def _write(path, payload):
+  with open(path, 'w') as f:
+    json.dump(payload, f)
+
+
+def _loader(path, calls):
+  def build():
+    calls.append(path)
+    with open(path) as f:
+      return json.load(f)
+  return build
+
+
+def test_entries_are_rebuilt_only_when_their_file_changes(tmp_path):
+  cache, calls = ResponseCache(1024), []
+  path = str(tmp_path / 'summary.json')
+  _write(path, {"wins": 1})
+  first = cache.get('summary', path, _loader(path, calls))
+  assert cache.get('summary', path, _loader(path, calls)) is first
+  _write(path, {"wins": 12})
+  rebuilt = cache.get('summary', path, _loader(path, calls))
+  assert json.loads(rebuilt.body) == {"wins": 12} and rebuilt.etag != first.etag
+  assert (cache.hits, cache.misses, len(calls)) == (1, 2, 2)
+
+
+def test_least_recently_used_entries_are_evicted_over_the_cap(tmp_path):
+  paths = {}
+  for key in 'abc':
+    paths[key] = str(tmp_path / f'{key}.json')
+    _write(paths[key], {"key": key * 20})
+  size = len(json.dumps({"key": 'a' * 20}).encode())
+  cache, calls = ResponseCache(2 * size), []
+  cache.get('a', paths['a'], _loader(paths['a'], calls))
+  cache.get('b', paths['b'], _loader(paths['b'], calls))
+  cache.get('a', paths['a'], _loader(paths['a'], calls))  # a is now the most recently used
+  cache.get('c', paths['c'], _loader(paths['c'], calls))
+  assert list(cache.entries) == ['a', 'c'] and cache.total_bytes == 2 * size
+  cache.invalidate('a')
+  assert list(cache.entries) == ['c'] and cache.total_bytes == size
+
+
+def test_payloads_over_the_cap_are_served_but_not_kept(tmp_path):
+  path = str(tmp_path / 'big.json')
+  _write(path, {"data": 'x' * 100})
+  cache = ResponseCache(50)
+  entry = cache.get('big', path, _loader(path, []))
+  assert json.loads(entry.body)['data'] == 'x' * 100
+  assert not cache.entries and cache.total_bytes == 0
+
+
+@pytest.fixture
+def summary(tmp_path, monkeypatch):
+  monkeypatch.setitem(CONFIG, 'log_dir', str(tmp_path / 'battle_logs'))
+  os.makedirs(CONFIG['log_dir'])
+  response_cache.invalidate()
+  yield os.path.join(CONFIG['log_dir'], 'summary.json')
+  response_cache.invalidate()
+
+
+def test_summary_answers_304_for_a_current_etag(summary):
+  _write(summary, {"battles": 3})
+  client = TestClient(app)
+  response = client.get('/battle/summary')
+  assert response.status_code == 200 and response.json() == {"battles": 3}
+  etag = response.headers['etag']
+  cached = client.get('/battle/summary', headers={"If-None-Match": etag})
+  assert cached.status_code == 304 and cached.headers['etag'] == etag and not cached.content
+  _write(summary, {"battles": 30})
+  changed = client.get('/battle/summary', headers={"If-None-Match": etag})
+  assert changed.status_code == 200 and changed.json() == {"battles": 30}
@@ -0,0 +1,61 @@
+import time
+from app.config import CONFIG
+from app.modules.creature_manager import _active_creatures, list_active_creatures
+from app.modules.player_manager import add_active_player, get_active_player, list_active_players, remove_active_player
+from app.modules.session_registry import IdAllocator, SessionRegistry, active_sessions
+from app.modules.storage import get_storage
+
+
+def test_owned_creatures_stay_active_while_their_player_does(monkeypatch):
+  monkeypatch.setitem(CONFIG, 'session_ttl_seconds', 2)
+  monkeypatch.setitem(CONFIG, 'session_evict_interval', 0)
+  add_active_player('Alice', 1)
+  assert '1_A' in _active_creatures
+  deadline = time.monotonic() + 3
+  while time.monotonic() < deadline:
+    time.sleep(0.5)
+    assert get_active_player('Alice', 1) is not None
+    list_active_players()  # runs eviction
+    assert '1_A' in _active_creatures
+    assert active_sessions('creature')
+
+
+def test_sessions_expire_after_the_ttl(tmp_path):
+  registry = SessionRegistry(str(tmp_path / 'sessions.db'))
+  registry.touch('player', 'Alice_1', {"name": "Alice", "id": 1})
+  assert registry.get('player', 'Alice_1', ttl=60) == {"name": "Alice", "id": 1}
+  assert registry.active('player', ttl=60) == {'Alice_1': {"name": "Alice", "id": 1}}
+  time.sleep(0.05)
+  assert registry.get('player', 'Alice_1', ttl=0.01) is None
+  assert registry.evict(ttl=0.01) == [('player', 'Alice_1')]
+  assert registry.get('player', 'Alice_1', ttl=60) is None
+  registry.close()
+
+
+def test_touch_without_data_keeps_the_stored_data(tmp_path):
+  registry = SessionRegistry(str(tmp_path / 'sessions.db'))
+  registry.touch_many([('creature', '1_A', {"owner": "Alice"}), ('creature', '2_B', None)])
+  registry.touch('creature', '1_A')
+  assert registry.active('creature', ttl=60) == {'1_A': {"owner": "Alice"}, '2_B': {}}
+  registry.close()
+
+
+def test_logout_removes_player_and_creature_sessions():
+  add_active_player('Alice', 1)
+  assert list_active_players() == ['Alice_1'] and list_active_creatures() == ['1_A']
+  remove_active_player('Alice', 1)
+  assert list_active_players() == [] and list_active_creatures() == []
+  assert get_active_player('Alice', 1) is None
+
+
+def test_allocators_hand_out_disjoint_blocks(monkeypatch):
+  monkeypatch.setitem(CONFIG, 'id_block_size', 3)
+  first, second = IdAllocator('creature'), IdAllocator('creature')
+  ids = [next(first), next(second), next(first), next(first), next(first), next(second)]
+  assert ids == [1, 4, 2, 3, 7, 5]
+
+
+def test_allocation_starts_above_existing_ids():
+  get_storage().save_creatures([{"id": 41, "name": "A", "owner": "Alice"}])
+  assert next(IdAllocator('creature')) == 42
+  assert next(IdAllocator('player')) == 1
@@ -0,0 +1,107 @@
+import json
+import pytest
+from app.config import CONFIG
+from app.modules import storage
+from app.modules.player_manager import add_active_player, remove_active_player
+from app.modules.storage import JsonStorage, SqliteStorage, import_legacy_json
+from app.modules.storage_migration import migrate_json_to_sqlite
+
+
+def _player(pid, name, creatures):
+  return {"id": pid, "name": name, "creatures": [c['name'] for c in creatures]}
+
+
+def _creature(cid, name, owner):
+  return {"id": cid, "name": name, "owner": owner, "hp": 100}
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def backend(request, tmp_path):
+  if request.param == 'json':
+    yield JsonStorage(str(tmp_path / 'players'), str(tmp_path / 'creatures'))
+  else:
+    db = SqliteStorage(str(tmp_path / 'store.db'))
+    yield db
+    db.close()
+
+
+def test_player_round_trip_returns_owned_creatures(backend):
+  creatures = [_creature(5, 'A', 'Alice')]
+  backend.save_player(_player(1, 'Alice', creatures), creatures)
+  player_data, creatures_data = backend.load_player(1)
+  assert player_data == _player(1, 'Alice', creatures)
+  assert creatures_data == creatures
+  assert backend.load_player(2) is None
+
+
+def test_saved_creature_updates_are_loaded_with_the_player(backend):
+  creatures = [_creature(5, 'A', 'Alice')]
+  backend.save_player(_player(1, 'Alice', creatures), creatures)
+  backend.save_creatures([{**creatures[0], "hp": 42}])
+  assert backend.load_player(1)[1][0]['hp'] == 42
+  assert backend.load_creature(5, 'A')['hp'] == 42
+  assert backend.load_creature(6, 'A') is None
+
+
+def test_json_player_files_without_creature_ids_resolve_by_owner(tmp_path):
+  (tmp_path / 'players').mkdir()
+  (tmp_path / 'creatures').mkdir()
+  (tmp_path / 'players' / 'player_1.json').write_text(json.dumps({"id": 1, "name": "Alice", "creatures": ["A"]}))
+  for creature in (_creature(3, 'A', 'Bob'), _creature(4, 'A', 'Alice')):
+    (tmp_path / 'creatures' / f"creature_{creature['id']}_A.json").write_text(json.dumps(creature))
+  backend = JsonStorage(str(tmp_path / 'players'), str(tmp_path / 'creatures'))
+  assert [c['id'] for c in backend.load_player(1)[1]] == [4]
+
+
+@pytest.mark.parametrize('backend_name', ['json', 'sqlite'])
+def test_relogin_keeps_the_players_stored_creature(backend_name, monkeypatch):
+  monkeypatch.setitem(CONFIG, 'storage_backend', backend_name)
+  first = add_active_player('Alice', 1)
+  stored = [(c.id, c.name, c.owner) for c in first.creatures]
+  remove_active_player('Alice', 1)
+  monkeypatch.setattr(storage, '_storage', None)  # as after a restart
+  again = add_active_player('Alice', 1)
+  assert [(c.id, c.name, c.owner) for c in again.creatures] == stored
+  assert stored[0][2] == 'Alice'
+
+
+def test_migration_links_creatures_and_is_idempotent(tmp_path):
+  json_store = JsonStorage(str(tmp_path / 'players'), str(tmp_path / 'creatures'))
+  alice = [_creature(5, 'A', 'Alice')]
+  json_store.save_player(_player(1, 'Alice', alice), alice)
+  json_store.save_creatures([_creature(9, 'B', 'nobody')])
+  db = SqliteStorage(str(tmp_path / 'migrated.db'))
+  try:
+    assert migrate_json_to_sqlite(str(tmp_path / 'players'), str(tmp_path / 'creatures'), db) == (1, 2)
+    assert migrate_json_to_sqlite(str(tmp_path / 'players'), str(tmp_path / 'creatures'), db) == (1, 2)
+    player_data, creatures_data = db.load_player(1)
+    assert 'creature_ids' not in player_data
+    assert creatures_data == alice
+    assert db.load_creature(9, 'B')['owner'] == 'nobody'
+  finally:
+    db.close()
+
+
+def test_empty_database_imports_legacy_json_once(tmp_path):
+  json_store = JsonStorage()
+  alice = [_creature(5, 'A', 'Alice')]
+  json_store.save_player(_player(1, 'Alice', alice), alice)
+  db = SqliteStorage(str(tmp_path / 'fresh.db'))
+  try:
+    assert import_legacy_json(db)
+    assert db.load_player(1)[1] == alice
+    assert not import_legacy_json(db)
+  finally:
+    db.close()
+
+
+def test_incomplete_backend_fails_on_instantiation():
+  class PlayersOnly(storage.StorageBackend):
+    def save_player(self, player_data, creatures_data=()):
+      pass
+
+    def load_player(self, player_id):
+      return None
+
+  with pytest.raises(TypeError):
+    PlayersOnly()
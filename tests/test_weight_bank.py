@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from app.config import CREATURE_TEMPLATES
+from app.modules.creature_manager import Creature
+from app.modules.model_factory import build_model, model_spec
+from app.modules.torch_loader import torch
+from app.modules.weight_bank import WeightBank
+
+
+def _creatures(template_key, count):
+  template = CREATURE_TEMPLATES[template_key]
+  return [Creature(template['name'], f"player_{i}", build_model(model_spec(template)), template, creature_id=i + 1)
+          for i in range(count)]
+
+
+def _module_probs(creatures, states):
+  with torch.no_grad():
+    return torch.stack([torch.softmax(c.nn(s), dim=0) for c, s in zip(creatures, torch.from_numpy(states))]).numpy()
+
+
+def _bank(creatures, capacity=None):
+  bank = WeightBank(creatures[0].nn_spec, capacity)
+  slots = np.array([bank.allocate(f"{c.id}_{c.name}", c) for c in creatures])
+  return bank, slots
+
+
+def _states(count, size):
+  return np.random.default_rng(0).integers(1, 101, size=(count, size)).astype(np.float32)
+
+
+@pytest.mark.parametrize('template_key', list(CREATURE_TEMPLATES))
+def test_bank_matches_per_creature_modules(template_key):
+  creatures = _creatures(template_key, 40)
+  bank, slots = _bank(creatures, capacity=4)  # grows as slots are reserved
+  states = _states(len(creatures), bank.spec[0])
+  assert bank.capacity >= len(creatures)
+  np.testing.assert_allclose(bank.probs(slots, states), _module_probs(creatures, states), atol=1e-5)
+  # Any subset, in any order, evaluates the same creatures
+  order = np.arange(len(creatures))[::-3]
+  np.testing.assert_allclose(bank.probs(slots[order], states[order]),
+                             _module_probs([creatures[i] for i in order], states[order]), atol=1e-5)
+
+
+def test_private_weights_written_in_place_are_recopied():
+  creatures = _creatures('A', 3)
+  bank, slots = _bank(creatures)
+  states = _states(len(creatures), bank.spec[0])
+  bank.probs(slots, states)
+  with torch.no_grad():
+    for param in creatures[1].nn.parameters():
+      param.mul_(-2.0)
+  np.testing.assert_allclose(bank.probs(slots, states), _module_probs(creatures, states), atol=1e-5)
+
+
+def test_released_slots_are_reused_with_the_new_creatures_weights():
+  first, second = _creatures('B', 2)
+  bank, [slot] = _bank([first])
+  states = _states(1, bank.spec[0])
+  bank.probs([slot], states)
+  bank.release(f"{first.id}_{first.name}")
+  assert bank.allocate(f"{second.id}_{second.name}", second) == slot
+  np.testing.assert_allclose(bank.probs([slot], states), _module_probs([second], states), atol=1e-5)